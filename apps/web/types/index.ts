@@ -51,8 +51,10 @@ export interface ChatMessage {
 export interface ChatSession {
   id: string;
   userId?: string;
-  sessionData: any;
+  sessionData?: any;
   messageCount: number;
+  lastMessageAt?: string | null;
+  lastMessagePreview?: string | null;
   createdAt: string;
   updatedAt: string;
   isActive: boolean;
@@ -92,8 +94,43 @@ export interface ProductFilters {
   max_price?: number;
   min_rating?: number;
   in_stock_only?: boolean;
+  features?: string;
+  features_mode?: "all" | "any";
   search?: string;
+  correct?: boolean;
   limit?: number;
+  sort?: ProductSort;
+  cursor?: string;
+  include_total?: boolean;
+  fields?: string;
+}
+
+export type ProductSort =
+  | "rating"
+  | "popularity"
+  | "price_asc"
+  | "price_desc"
+  | "newest"
+  | "discount";
+
+export interface ProductSuggestion {
+  text: string;
+  type: "query" | "product" | "brand" | "category" | "subcategory";
+  id?: string;
+}
+
+export interface ProductPage {
+  sort?: ProductSort;
+  limit: number;
+  has_more: boolean;
+  next_cursor: string | null;
+  total?: number;
+}
+
+export interface ProductBatch {
+  products: Partial<Product>[];
+  count: number;
+  missing: string[];
 }
 
 export interface ProductStats {
@@ -107,3 +144,23 @@ export interface ProductStats {
   average_rating: number;
   in_stock_count: number;
 }
+
+export interface FacetCount {
+  value: string;
+  count: number;
+}
+
+export interface ProductFacets {
+  total: number;
+  categories: FacetCount[];
+  subcategories: FacetCount[];
+  brands: FacetCount[];
+  price: {
+    min: number | null;
+    max: number | null;
+    histogram: { min: number | null; max: number | null; count: number }[];
+  };
+  rating: { min: number; count: number }[];
+  in_stock_count: number;
+  on_sale_count: number;
+}
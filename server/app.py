@@ -23,11 +23,60 @@ def create_app(config_name=None):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
+    from utils import fast_json
+
+    fast_json.init_app(app)
+
     db.init_app(app)
     jwt.init_app(app)
 
     migrate.init_app(app, db)
 
+    from services.message_buffer import message_buffer
+
+    message_buffer.init_app(app)
+
+    from models import product_cache
+
+    product_cache.init_app(app)
+
+    from models import product_popularity
+
+    product_popularity.init_app(app)
+
+    from services.catalog_snapshot import catalog_snapshot
+
+    catalog_snapshot.init_app(app)
+
+    from services.catalog_aggregates import catalog_aggregates
+
+    catalog_aggregates.init_app(app)
+
+    from services.search_cache import search_cache
+
+    search_cache.init_app(app)
+
+    from services.spelling_service import spelling_service
+
+    spelling_service.init_app(app)
+
+    from services.suggest_service import suggest_service
+
+    suggest_service.init_app(app)
+
+    from services.embedding_indexer import embedding_indexer
+
+    embedding_indexer.init_app(app)
+
+    from utils import tracing
+
+    tracing.init_app(app)
+
+    from utils import compression
+
+    # Registered after tracing so its span lands in the request trace
+    compression.init_app(app)
+
     CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
     setup_logging(app)
 
@@ -72,6 +121,26 @@ def create_app(config_name=None):
             }
         ), 200
 
+    @app.route("/api/health/latency", methods=["GET"])
+    def latency_stats():
+        from models import product_cache
+        from services.search_cache import search_cache
+        from services.spelling_service import spelling_service
+        from utils import tracing
+
+        return jsonify(
+            {
+                "success": True,
+                "tracing_enabled": tracing.is_enabled(),
+                "stages": tracing.histograms.snapshot(),
+                "caches": {
+                    "search": search_cache.stats(),
+                    "products": product_cache.stats(),
+                    "spelling": spelling_service.stats(),
+                },
+            }
+        ), 200
+
     @app.before_request
     def initialize_database():
         """Initialize database and seed with sample data"""
@@ -80,6 +149,10 @@ def create_app(config_name=None):
         try:
             db.create_all()
 
+            from models import product_search
+
+            product_search.ensure_search_index(db.engine)
+
             from utils.database_seeder import DatabaseSeeder
 
             seeder = DatabaseSeeder(db)
@@ -29,6 +29,142 @@ class Config:
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION = 384
 
+    CHAT_WORKER_PROCESSES = int(os.environ.get("CHAT_WORKER_PROCESSES", 2))
+    CHAT_JOB_POLL_INTERVAL = float(os.environ.get("CHAT_JOB_POLL_INTERVAL", 0.5))
+    CHAT_JOB_MAX_WAIT = float(os.environ.get("CHAT_JOB_MAX_WAIT", 10))
+    CHAT_JOB_STALE_AFTER = int(os.environ.get("CHAT_JOB_STALE_AFTER", 300))
+    CHAT_JOB_MAX_ATTEMPTS = int(os.environ.get("CHAT_JOB_MAX_ATTEMPTS", 2))
+
+    MESSAGE_BUFFER_ENABLED = (
+        os.environ.get("MESSAGE_BUFFER_ENABLED", "true").lower() == "true"
+    )
+    MESSAGE_BUFFER_MAX_SIZE = int(os.environ.get("MESSAGE_BUFFER_MAX_SIZE", 1000))
+    MESSAGE_BUFFER_BATCH_SIZE = int(os.environ.get("MESSAGE_BUFFER_BATCH_SIZE", 100))
+    MESSAGE_BUFFER_FLUSH_INTERVAL = float(
+        os.environ.get("MESSAGE_BUFFER_FLUSH_INTERVAL", 0.25)
+    )
+    MESSAGE_BUFFER_MAX_RETRIES = int(os.environ.get("MESSAGE_BUFFER_MAX_RETRIES", 5))
+    MESSAGE_BUFFER_RETRY_DELAY = float(
+        os.environ.get("MESSAGE_BUFFER_RETRY_DELAY", 1.0)
+    )
+
+    TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+    TRACING_SERVER_TIMING = (
+        os.environ.get("TRACING_SERVER_TIMING", "false").lower() == "true"
+    )
+    TRACING_SLOW_TURN_MS = float(os.environ.get("TRACING_SLOW_TURN_MS", 5000))
+
+    SEARCH_DEFAULT_MODE = os.environ.get("SEARCH_DEFAULT_MODE", "hybrid")
+    SEARCH_HYBRID_DEADLINE_MS = float(os.environ.get("SEARCH_HYBRID_DEADLINE_MS", 800))
+    SEARCH_HYBRID_LEXICAL_WEIGHT = float(
+        os.environ.get("SEARCH_HYBRID_LEXICAL_WEIGHT", 1.0)
+    )
+    SEARCH_HYBRID_VECTOR_WEIGHT = float(
+        os.environ.get("SEARCH_HYBRID_VECTOR_WEIGHT", 1.0)
+    )
+    SEARCH_HYBRID_WORKERS = int(os.environ.get("SEARCH_HYBRID_WORKERS", 8))
+    SEARCH_RRF_K = int(os.environ.get("SEARCH_RRF_K", 60))
+    SEARCH_POPULARITY_WEIGHT = float(os.environ.get("SEARCH_POPULARITY_WEIGHT", 0.1))
+
+    POPULARITY_PRIOR_REVIEWS = float(os.environ.get("POPULARITY_PRIOR_REVIEWS", 25))
+    POPULARITY_REVIEW_WEIGHT = float(os.environ.get("POPULARITY_REVIEW_WEIGHT", 0.05))
+    POPULARITY_LIKE_WEIGHT = float(os.environ.get("POPULARITY_LIKE_WEIGHT", 0.1))
+    POPULARITY_CART_WEIGHT = float(os.environ.get("POPULARITY_CART_WEIGHT", 0.1))
+    POPULARITY_RECENCY_WEIGHT = float(
+        os.environ.get("POPULARITY_RECENCY_WEIGHT", 0.25)
+    )
+    POPULARITY_RECENCY_HALF_LIFE_DAYS = float(
+        os.environ.get("POPULARITY_RECENCY_HALF_LIFE_DAYS", 30)
+    )
+    POPULARITY_BATCH_SIZE = int(os.environ.get("POPULARITY_BATCH_SIZE", 1000))
+
+    CATALOG_SNAPSHOT_ENABLED = (
+        os.environ.get("CATALOG_SNAPSHOT_ENABLED", "true").lower() == "true"
+    )
+    CATALOG_SNAPSHOT_REFRESH_INTERVAL = float(
+        os.environ.get("CATALOG_SNAPSHOT_REFRESH_INTERVAL", 1.0)
+    )
+    CATALOG_SUMMARY_PERSIST = (
+        os.environ.get("CATALOG_SUMMARY_PERSIST", "false").lower() == "true"
+    )
+
+    HTTP_CACHE_ENABLED = os.environ.get("HTTP_CACHE_ENABLED", "true").lower() == "true"
+    HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", 0))
+    HTTP_CACHE_STALE_WHILE_REVALIDATE = int(
+        os.environ.get("HTTP_CACHE_STALE_WHILE_REVALIDATE", 60)
+    )
+
+    JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "orjson")
+    JSON_STREAM_MIN_ITEMS = int(os.environ.get("JSON_STREAM_MIN_ITEMS", 500))
+    JSON_STREAM_CHUNK_ITEMS = int(os.environ.get("JSON_STREAM_CHUNK_ITEMS", 100))
+
+    COMPRESSION_ENABLED = (
+        os.environ.get("COMPRESSION_ENABLED", "true").lower() == "true"
+    )
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+
+    EMBEDDING_INDEXER_THREAD = (
+        os.environ.get("EMBEDDING_INDEXER_THREAD", "true").lower() == "true"
+    )
+    EMBEDDING_OUTBOX_BATCH_SIZE = int(
+        os.environ.get("EMBEDDING_OUTBOX_BATCH_SIZE", 100)
+    )
+    EMBEDDING_OUTBOX_POLL_INTERVAL = float(
+        os.environ.get("EMBEDDING_OUTBOX_POLL_INTERVAL", 5.0)
+    )
+    EMBEDDING_OUTBOX_MAX_ATTEMPTS = int(
+        os.environ.get("EMBEDDING_OUTBOX_MAX_ATTEMPTS", 10)
+    )
+    EMBEDDING_OUTBOX_RETRY_DELAY = float(
+        os.environ.get("EMBEDDING_OUTBOX_RETRY_DELAY", 5.0)
+    )
+    EMBEDDING_OUTBOX_MAX_RETRY_DELAY = float(
+        os.environ.get("EMBEDDING_OUTBOX_MAX_RETRY_DELAY", 900.0)
+    )
+    EMBEDDING_OUTBOX_LEASE = float(os.environ.get("EMBEDDING_OUTBOX_LEASE", 300.0))
+
+    PRODUCT_IMPORT_BATCH_SIZE = int(os.environ.get("PRODUCT_IMPORT_BATCH_SIZE", 1000))
+    PRODUCT_IMPORT_MAX_ERRORS = int(os.environ.get("PRODUCT_IMPORT_MAX_ERRORS", 100))
+    PRODUCT_IMPORT_USE_COPY = (
+        os.environ.get("PRODUCT_IMPORT_USE_COPY", "true").lower() == "true"
+    )
+
+    SEARCH_CACHE_ENABLED = (
+        os.environ.get("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+    )
+    SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", 2048))
+    SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", 300))
+    SEARCH_CACHE_INDEX_CHECK_INTERVAL = float(
+        os.environ.get("SEARCH_CACHE_INDEX_CHECK_INTERVAL", 1.0)
+    )
+
+    SEARCH_TYPO_ENABLED = (
+        os.environ.get("SEARCH_TYPO_ENABLED", "true").lower() == "true"
+    )
+    SEARCH_TYPO_MIN_SIMILARITY = float(
+        os.environ.get("SEARCH_TYPO_MIN_SIMILARITY", 0.3)
+    )
+    SEARCH_TYPO_CACHE_SIZE = int(os.environ.get("SEARCH_TYPO_CACHE_SIZE", 4096))
+    SEARCH_TYPO_REFRESH_INTERVAL = float(
+        os.environ.get("SEARCH_TYPO_REFRESH_INTERVAL", 30.0)
+    )
+
+    SUGGEST_REFRESH_INTERVAL = float(os.environ.get("SUGGEST_REFRESH_INTERVAL", 5.0))
+    SUGGEST_MAX_QUERIES = int(os.environ.get("SUGGEST_MAX_QUERIES", 1000))
+    SUGGEST_MIN_QUERY_COUNT = int(os.environ.get("SUGGEST_MIN_QUERY_COUNT", 2))
+    SUGGEST_QUERY_LIMIT = int(os.environ.get("SUGGEST_QUERY_LIMIT", 3))
+
+    FACET_CACHE_SIZE = int(os.environ.get("FACET_CACHE_SIZE", 256))
+    PRODUCT_CACHE_SIZE = int(os.environ.get("PRODUCT_CACHE_SIZE", 10000))
+    FACET_PRICE_EDGES = [
+        float(edge)
+        for edge in os.environ.get(
+            "FACET_PRICE_EDGES", "25,50,100,250,500,1000,2500"
+        ).split(",")
+    ]
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -78,6 +78,13 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        is_sqlite = connection.dialect.name == "sqlite"
+        if is_sqlite:
+            # Batch migrations recreate tables; with foreign keys on, SQLite
+            # would cascade the implicit DROP TABLE into child rows
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.commit()
+
         context.configure(
             connection=connection, target_metadata=get_metadata(), **conf_args
         )
@@ -85,6 +92,10 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+        if is_sqlite:
+            connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+            connection.commit()
+
 
 if context.is_offline_mode():
     run_migrations_offline()
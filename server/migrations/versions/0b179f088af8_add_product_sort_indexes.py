@@ -0,0 +1,80 @@
+"""add product sort indexes
+
+Revision ID: 0b179f088af8
+Revises: cf87bb2e8531
+Create Date: 2026-10-18 16:05:33.271946
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b179f088af8'
+down_revision = 'cf87bb2e8531'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('discount_percentage', sa.Integer(), server_default='0', nullable=False))
+
+    # Keyset pagination needs non-null sort keys
+    products = sa.table(
+        'products',
+        sa.column('id', sa.String),
+        sa.column('price', sa.Float),
+        sa.column('original_price', sa.Float),
+        sa.column('sale_percentage', sa.Integer),
+        sa.column('discount_percentage', sa.Integer),
+        sa.column('rating', sa.Float),
+        sa.column('created_at', sa.DateTime),
+    )
+    op.execute(products.update().where(products.c.rating.is_(None)).values(rating=0.0))
+    op.execute(
+        products.update()
+        .where(products.c.created_at.is_(None))
+        .values(created_at=datetime.now())
+    )
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(
+            products.c.id,
+            products.c.price,
+            products.c.original_price,
+            products.c.sale_percentage,
+        )
+    ).fetchall()
+    discounts = []
+    for product_id, price, original_price, sale_percentage in rows:
+        discount = sale_percentage or 0
+        if not discount and original_price and price and original_price > price:
+            discount = round(((original_price - price) / original_price) * 100)
+        if discount:
+            discounts.append({'b_id': product_id, 'b_discount': discount})
+    if discounts:
+        bind.execute(
+            products.update()
+            .where(products.c.id == sa.bindparam('b_id'))
+            .values(discount_percentage=sa.bindparam('b_discount')),
+            discounts,
+        )
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_active_rating_id', ['is_active', 'rating', 'id'], unique=False)
+        batch_op.create_index('ix_products_active_price_id', ['is_active', 'price', 'id'], unique=False)
+        batch_op.create_index('ix_products_active_created_at_id', ['is_active', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_products_active_discount_id', ['is_active', 'discount_percentage', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_active_discount_id')
+        batch_op.drop_index('ix_products_active_created_at_id')
+        batch_op.drop_index('ix_products_active_price_id')
+        batch_op.drop_index('ix_products_active_rating_id')
+        batch_op.drop_column('discount_percentage')
@@ -0,0 +1,41 @@
+"""add embedding outbox
+
+Revision ID: 3c8a810ee425
+Revises: 545dd8d59e75
+Create Date: 2026-10-18 23:48:05.112873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8a810ee425'
+down_revision = '545dd8d59e75'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('embedding_outbox',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('product_id', sa.String(length=36), nullable=False),
+    sa.Column('operation', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('claimed_by', sa.String(length=100), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('embedding_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_embedding_outbox_available_at_id', ['available_at', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_embedding_outbox_product_id'), ['product_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('embedding_outbox', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_embedding_outbox_product_id'))
+        batch_op.drop_index('ix_embedding_outbox_available_at_id')
+
+    op.drop_table('embedding_outbox')
@@ -0,0 +1,45 @@
+"""add chat jobs
+
+Revision ID: 4b7e1f2a9c3d
+Revises: c42517d8354b
+Create Date: 2026-10-18 09:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e1f2a9c3d'
+down_revision = 'c42517d8354b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_jobs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('chat_session_id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.String(length=36), nullable=True),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('worker_id', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chat_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chat_jobs_chat_session_id'), ['chat_session_id'], unique=False)
+        batch_op.create_index('ix_chat_jobs_status_created_at', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chat_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_chat_jobs_status_created_at')
+        batch_op.drop_index(batch_op.f('ix_chat_jobs_chat_session_id'))
+
+    op.drop_table('chat_jobs')
@@ -0,0 +1,56 @@
+"""add product trigram index
+
+Revision ID: 4e1d7a9c2b60
+Revises: 9f5c4bf2ac93
+Create Date: 2026-10-19 04:11:37.802155
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e1d7a9c2b60'
+down_revision = '9f5c4bf2ac93'
+branch_labels = None
+depends_on = None
+
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+TRIGRAM_INDEXES = {
+    'ix_products_name_trgm': 'lower(name)',
+    'ix_products_brand_key_trgm': 'brand_key',
+    'ix_products_category_key_trgm': 'category_key',
+    'ix_products_subcategory_key_trgm': 'subcategory_key',
+}
+
+
+def upgrade():
+    # pg_trgm GIN indexes on PostgreSQL; other engines correct spelling in memory
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # Installing an extension needs privileges; without it the migration still applies
+    savepoint = bind.begin_nested()
+    try:
+        bind.execute(sa.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        for name, expression in TRIGRAM_INDEXES.items():
+            bind.execute(sa.text(
+                f'CREATE INDEX IF NOT EXISTS {name} ON products '
+                f'USING GIN (({expression}) gin_trgm_ops)'
+            ))
+        savepoint.commit()
+    except Exception as e:
+        savepoint.rollback()
+        logger.warning(f'pg_trgm unavailable, skipping trigram indexes: {e}')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for name in TRIGRAM_INDEXES:
+            bind.execute(sa.text(f'DROP INDEX IF EXISTS {name}'))
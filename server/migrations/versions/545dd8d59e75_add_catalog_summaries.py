@@ -0,0 +1,29 @@
+"""add catalog summaries
+
+Revision ID: 545dd8d59e75
+Revises: 0b179f088af8
+Create Date: 2026-10-18 23:10:12.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '545dd8d59e75'
+down_revision = '0b179f088af8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_summaries',
+    sa.Column('version', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('version')
+    )
+
+
+def downgrade():
+    op.drop_table('catalog_summaries')
@@ -0,0 +1,30 @@
+"""add index versions
+
+Revision ID: 6a2f9d4e8b17
+Revises: 4e1d7a9c2b60
+Create Date: 2026-10-19 09:42:15.310472
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2f9d4e8b17'
+down_revision = '4e1d7a9c2b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    index_versions = op.create_table('index_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(index_versions, [{'name': 'vector', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('index_versions')
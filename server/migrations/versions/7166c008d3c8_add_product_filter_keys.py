@@ -0,0 +1,87 @@
+"""add product filter keys
+
+Revision ID: 7166c008d3c8
+Revises: 3c8a810ee425
+Create Date: 2026-10-19 00:41:07.915238
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7166c008d3c8'
+down_revision = '3c8a810ee425'
+branch_labels = None
+depends_on = None
+
+KEY_COLUMNS = {
+    'category': 'category_key',
+    'subcategory': 'subcategory_key',
+    'brand': 'brand_key',
+}
+BATCH_SIZE = 1000
+
+
+def _key(value):
+    # Same normalization as models.product_terms.normalize
+    if value is None:
+        return None
+    return ' '.join(str(value).lower().split())
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        for column in KEY_COLUMNS.values():
+            batch_op.add_column(sa.Column(column, sa.String(length=100), nullable=True))
+
+    products = sa.table(
+        'products',
+        sa.column('id', sa.String),
+        *[sa.column(name, sa.String) for name in KEY_COLUMNS],
+        *[sa.column(column, sa.String) for column in KEY_COLUMNS.values()],
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(products.c.id, *[products.c[name] for name in KEY_COLUMNS])
+    ).fetchall()
+    updates = [
+        dict(
+            {'b_id': row[0]},
+            **{
+                f'b_{column}': _key(value)
+                for column, value in zip(KEY_COLUMNS.values(), row[1:])
+            },
+        )
+        for row in rows
+    ]
+    statement = (
+        products.update()
+        .where(products.c.id == sa.bindparam('b_id'))
+        .values(
+            **{column: sa.bindparam(f'b_{column}') for column in KEY_COLUMNS.values()}
+        )
+    )
+    for start in range(0, len(updates), BATCH_SIZE):
+        bind.execute(statement, updates[start:start + BATCH_SIZE])
+
+    # Filters now match the keys exactly; ilike('%x%') never used these
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_brand')
+        batch_op.drop_index('ix_products_category')
+        batch_op.drop_index('ix_products_subcategory')
+        batch_op.create_index(batch_op.f('ix_products_brand_key'), ['brand_key'], unique=False)
+        batch_op.create_index(batch_op.f('ix_products_category_key'), ['category_key'], unique=False)
+        batch_op.create_index(batch_op.f('ix_products_subcategory_key'), ['subcategory_key'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_products_subcategory_key'))
+        batch_op.drop_index(batch_op.f('ix_products_category_key'))
+        batch_op.drop_index(batch_op.f('ix_products_brand_key'))
+        batch_op.create_index('ix_products_subcategory', ['subcategory'], unique=False)
+        batch_op.create_index('ix_products_category', ['category'], unique=False)
+        batch_op.create_index('ix_products_brand', ['brand'], unique=False)
+        for column in reversed(list(KEY_COLUMNS.values())):
+            batch_op.drop_column(column)
@@ -0,0 +1,54 @@
+"""cascade deletes
+
+Revision ID: 81c9f47e45eb
+Revises: c7ed785e4470
+Create Date: 2026-10-18 13:58:22.417305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '81c9f47e45eb'
+down_revision = 'c7ed785e4470'
+branch_labels = None
+depends_on = None
+
+# (table, column, referred table) of every foreign key that gets ON DELETE CASCADE
+FOREIGN_KEYS = [
+    ('messages', 'chat_session_id', 'chat_sessions'),
+    ('chat_sessions', 'user_id', 'users'),
+    ('cart', 'user_id', 'users'),
+    ('cart', 'product_id', 'products'),
+    ('user_likes', 'user_id', 'users'),
+    ('user_likes', 'product_id', 'products'),
+]
+
+# Lets SQLite batch mode address the foreign keys the first migration left unnamed
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+
+def _replace_foreign_keys(ondelete):
+    inspector = sa.inspect(op.get_bind())
+
+    for table, column, referred in FOREIGN_KEYS:
+        new_name = f'fk_{table}_{column}_{referred}'
+        existing_name = new_name
+        for foreign_key in inspector.get_foreign_keys(table):
+            if foreign_key['constrained_columns'] == [column] and foreign_key['name']:
+                existing_name = foreign_key['name']
+
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(existing_name, type_='foreignkey')
+            batch_op.create_foreign_key(new_name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
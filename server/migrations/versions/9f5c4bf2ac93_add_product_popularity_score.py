@@ -0,0 +1,122 @@
+"""add product popularity score
+
+Revision ID: 9f5c4bf2ac93
+Revises: bb9aa08fe0e0
+Create Date: 2026-10-19 02:05:18.264511
+
+"""
+import math
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f5c4bf2ac93'
+down_revision = 'bb9aa08fe0e0'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Default POPULARITY_* settings, as in models.product_popularity
+PRIOR_REVIEWS = 25.0
+REVIEW_WEIGHT = 0.05
+LIKE_WEIGHT = 0.1
+CART_WEIGHT = 0.1
+RECENCY_WEIGHT = 0.25
+RECENCY_HALF_LIFE_DAYS = 30.0
+PRECISION = 4
+
+
+def _score(rating, review_count, likes, cart_adds, created_at, prior, now):
+    # Same formula as models.product_popularity.score
+    reviews = review_count or 0
+    weight = PRIOR_REVIEWS + reviews
+    smoothed = (PRIOR_REVIEWS * prior + reviews * (rating or 0.0)) / weight
+    value = (
+        smoothed
+        + REVIEW_WEIGHT * math.log1p(reviews)
+        + LIKE_WEIGHT * math.log1p(likes)
+        + CART_WEIGHT * math.log1p(cart_adds)
+    )
+    age_days = 0.0
+    if created_at is not None:
+        age_days = max((now - created_at).total_seconds(), 0.0) / 86400
+    value += RECENCY_WEIGHT * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    return round(value, PRECISION)
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('popularity_score', sa.Float(), server_default='0', nullable=False))
+        batch_op.create_index('ix_products_active_popularity_id', ['is_active', 'popularity_score', 'id'], unique=False)
+
+    products = sa.table(
+        'products',
+        sa.column('id', sa.String),
+        sa.column('rating', sa.Float),
+        sa.column('review_count', sa.Integer),
+        sa.column('created_at', sa.DateTime),
+        sa.column('is_active', sa.Boolean),
+        sa.column('popularity_score', sa.Float),
+    )
+    user_likes = sa.table('user_likes', sa.column('product_id', sa.String))
+    cart = sa.table('cart', sa.column('product_id', sa.String))
+
+    bind = op.get_bind()
+    prior = bind.execute(
+        sa.select(sa.func.avg(products.c.rating)).where(
+            products.c.is_active == sa.true(), products.c.review_count > 0
+        )
+    ).scalar()
+    prior = float(prior) if prior is not None else 0.0
+    likes, cart_adds = (
+        dict(
+            bind.execute(
+                sa.select(table.c.product_id, sa.func.count()).group_by(
+                    table.c.product_id
+                )
+            ).fetchall()
+        )
+        for table in (user_likes, cart)
+    )
+    now = datetime.now()
+    rows = bind.execute(
+        sa.select(
+            products.c.id,
+            products.c.rating,
+            products.c.review_count,
+            products.c.created_at,
+        )
+    ).fetchall()
+    updates = [
+        {
+            'b_id': row.id,
+            'b_score': _score(
+                row.rating,
+                row.review_count,
+                likes.get(row.id, 0),
+                cart_adds.get(row.id, 0),
+                row.created_at,
+                prior,
+                now,
+            ),
+        }
+        for row in rows
+    ]
+    # A plain UPDATE leaves updated_at alone
+    statement = (
+        products.update()
+        .where(products.c.id == sa.bindparam('b_id'))
+        .values(popularity_score=sa.bindparam('b_score'))
+    )
+    for start in range(0, len(updates), BATCH_SIZE):
+        bind.execute(statement, updates[start:start + BATCH_SIZE])
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_active_popularity_id')
+        batch_op.drop_column('popularity_score')
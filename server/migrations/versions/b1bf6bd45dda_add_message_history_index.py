@@ -0,0 +1,26 @@
+"""add message history index
+
+Revision ID: b1bf6bd45dda
+Revises: 4b7e1f2a9c3d
+Create Date: 2026-10-18 10:04:17.530912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1bf6bd45dda'
+down_revision = '4b7e1f2a9c3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.create_index('ix_messages_session_created_at_id', ['chat_session_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_messages_session_created_at_id')
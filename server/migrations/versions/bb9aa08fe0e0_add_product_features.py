@@ -0,0 +1,101 @@
+"""add product features
+
+Revision ID: bb9aa08fe0e0
+Revises: 7166c008d3c8
+Create Date: 2026-10-19 01:22:40.603118
+
+"""
+import json
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bb9aa08fe0e0'
+down_revision = '7166c008d3c8'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+STOPWORDS = {'a', 'an', 'and', 'for', 'of', 'the', 'with'}
+
+
+def _singular(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith(('ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def _stem(word):
+    word = _singular(word)
+    for suffix in ('ation', 'ing', 'ed', 'e'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[: -len(suffix)]
+            break
+    if len(word) > 3 and word[-1] == word[-2]:
+        word = word[:-1]
+    return word
+
+
+def _terms(features):
+    # Same terms as models.product_feature.ProductFeature.terms
+    if isinstance(features, str):
+        try:
+            features = json.loads(features)
+        except json.JSONDecodeError:
+            return set()
+    terms = set()
+    for feature in features or []:
+        for word in re.findall(r'[a-z0-9]+', str(feature).lower()):
+            if word not in STOPWORDS:
+                terms.add(_stem(word) if word.isalpha() else word)
+    return {term[:100] for term in terms}
+
+
+def upgrade():
+    op.create_table('product_features',
+    sa.Column('term', sa.String(length=100), nullable=False),
+    sa.Column('product_id', sa.String(length=36), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('term', 'product_id')
+    )
+    with op.batch_alter_table('product_features', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_features_product_id'), ['product_id'], unique=False)
+
+    products = sa.table(
+        'products',
+        sa.column('id', sa.String),
+        sa.column('features', sa.Text),
+    )
+    features = sa.table(
+        'product_features',
+        sa.column('term', sa.String),
+        sa.column('product_id', sa.String),
+    )
+    bind = op.get_bind()
+    rows = []
+    for product_id, product_features in bind.execute(
+        sa.select(products.c.id, products.c.features)
+    ).fetchall():
+        rows.extend(
+            {'term': term, 'product_id': product_id}
+            for term in _terms(product_features)
+        )
+        if len(rows) >= BATCH_SIZE:
+            bind.execute(features.insert(), rows)
+            rows = []
+    if rows:
+        bind.execute(features.insert(), rows)
+
+
+def downgrade():
+    with op.batch_alter_table('product_features', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_features_product_id'))
+
+    op.drop_table('product_features')
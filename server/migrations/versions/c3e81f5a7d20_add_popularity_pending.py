@@ -0,0 +1,28 @@
+"""add popularity pending
+
+Revision ID: c3e81f5a7d20
+Revises: 6a2f9d4e8b17
+Create Date: 2026-10-19 14:08:51.624107
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e81f5a7d20'
+down_revision = '6a2f9d4e8b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('popularity_pending',
+    sa.Column('product_id', sa.String(length=36), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+
+
+def downgrade():
+    op.drop_table('popularity_pending')
@@ -0,0 +1,52 @@
+"""denormalize chat session stats
+
+Revision ID: c7ed785e4470
+Revises: d5e2a8c61f07
+Create Date: 2026-10-18 12:41:08.663390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7ed785e4470'
+down_revision = 'd5e2a8c61f07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_message_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('last_message_preview', sa.String(length=200), nullable=True))
+        batch_op.create_index('ix_chat_sessions_user_updated_at_id', ['user_id', 'updated_at', 'id'], unique=False)
+
+    op.execute(
+        """
+        UPDATE chat_sessions SET
+            message_count = (
+                SELECT COUNT(*) FROM messages
+                WHERE messages.chat_session_id = chat_sessions.id
+            ),
+            last_message_at = (
+                SELECT MAX(messages.created_at) FROM messages
+                WHERE messages.chat_session_id = chat_sessions.id
+            ),
+            last_message_preview = (
+                SELECT SUBSTR(messages.content, 1, 200) FROM messages
+                WHERE messages.chat_session_id = chat_sessions.id
+                ORDER BY messages.created_at DESC, messages.id DESC
+                LIMIT 1
+            )
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        batch_op.drop_index('ix_chat_sessions_user_updated_at_id')
+        batch_op.drop_column('last_message_preview')
+        batch_op.drop_column('last_message_at')
+        batch_op.drop_column('message_count')
@@ -0,0 +1,30 @@
+"""add catalog changes
+
+Revision ID: cf87bb2e8531
+Revises: d1b05ed3790e
+Create Date: 2026-10-18 15:20:47.903615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cf87bb2e8531'
+down_revision = 'd1b05ed3790e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_changes',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('product_id', sa.String(length=36), nullable=False),
+    sa.Column('operation', sa.String(length=10), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('catalog_changes')
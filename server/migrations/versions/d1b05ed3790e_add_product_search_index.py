@@ -0,0 +1,86 @@
+"""add product search index
+
+Revision ID: d1b05ed3790e
+Revises: 81c9f47e45eb
+Create Date: 2026-10-18 14:32:09.518240
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1b05ed3790e'
+down_revision = '81c9f47e45eb'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(brand, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(features, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        product_id UNINDEXED, name, brand, features, description,
+        tokenize = 'porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products
+    BEGIN
+        INSERT INTO products_fts (product_id, name, brand, features, description)
+        VALUES (new.id, new.name, new.brand, new.features, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products
+    BEGIN
+        DELETE FROM products_fts WHERE product_id = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF id, name, brand, features, description ON products
+    BEGIN
+        DELETE FROM products_fts WHERE product_id = old.id;
+        INSERT INTO products_fts (product_id, name, brand, features, description)
+        VALUES (new.id, new.name, new.brand, new.features, new.description);
+    END""",
+    "DELETE FROM products_fts",
+    """INSERT INTO products_fts (product_id, name, brand, features, description)
+    SELECT id, name, brand, features, description FROM products""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS products_fts_update',
+    'DROP TRIGGER IF EXISTS products_fts_delete',
+    'DROP TRIGGER IF EXISTS products_fts_insert',
+    'DROP TABLE IF EXISTS products_fts',
+]
+
+
+def upgrade():
+    # FTS5 table and triggers on SQLite, GIN expression index on PostgreSQL
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            'CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products '
+            f'USING GIN (({SEARCH_VECTOR_SQL}))'
+        )
+    elif bind.dialect.name == 'sqlite':
+        # Without FTS5 the application falls back to substring search
+        try:
+            for statement in SQLITE_DDL:
+                bind.execute(sa.text(statement))
+        except Exception as e:
+            logger.warning(f'SQLite FTS5 unavailable, skipping search index: {e}')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_products_search_vector')
+    elif bind.dialect.name == 'sqlite':
+        for statement in SQLITE_DROP:
+            bind.execute(sa.text(statement))
@@ -0,0 +1,96 @@
+"""add message products
+
+Revision ID: d5e2a8c61f07
+Revises: b1bf6bd45dda
+Create Date: 2026-10-18 11:26:53.204117
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e2a8c61f07'
+down_revision = 'b1bf6bd45dda'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    op.create_table('message_products',
+    sa.Column('message_id', sa.String(length=36), nullable=False),
+    sa.Column('position', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('product_id', sa.String(length=36), nullable=False),
+    sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('message_id', 'position')
+    )
+    with op.batch_alter_table('message_products', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_message_products_product_id'), ['product_id'], unique=False)
+
+    # Backfill from the JSON column, skipping IDs of products that no longer exist
+    connection = op.get_bind()
+    known_products = {
+        row[0] for row in connection.execute(sa.text('SELECT id FROM products'))
+    }
+    message_products = sa.table(
+        'message_products',
+        sa.column('message_id', sa.String),
+        sa.column('position', sa.Integer),
+        sa.column('product_id', sa.String),
+    )
+
+    rows = []
+    result = connection.execute(
+        sa.text("SELECT id, products FROM messages WHERE products IS NOT NULL AND products != '[]'")
+    ).fetchall()
+    for message_id, products in result:
+        try:
+            product_ids = json.loads(products) if products else []
+        except ValueError:
+            continue
+
+        position = 0
+        for product_id in dict.fromkeys(product_ids):
+            if product_id not in known_products:
+                continue
+            rows.append({'message_id': message_id, 'position': position, 'product_id': product_id})
+            position += 1
+
+        if len(rows) >= BATCH_SIZE:
+            op.bulk_insert(message_products, rows)
+            rows = []
+
+    if rows:
+        op.bulk_insert(message_products, rows)
+
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_column('products')
+
+
+def downgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('products', sa.Text(), nullable=True))
+
+    connection = op.get_bind()
+    product_ids = {}
+    result = connection.execute(
+        sa.text('SELECT message_id, product_id FROM message_products ORDER BY message_id, position')
+    )
+    for message_id, product_id in result:
+        product_ids.setdefault(message_id, []).append(product_id)
+
+    for message_id, ids in product_ids.items():
+        connection.execute(
+            sa.text('UPDATE messages SET products = :products WHERE id = :id'),
+            {'products': json.dumps(ids), 'id': message_id},
+        )
+
+    with op.batch_alter_table('message_products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_message_products_product_id'))
+
+    op.drop_table('message_products')
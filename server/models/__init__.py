@@ -1,12 +1,49 @@
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 
+
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite ignores ON DELETE CASCADE unless foreign keys are switched on"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 from .cart import Cart
+from .catalog_change import CatalogChange
+from .catalog_summary import CatalogSummary
+from .chat_job import ChatJob
 from .chat_session import ChatSession
+from .embedding_outbox import EmbeddingOutbox
+from .index_version import IndexVersion
 from .message import Message
+from .message_product import MessageProduct
+from .popularity_pending import PopularityPending
 from .product import Product
+from .product_feature import ProductFeature
 from .user import User
 from .user_like import UserLike
 
-__all__ = ["db", "User", "Product", "ChatSession", "Message", "Cart", "UserLike"]
+__all__ = [
+    "db",
+    "User",
+    "Product",
+    "ChatSession",
+    "Message",
+    "MessageProduct",
+    "Cart",
+    "UserLike",
+    "ChatJob",
+    "CatalogChange",
+    "CatalogSummary",
+    "EmbeddingOutbox",
+    "IndexVersion",
+    "PopularityPending",
+    "ProductFeature",
+]
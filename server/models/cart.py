@@ -7,8 +7,12 @@ class Cart(db.Model):
     __tablename__ = "cart"
 
     id = db.Column(db.String(36), primary_key=True)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False)
-    product_id = db.Column(db.String(36), db.ForeignKey("products.id"), nullable=False)
+    user_id = db.Column(
+        db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    product_id = db.Column(
+        db.String(36), db.ForeignKey("products.id", ondelete="CASCADE"), nullable=False
+    )
     quantity = db.Column(db.Integer, default=1, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now())
     updated_at = db.Column(
@@ -0,0 +1,128 @@
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from models import db, product_terms
+from models.product import Product
+
+
+class CatalogChange(db.Model):
+    """Append-only log of product writes; the latest ID is the catalog version
+
+    ORM inserts, updates and deletes of products are recorded automatically.
+    Bulk writers that bypass the ORM must call record() on the same connection
+    and mark_changed() on their session. Callbacks registered with on_commit()
+    run in the writing process after a commit that changed products, so its
+    caches can read their own writes.
+    """
+
+    __tablename__ = "catalog_changes"
+
+    OPERATION_UPSERT = "upsert"
+    OPERATION_DELETE = "delete"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    product_id = db.Column(db.String(36), nullable=False)
+    operation = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    @staticmethod
+    def record(connection, product_ids, operation=OPERATION_UPSERT):
+        """Append changes for the given products on an open connection"""
+        rows = [
+            {
+                "product_id": product_id,
+                "operation": operation,
+                "created_at": datetime.now(),
+            }
+            for product_id in product_ids
+        ]
+        if rows:
+            connection.execute(CatalogChange.__table__.insert(), rows)
+
+    @staticmethod
+    def current_version(connection=None) -> int:
+        """Get the current catalog version, 0 for an unchanged catalog"""
+        query = db.select(db.func.max(CatalogChange.id))
+        if connection is not None:
+            return connection.execute(query).scalar() or 0
+        return db.session.execute(query).scalar() or 0
+
+    @staticmethod
+    def current_state(connection=None):
+        """Get the current catalog version and when it was written"""
+        query = (
+            db.select(CatalogChange.id, CatalogChange.created_at)
+            .order_by(CatalogChange.id.desc())
+            .limit(1)
+        )
+        executor = connection if connection is not None else db.session
+        row = executor.execute(query).first()
+        return (row[0], row[1]) if row is not None else (0, None)
+
+    @staticmethod
+    def changed_since(version, connection=None):
+        """Get {product_id: last operation} after a version, and the latest version"""
+        query = (
+            db.select(
+                CatalogChange.id, CatalogChange.product_id, CatalogChange.operation
+            )
+            .where(CatalogChange.id > version)
+            .order_by(CatalogChange.id)
+        )
+        executor = connection if connection is not None else db.session
+        changes = {}
+        latest = version
+        for change_id, product_id, operation in executor.execute(query):
+            changes[product_id] = operation
+            latest = change_id
+        return changes, latest
+
+    @staticmethod
+    def mark_changed(session):
+        """Run the on_commit() callbacks when this session next commits"""
+        session.info["catalog_changed"] = True
+
+    @staticmethod
+    def on_commit(callback):
+        """Call callback() after each commit that wrote products in this process"""
+        if callback not in _commit_callbacks:
+            _commit_callbacks.append(callback)
+
+    def __repr__(self):
+        return f"<CatalogChange {self.id} {self.operation} {self.product_id}>"
+
+
+_commit_callbacks = [product_terms.invalidate]
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+def record_product_upsert(mapper, connection, target):
+    CatalogChange.record(connection, [target.id], CatalogChange.OPERATION_UPSERT)
+    _mark_target_changed(target)
+
+
+@event.listens_for(Product, "after_delete")
+def record_product_delete(mapper, connection, target):
+    CatalogChange.record(connection, [target.id], CatalogChange.OPERATION_DELETE)
+    _mark_target_changed(target)
+
+
+def _mark_target_changed(target):
+    session = object_session(target)
+    if session is not None:
+        CatalogChange.mark_changed(session)
+
+
+@event.listens_for(Session, "after_commit")
+def notify_catalog_commit(session):
+    if session.info.pop("catalog_changed", False):
+        for callback in _commit_callbacks:
+            callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_catalog_changes(session):
+    session.info.pop("catalog_changed", None)
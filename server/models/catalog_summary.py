@@ -0,0 +1,38 @@
+import json
+from datetime import datetime
+
+from models import db
+
+
+class CatalogSummary(db.Model):
+    """Persisted catalog aggregates, one row per catalog version"""
+
+    __tablename__ = "catalog_summaries"
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    @staticmethod
+    def load(version):
+        """Get the stored aggregates for a catalog version, or None"""
+        summary = db.session.get(CatalogSummary, version)
+        return json.loads(summary.payload) if summary is not None else None
+
+    @staticmethod
+    def store(version, aggregates):
+        """Store aggregates for a version and drop those of older versions"""
+        db.session.query(CatalogSummary).filter(
+            CatalogSummary.version < version
+        ).delete(synchronize_session=False)
+        db.session.add(
+            CatalogSummary(
+                version=version,
+                payload=json.dumps(aggregates),
+                created_at=datetime.now(),
+            )
+        )
+        db.session.commit()
+
+    def __repr__(self):
+        return f"<CatalogSummary {self.version}>"
@@ -0,0 +1,71 @@
+import json
+from datetime import datetime
+
+from models import db
+
+
+class ChatJob(db.Model):
+    __tablename__ = "chat_jobs"
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+
+    id = db.Column(db.String(36), primary_key=True)
+    chat_session_id = db.Column(db.String(36), nullable=False, index=True)
+    user_id = db.Column(db.String(36), nullable=True)
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default=STATUS_QUEUED, nullable=False)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    worker_id = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("ix_chat_jobs_status_created_at", "status", "created_at"),
+    )
+
+    def __init__(self, id, chat_session_id, message, user_id=None):
+        self.id = id
+        self.chat_session_id = chat_session_id
+        self.message = message
+        self.user_id = user_id
+        self.status = self.STATUS_QUEUED
+        self.attempts = 0
+        self.created_at = datetime.now()
+
+    def get_result(self):
+        """Get the chat response produced by the job as dict"""
+        try:
+            return json.loads(self.result) if self.result else None
+        except json.JSONDecodeError:
+            return None
+
+    def set_result(self, result_dict):
+        """Set the chat response produced by the job from dict"""
+        self.result = json.dumps(result_dict)
+
+    def is_finished(self):
+        """Check if the job reached a terminal state"""
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+    def to_dict(self):
+        """Convert chat job to dictionary"""
+        return {
+            "id": self.id,
+            "sessionId": self.chat_session_id,
+            "status": self.status,
+            "response": self.get_result(),
+            "error": self.error,
+            "attempts": self.attempts,
+            "createdAt": self.created_at.isoformat() if self.created_at else None,
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f"<ChatJob {self.id} {self.status}>"
@@ -8,22 +8,37 @@ class ChatSession(db.Model):
     __tablename__ = "chat_sessions"
 
     id = db.Column(db.String(36), primary_key=True)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=True)
-    session_data = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.now())
-    updated_at = db.Column(
-        db.DateTime, default=datetime.now(), onupdate=datetime.now()
+    user_id = db.Column(
+        db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True
     )
+    session_data = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     is_active = db.Column(db.Boolean, default=True)
+    message_count = db.Column(db.Integer, default=0, nullable=False)
+    last_message_at = db.Column(db.DateTime)
+    last_message_preview = db.Column(db.String(200))
+
+    __table_args__ = (
+        db.Index("ix_chat_sessions_user_updated_at_id", "user_id", "updated_at", "id"),
+    )
 
     messages = db.relationship(
-        "Message", backref="chat_session", lazy=True, cascade="all, delete-orphan"
+        "Message",
+        backref="chat_session",
+        lazy=True,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     def __init__(self, id, user_id=None, session_data=None):
         self.id = id
         self.user_id = user_id
         self.session_data = json.dumps(session_data or {})
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+        self.is_active = True
+        self.message_count = 0
 
     def get_session_data(self):
         """Get session data as dict"""
@@ -38,8 +53,8 @@ class ChatSession(db.Model):
         self.updated_at = datetime.utcnow()
 
     def get_message_count(self):
-        """Get total message count in session"""
-        return len(self.messages)
+        """Get total message count in session (maintained on message insert)"""
+        return self.message_count or 0
 
     def get_recent_messages(self, limit=10):
         """Get recent messages from session"""
@@ -52,18 +67,24 @@ class ChatSession(db.Model):
             .all()
         )
 
-    def to_dict(self, include_messages=False):
+    def to_dict(self, include_messages=False, include_session_data=True):
         """Convert chat session to dictionary"""
         data = {
             "id": self.id,
             "userId": self.user_id,
-            "sessionData": self.get_session_data(),
             "messageCount": self.get_message_count(),
+            "lastMessageAt": self.last_message_at.isoformat()
+            if self.last_message_at
+            else None,
+            "lastMessagePreview": self.last_message_preview,
             "createdAt": self.created_at.isoformat(),
             "updatedAt": self.updated_at.isoformat(),
             "isActive": self.is_active,
         }
 
+        if include_session_data:
+            data["sessionData"] = self.get_session_data()
+
         if include_messages:
             data["messages"] = [msg.to_dict() for msg in self.messages]
 
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+
+from models import db
+from models.product import Product
+
+# Product columns that feed the embedding text; a change re-embeds the product
+TEXT_COLUMNS = (
+    "name",
+    "description",
+    "features",
+    "category",
+    "subcategory",
+    "brand",
+    "is_active",
+)
+
+# Product columns only carried as vector metadata; a change updates it in place
+METADATA_COLUMNS = ("price", "rating", "stock")
+
+INDEXED_COLUMNS = TEXT_COLUMNS + METADATA_COLUMNS
+
+
+class EmbeddingOutbox(db.Model):
+    """Pending vector index updates, written in the same transaction as products
+
+    ORM writes that change indexed columns enqueue a row automatically. Bulk
+    writers that bypass the ORM must call enqueue() on the same connection.
+    Changes to the embedding text queue an upsert, which re-embeds the
+    product. Changes that only reach the vector metadata (price, rating,
+    whether it is in stock) queue a metadata update, which skips inference.
+    The embedding indexer drains the rows; a row is only deleted once the
+    index reflects the product.
+    """
+
+    __tablename__ = "embedding_outbox"
+
+    OPERATION_UPSERT = "upsert"
+    OPERATION_DELETE = "delete"
+    OPERATION_METADATA = "metadata"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    product_id = db.Column(db.String(36), nullable=False, index=True)
+    operation = db.Column(db.String(10), nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    claimed_by = db.Column(db.String(100))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index("ix_embedding_outbox_available_at_id", "available_at", "id"),
+    )
+
+    @staticmethod
+    def enqueue(connection, product_ids, operation=OPERATION_UPSERT):
+        """Append index updates for the given products on an open connection"""
+        now = datetime.now()
+        rows = [
+            {
+                "product_id": product_id,
+                "operation": operation,
+                "attempts": 0,
+                "available_at": now,
+                "created_at": now,
+            }
+            for product_id in product_ids
+        ]
+        if rows:
+            connection.execute(EmbeddingOutbox.__table__.insert(), rows)
+
+    def __repr__(self):
+        return f"<EmbeddingOutbox {self.id} {self.operation} {self.product_id}>"
+
+
+@event.listens_for(Product, "after_insert")
+def enqueue_product_insert(mapper, connection, target):
+    EmbeddingOutbox.enqueue(connection, [target.id])
+
+
+def operation_for(changed, old_stock=None, new_stock=None):
+    """Outbox operation for a product whose columns in changed were written
+
+    None when nothing indexed changed. A stock change only matters when the
+    product goes in or out of stock; an unknown old_stock counts as one.
+    """
+    if any(name in changed for name in TEXT_COLUMNS):
+        return EmbeddingOutbox.OPERATION_UPSERT
+    if "price" in changed or "rating" in changed:
+        return EmbeddingOutbox.OPERATION_METADATA
+    if "stock" in changed and (
+        old_stock is None or (old_stock > 0) != ((new_stock or 0) > 0)
+    ):
+        return EmbeddingOutbox.OPERATION_METADATA
+    return None
+
+
+@event.listens_for(Product, "after_update")
+def enqueue_product_update(mapper, connection, target):
+    state = inspect(target)
+    changed = {
+        name for name in INDEXED_COLUMNS if state.attrs[name].history.has_changes()
+    }
+    stock = state.attrs["stock"].history
+    operation = operation_for(
+        changed, stock.deleted[0] if stock.deleted else None, target.stock
+    )
+    if operation is not None:
+        EmbeddingOutbox.enqueue(connection, [target.id], operation)
+
+
+@event.listens_for(Product, "after_delete")
+def enqueue_product_delete(mapper, connection, target):
+    EmbeddingOutbox.enqueue(connection, [target.id], EmbeddingOutbox.OPERATION_DELETE)
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from models import db
+
+
+class IndexVersion(db.Model):
+    """Version counters of indexes that change outside the catalog change log
+
+    The embedding indexer bumps "vector" in the same commit as each batch that
+    changed Pinecone. Caches of vector results key on it, since the catalog
+    version moves when a product is written, not when its vector lands.
+    """
+
+    __tablename__ = "index_versions"
+
+    VECTOR = "vector"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now)
+
+    @staticmethod
+    def bump(connection, name):
+        """Increment a version on an open connection, creating it if missing"""
+        table = IndexVersion.__table__
+        updated = connection.execute(
+            table.update()
+            .where(table.c.name == name)
+            .values(version=table.c.version + 1, updated_at=datetime.now())
+        ).rowcount
+        if not updated:
+            connection.execute(
+                table.insert(),
+                {"name": name, "version": 1, "updated_at": datetime.now()},
+            )
+
+    @staticmethod
+    def current(name, connection=None) -> int:
+        """Get a version, 0 if it was never bumped"""
+        query = db.select(IndexVersion.version).where(IndexVersion.name == name)
+        executor = connection if connection is not None else db.session
+        return executor.execute(query).scalar() or 0
+
+    def __repr__(self):
+        return f"<IndexVersion {self.name} {self.version}>"
@@ -3,20 +3,37 @@ from datetime import datetime
 
 from models import db
 
+from .message_product import MessageProduct
+
 
 class Message(db.Model):
     __tablename__ = "messages"
 
     id = db.Column(db.String(36), primary_key=True)
     chat_session_id = db.Column(
-        db.String(36), db.ForeignKey("chat_sessions.id"), nullable=False
+        db.String(36),
+        db.ForeignKey("chat_sessions.id", ondelete="CASCADE"),
+        nullable=False,
     )
     content = db.Column(db.Text, nullable=False)
     is_bot = db.Column(db.Boolean, default=False)
     message_type = db.Column(db.String(50), default="text")
-    products = db.Column(db.Text)
     extra_data = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.now())
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    product_links = db.relationship(
+        "MessageProduct",
+        order_by="MessageProduct.position",
+        lazy=True,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    __table_args__ = (
+        db.Index(
+            "ix_messages_session_created_at_id", "chat_session_id", "created_at", "id"
+        ),
+    )
 
     def __init__(
         self,
@@ -33,19 +50,24 @@ class Message(db.Model):
         self.content = content
         self.is_bot = is_bot
         self.message_type = message_type
-        self.products = json.dumps(products or [])
+        self.set_products(products or [])
         self.extra_data = json.dumps(extra_data or {})
+        self.created_at = datetime.now()
 
     def get_products(self):
-        """Get product IDs as list"""
-        try:
-            return json.loads(self.products) if self.products else []
-        except json.JSONDecodeError:
-            return []
+        """Get product IDs as list, in display order"""
+        product_ids = getattr(self, "_product_ids", None)
+        if product_ids is not None:
+            return list(product_ids)
+        return [link.product_id for link in self.product_links]
 
     def set_products(self, product_ids):
         """Set product IDs from list"""
-        self.products = json.dumps(product_ids)
+        self._product_ids = list(product_ids)
+        self.product_links = [
+            MessageProduct(position=position, product_id=product_id)
+            for position, product_id in enumerate(self._product_ids)
+        ]
 
     def get_extra_data(self):
         """Get extra data as dict"""
@@ -58,22 +80,68 @@ class Message(db.Model):
         """Set extra data from dict"""
         self.extra_data = json.dumps(extra_data_dict)
 
-    def to_dict(self, include_product_details=False):
-        """Convert message to dictionary"""
-        # Get product IDs by default
-        products_data = self.get_products()
-        
-        # If include_product_details is True, replace IDs with full product objects
-        if include_product_details and self.get_products():
-            from .product import Product
-
-            product_details = []
-            for product_id in self.get_products():
-                product = Product.query.get(product_id)
-                if product:
-                    product_details.append(product.to_dict())
-            # Replace the product IDs with full product objects
-            products_data = product_details
+    @staticmethod
+    def load_products(product_ids):
+        """Load product dicts for the given IDs with a single IN query"""
+        from . import product_cache
+        from .product import Product
+
+        if not product_ids:
+            return {}
+
+        products = Product.query.filter(Product.id.in_(set(product_ids))).all()
+        return {product.id: product_cache.to_dict(product) for product in products}
+
+    @staticmethod
+    def hydrate_products(messages):
+        """Map each message ID to its product dicts, joining a whole page at once"""
+        from . import product_cache
+        from .product import Product
+
+        result = {message.id: [] for message in messages}
+        stored_ids = {
+            message.id
+            for message in messages
+            if getattr(message, "_product_ids", None) is None
+        }
+        product_dicts = {}
+
+        if stored_ids:
+            rows = (
+                db.session.query(MessageProduct.message_id, Product)
+                .join(Product, Product.id == MessageProduct.product_id)
+                .filter(MessageProduct.message_id.in_(stored_ids))
+                .order_by(MessageProduct.message_id, MessageProduct.position)
+                .all()
+            )
+            for message_id, product in rows:
+                if product.id not in product_dicts:
+                    product_dicts[product.id] = product_cache.to_dict(product)
+                result[message_id].append(product_dicts[product.id])
+
+        # Messages still waiting in the write buffer carry their IDs in memory
+        unsaved = [message for message in messages if message.id not in stored_ids]
+        unsaved_ids = {pid for message in unsaved for pid in message.get_products()}
+        product_dicts.update(
+            Message.load_products(unsaved_ids - set(product_dicts))
+        )
+        for message in unsaved:
+            result[message.id] = [
+                product_dicts[pid]
+                for pid in message.get_products()
+                if pid in product_dicts
+            ]
+
+        return result
+
+    def to_dict(self, include_product_details=False, products=None):
+        """Convert message to dictionary, using preloaded products when given"""
+        if include_product_details:
+            if products is None:
+                products = Message.hydrate_products([self])[self.id]
+            products_data = products
+        else:
+            products_data = self.get_products()
 
         data = {
             "id": self.id,
@@ -0,0 +1,62 @@
+from models import db
+
+
+class MessageProduct(db.Model):
+    __tablename__ = "message_products"
+
+    message_id = db.Column(
+        db.String(36),
+        db.ForeignKey("messages.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    position = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    product_id = db.Column(
+        db.String(36),
+        db.ForeignKey("products.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    product = db.relationship("Product", lazy=True)
+
+    @staticmethod
+    def impression_counts(since=None, limit=20):
+        """Count chat messages and sessions that showed each product"""
+        from .message import Message
+
+        query = db.session.query(
+            MessageProduct.product_id,
+            db.func.count(MessageProduct.message_id).label("impressions"),
+            db.func.count(db.distinct(Message.chat_session_id)).label("sessions"),
+        ).join(Message, Message.id == MessageProduct.message_id)
+
+        if since is not None:
+            query = query.filter(Message.created_at >= since)
+
+        rows = (
+            query.group_by(MessageProduct.product_id)
+            .order_by(db.desc("impressions"))
+            .limit(limit)
+            .all()
+        )
+        return [
+            {"product_id": product_id, "impressions": impressions, "sessions": sessions}
+            for product_id, impressions, sessions in rows
+        ]
+
+    @staticmethod
+    def sessions_for_product(product_id):
+        """Get IDs of chat sessions in which a product was shown"""
+        from .message import Message
+
+        rows = (
+            db.session.query(Message.chat_session_id)
+            .join(MessageProduct, MessageProduct.message_id == Message.id)
+            .filter(MessageProduct.product_id == product_id)
+            .distinct()
+            .all()
+        )
+        return [session_id for (session_id,) in rows]
+
+    def __repr__(self):
+        return f"<MessageProduct {self.message_id}#{self.position} {self.product_id}>"
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from models import db
+
+
+class PopularityPending(db.Model):
+    """Products whose popularity score moved but is not in the change log yet
+
+    Likes and cart writes rescore products in place and add them here instead
+    of recording a catalog change, so engagement traffic does not move the
+    catalog version. product_popularity.publish_pending() moves them into the
+    change log in batches.
+    """
+
+    __tablename__ = "popularity_pending"
+
+    product_id = db.Column(db.String(36), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    @staticmethod
+    def add(connection, product_ids):
+        """Add products on an open connection, ignoring those already pending"""
+        rows = [
+            {"product_id": product_id, "created_at": datetime.now()}
+            for product_id in dict.fromkeys(product_ids)
+        ]
+        if not rows:
+            return
+
+        table = PopularityPending.__table__
+        dialect = connection.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            pending = set(
+                connection.execute(
+                    db.select(table.c.product_id).where(
+                        table.c.product_id.in_([row["product_id"] for row in rows])
+                    )
+                ).scalars()
+            )
+            rows = [row for row in rows if row["product_id"] not in pending]
+            if rows:
+                connection.execute(table.insert(), rows)
+            return
+
+        connection.execute(insert(table).on_conflict_do_nothing(), rows)
+
+    def __repr__(self):
+        return f"<PopularityPending {self.product_id}>"
@@ -1,7 +1,9 @@
 import json
 from datetime import datetime
 
-from models import db
+from sqlalchemy import event
+
+from models import db, product_search, product_terms
 
 
 class Product(db.Model):
@@ -12,9 +14,13 @@ class Product(db.Model):
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Float, nullable=False, index=True)
     original_price = db.Column(db.Float)
-    category = db.Column(db.String(100), nullable=False, index=True)
-    subcategory = db.Column(db.String(100), nullable=False, index=True)
-    brand = db.Column(db.String(100), nullable=False, index=True)
+    category = db.Column(db.String(100), nullable=False)
+    subcategory = db.Column(db.String(100), nullable=False)
+    brand = db.Column(db.String(100), nullable=False)
+    # Normalized copies of category, subcategory and brand that filters match exactly
+    category_key = db.Column(db.String(100), index=True)
+    subcategory_key = db.Column(db.String(100), index=True)
+    brand_key = db.Column(db.String(100), index=True)
     rating = db.Column(db.Float, default=0.0, index=True)
     review_count = db.Column(db.Integer, default=0)
     image_url = db.Column(db.String(500))
@@ -22,14 +28,63 @@ class Product(db.Model):
     features = db.Column(db.Text)
     is_on_sale = db.Column(db.Boolean, default=False, index=True)
     sale_percentage = db.Column(db.Integer)
-    created_at = db.Column(db.DateTime, default=datetime.now())
-    updated_at = db.Column(
-        db.DateTime, default=datetime.now(), onupdate=datetime.now()
-    )
+    discount_percentage = db.Column(db.Integer, default=0, nullable=False)
+    # Maintained by models.product_popularity
+    popularity_score = db.Column(db.Float, default=0.0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     is_active = db.Column(db.Boolean, default=True, index=True)
 
     embedding_id = db.Column(db.String(100))
 
+    # Listing sorts: name -> (column, descending); keyset pages on (column, id)
+    SORTS = {
+        "rating": ("rating", True),
+        "popularity": ("popularity_score", True),
+        "price_asc": ("price", False),
+        "price_desc": ("price", True),
+        "newest": ("created_at", True),
+        "discount": ("discount_percentage", True),
+    }
+
+    # features filter modes: every requested feature, or at least one
+    FEATURE_MODES = ("all", "any")
+
+    # Keys of to_dict() that can be requested as sparse fields; id is always sent
+    FIELDS = (
+        "id",
+        "name",
+        "description",
+        "price",
+        "originalPrice",
+        "category",
+        "subcategory",
+        "brand",
+        "rating",
+        "reviewCount",
+        "imageUrl",
+        "stock",
+        "features",
+        "isOnSale",
+        "salePercentage",
+        "createdAt",
+        "updatedAt",
+        "isActive",
+        "inStock",
+    )
+
+    __table_args__ = (
+        db.Index("ix_products_active_rating_id", "is_active", "rating", "id"),
+        db.Index("ix_products_active_price_id", "is_active", "price", "id"),
+        db.Index("ix_products_active_created_at_id", "is_active", "created_at", "id"),
+        db.Index(
+            "ix_products_active_discount_id", "is_active", "discount_percentage", "id"
+        ),
+        db.Index(
+            "ix_products_active_popularity_id", "is_active", "popularity_score", "id"
+        ),
+    )
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             if key == "features" and isinstance(value, list):
@@ -54,14 +109,30 @@ class Product(db.Model):
         features_text = " ".join(self.get_features())
         return f"{self.name} {self.description} {self.brand} {self.category} {self.subcategory} {features_text}"
 
+    @staticmethod
+    def feature_list(features):
+        """Read a features filter given as a list or a comma-separated string"""
+        if isinstance(features, str):
+            features = features.split(",")
+        return [str(feature).strip() for feature in features if str(feature).strip()]
+
     def calculate_discount(self):
         """Calculate discount percentage"""
-        if self.original_price and self.original_price > self.price:
-            return round(
-                ((self.original_price - self.price) / self.original_price) * 100
-            )
+        return Product.discount_for(self.price, self.original_price)
+
+    @staticmethod
+    def discount_for(price, original_price):
+        """Discount percentage of a price against its original price"""
+        if original_price and original_price > price:
+            return round(((original_price - price) / original_price) * 100)
         return 0
 
+    def update_derived_columns(self):
+        """Recompute stored columns derived from other fields, used for sorting"""
+        self.discount_percentage = self.sale_percentage or self.calculate_discount()
+        for name, column in product_terms.KEY_COLUMNS.items():
+            setattr(self, column, product_terms.normalize(getattr(self, name)))
+
     def is_in_stock(self):
         """Check if product is in stock"""
         return self.stock > 0
@@ -96,7 +167,13 @@ class Product(db.Model):
         return data
 
     @staticmethod
-    def search_by_filters(
+    def search_by_filters(limit=50, **filters):
+        """Search products with filters, ranking full-text matches by relevance"""
+        query = Product.filter_query(**filters)
+        return query.order_by(Product.rating.desc()).limit(limit).all()
+
+    @staticmethod
+    def filter_query(
         category=None,
         subcategory=None,
         brand=None,
@@ -105,19 +182,33 @@ class Product(db.Model):
         min_rating=None,
         in_stock_only=False,
         search_query=None,
-        limit=50,
+        features=None,
+        features_mode="all",
     ):
-        """Search products with filters"""
+        """Build the filtered product query; full-text matches come ordered by rank
+
+        category, subcategory and brand are resolved to catalog keys and matched
+        exactly on the indexed *_key columns. features go through the
+        product_features index. Raises ValueError for an unknown features_mode.
+        """
         query = Product.query.filter(Product.is_active == True)
 
         if category:
-            query = query.filter(Product.category.ilike(f"%{category}%"))
+            query = query.filter(
+                Product.category_key.in_(product_terms.resolve("category", category))
+            )
 
         if subcategory:
-            query = query.filter(Product.subcategory.ilike(f"%{subcategory}%"))
+            query = query.filter(
+                Product.subcategory_key.in_(
+                    product_terms.resolve("subcategory", subcategory)
+                )
+            )
 
         if brand:
-            query = query.filter(Product.brand.ilike(f"%{brand}%"))
+            query = query.filter(
+                Product.brand_key.in_(product_terms.resolve("brand", brand))
+            )
 
         if min_price is not None:
             query = query.filter(Product.price >= min_price)
@@ -131,18 +222,39 @@ class Product(db.Model):
         if in_stock_only:
             query = query.filter(Product.stock > 0)
 
+        if features:
+            from models.product_feature import ProductFeature
+
+            if features_mode not in Product.FEATURE_MODES:
+                raise ValueError(f"Unknown features_mode: {features_mode}")
+            condition = ProductFeature.match(
+                Product.id, Product.feature_list(features), features_mode
+            )
+            if condition is not None:
+                query = query.filter(condition)
+
         if search_query:
-            search_term = f"%{search_query}%"
-            query = query.filter(
-                db.or_(
-                    Product.name.ilike(search_term),
-                    Product.description.ilike(search_term),
-                    Product.brand.ilike(search_term),
-                    Product.features.ilike(search_term),
+            ranked = product_search.apply_search(query, search_query)
+            if ranked is not None:
+                query = ranked
+            else:
+                search_term = f"%{search_query}%"
+                query = query.filter(
+                    db.or_(
+                        Product.name.ilike(search_term),
+                        Product.description.ilike(search_term),
+                        Product.brand.ilike(search_term),
+                        Product.features.ilike(search_term),
+                    )
                 )
-            )
 
-        return query.order_by(Product.rating.desc()).limit(limit).all()
+        return query
 
     def __repr__(self):
         return f"<Product {self.name}>"
+
+
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def update_product_derived_columns(mapper, connection, target):
+    target.update_derived_columns()
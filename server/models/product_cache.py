@@ -0,0 +1,108 @@
+"""Cache of ready-to-emit product representations.
+
+Entries are keyed by product ID and stamped with the product's updated_at, so
+a product written by any process is re-serialized on its next read here. ORM
+writes in this process also drop the entry right away. The cached dicts are
+shared: callers must copy them before adding keys.
+"""
+
+from sqlalchemy import event
+
+from models.product import Product
+from utils import fast_json, tracing
+from utils.cache import LRUCache
+
+_cache = LRUCache(max_size=10000)
+
+
+def init_app(app):
+    """Size the cache from the application config"""
+    _cache.max_size = app.config["PRODUCT_CACHE_SIZE"]
+
+
+def _entry(product: Product):
+    entry = _cache.get(product.id)
+    if entry is not None and entry[0] == product.updated_at:
+        return entry
+
+    data = product.to_dict()
+    entry = (product.updated_at, data, fast_json.raw(fast_json.dumps(data)))
+    if product.updated_at is not None:
+        _cache.set(product.id, entry)
+    return entry
+
+
+def to_dict(product: Product) -> dict:
+    """Get the product's to_dict() output, shared and not to be mutated"""
+    return _entry(product)[1]
+
+
+def fragment(product: Product):
+    """Get the product's JSON as a fragment for fast_json.response()"""
+    return _entry(product)[2]
+
+
+def fragments(products, fields=None):
+    """Get JSON fragments for a list of products, optionally with only some fields"""
+    with tracing.span("serialize.products"):
+        return [_emit(_entry(product), fields) for product in products]
+
+
+def warm(products):
+    """Refresh the entries of products that were just loaded"""
+    for product in products:
+        _entry(product)
+
+
+def fragments_by_id(product_ids, load, fields=None):
+    """Get JSON fragments by product ID, loading only the products not cached
+
+    Cached entries are used without checking updated_at, so the IDs must come
+    from a result computed at the current catalog version whose products were
+    passed to warm(). load(ids) returns the products for the other IDs; IDs it
+    does not return are left out.
+    """
+    with tracing.span("serialize.products"):
+        return [_emit(entry, fields) for entry in _entries_by_id(product_ids, load)]
+
+
+def to_dicts_by_id(product_ids, load):
+    """Like fragments_by_id(), but get the shared to_dict() outputs"""
+    return [entry[1] for entry in _entries_by_id(product_ids, load)]
+
+
+def _entries_by_id(product_ids, load):
+    entries = {}
+    missing = []
+    for product_id in product_ids:
+        entry = _cache.get(product_id)
+        if entry is None:
+            missing.append(product_id)
+        else:
+            entries[product_id] = entry
+
+    if missing:
+        for product in load(missing):
+            entries[product.id] = _entry(product)
+
+    return [entries[product_id] for product_id in product_ids if product_id in entries]
+
+
+def _emit(entry, fields):
+    if not fields:
+        return entry[2]
+    return {name: entry[1][name] for name in fields}
+
+
+def invalidate(product_id: str):
+    _cache.delete(product_id)
+
+
+def stats():
+    return _cache.stats()
+
+
+@event.listens_for(Product, "after_update")
+@event.listens_for(Product, "after_delete")
+def invalidate_product_representation(mapper, connection, target):
+    invalidate(target.id)
@@ -0,0 +1,101 @@
+import json
+
+from sqlalchemy import event, inspect
+
+from models import db, product_terms
+from models.product import Product
+
+
+class ProductFeature(db.Model):
+    """Inverted index of product feature terms: one row per (term, product)
+
+    The primary key keeps each term's posting list contiguous, so a feature
+    filter is one index range scan per term. ORM writes to a product's
+    features rewrite its rows automatically; bulk writers that bypass the ORM
+    must call replace() on the same connection.
+    """
+
+    __tablename__ = "product_features"
+
+    term = db.Column(db.String(100), primary_key=True)
+    product_id = db.Column(
+        db.String(36),
+        db.ForeignKey("products.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+
+    @staticmethod
+    def terms(features) -> set:
+        """Index terms of a product's features, given as a list or JSON text"""
+        if isinstance(features, str):
+            try:
+                features = json.loads(features)
+            except json.JSONDecodeError:
+                return set()
+        terms = set()
+        for feature in features or []:
+            terms.update(product_terms.feature_terms(feature))
+        return {term[:100] for term in terms}
+
+    @staticmethod
+    def replace(connection, features_by_id):
+        """Rewrite the rows of the given products from {id: features}"""
+        if not features_by_id:
+            return
+
+        table = ProductFeature.__table__
+        connection.execute(
+            table.delete().where(table.c.product_id.in_(list(features_by_id)))
+        )
+        rows = [
+            {"term": term, "product_id": product_id}
+            for product_id, features in features_by_id.items()
+            for term in ProductFeature.terms(features)
+        ]
+        if rows:
+            connection.execute(table.insert(), rows)
+
+    @staticmethod
+    def match(id_column, features, mode="all"):
+        """SQL condition on a product ID column for a features filter
+
+        Each requested feature matches products whose features contain all of
+        its terms; mode "all" requires every feature, "any" at least one.
+        """
+        groups = [
+            terms
+            for terms in (product_terms.feature_terms(feature) for feature in features)
+            if terms
+        ]
+        if not groups:
+            return None
+
+        def posting(term):
+            return id_column.in_(
+                db.select(ProductFeature.product_id).where(ProductFeature.term == term)
+            )
+
+        if mode == "all":
+            terms = dict.fromkeys(term for group in groups for term in group)
+            return db.and_(*[posting(term) for term in terms])
+        return db.or_(*[db.and_(*[posting(term) for term in group]) for group in groups])
+
+    def __repr__(self):
+        return f"<ProductFeature {self.term} {self.product_id}>"
+
+
+@event.listens_for(Product, "after_insert")
+def index_product_features(mapper, connection, target):
+    ProductFeature.replace(connection, {target.id: target.features})
+
+
+@event.listens_for(Product, "after_update")
+def reindex_product_features(mapper, connection, target):
+    if inspect(target).attrs.features.history.has_changes():
+        ProductFeature.replace(connection, {target.id: target.features})
+
+
+@event.listens_for(Product, "after_delete")
+def remove_product_features(mapper, connection, target):
+    ProductFeature.replace(connection, {target.id: None})
@@ -0,0 +1,298 @@
+"""Materialized popularity score used to rank products.
+
+products.popularity_score adds up, for each product:
+
+- its rating smoothed towards the catalog mean rating (a Bayesian average
+  with POPULARITY_PRIOR_REVIEWS virtual reviews), so a 5.0 from 2 reviews
+  ranks below a 4.7 from 20,000;
+- the log of its review count, like count and cart adds, each weighted;
+- a recency boost that halves every POPULARITY_RECENCY_HALF_LIFE_DAYS.
+
+ORM writes to a product's rating or review count rescore it in the same
+UPDATE. Writers of likes and cart items call refresh() before committing,
+and bulk writers of products call update_scores() on their connection.
+Recency and the catalog mean drift on their own, so a batch job rescores
+the whole catalog with recompute_all(). Only scores that moved are written.
+
+Scores rescored by recompute_all() go into the catalog change log like any
+product write. Engagement is too frequent for that: each like would move
+the catalog version and invalidate every cache keyed on it. refresh() only
+marks its products pending, and publish_pending() records them in the
+change log one batch, and one version, at a time.
+"""
+
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import event, inspect
+
+from models import db
+from models.cart import Cart
+from models.catalog_change import CatalogChange
+from models.popularity_pending import PopularityPending
+from models.product import Product
+from models.user_like import UserLike
+
+logger = logging.getLogger(__name__)
+
+# Seconds the catalog mean rating is reused as the prior between rescores
+PRIOR_REFRESH_INTERVAL = 3600.0
+
+# Scores are stored rounded, so rescoring an unchanged product writes nothing
+PRECISION = 4
+
+# Product columns the score reads; an ORM write to one of them rescores
+SCORED_COLUMNS = ("rating", "review_count", "created_at")
+
+_settings = {
+    "prior_reviews": 25.0,
+    "review_weight": 0.05,
+    "like_weight": 0.1,
+    "cart_weight": 0.1,
+    "recency_weight": 0.25,
+    "recency_half_life_days": 30.0,
+}
+_prior = None
+_prior_at = 0.0
+_lock = threading.Lock()
+
+
+def init_app(app):
+    """Read the score weights from the application config"""
+    config = app.config
+    _settings.update(
+        prior_reviews=config["POPULARITY_PRIOR_REVIEWS"],
+        review_weight=config["POPULARITY_REVIEW_WEIGHT"],
+        like_weight=config["POPULARITY_LIKE_WEIGHT"],
+        cart_weight=config["POPULARITY_CART_WEIGHT"],
+        recency_weight=config["POPULARITY_RECENCY_WEIGHT"],
+        recency_half_life_days=config["POPULARITY_RECENCY_HALF_LIFE_DAYS"],
+    )
+
+
+def score(
+    rating, review_count, likes, cart_adds, created_at, prior_rating, now=None
+) -> float:
+    """Popularity score of a product; created_at None counts as brand new"""
+    settings = _settings
+    reviews = review_count or 0
+    weight = settings["prior_reviews"] + reviews
+    smoothed = (
+        (settings["prior_reviews"] * prior_rating + reviews * (rating or 0.0)) / weight
+        if weight
+        else 0.0
+    )
+
+    value = (
+        smoothed
+        + settings["review_weight"] * math.log1p(reviews)
+        + settings["like_weight"] * math.log1p(likes)
+        + settings["cart_weight"] * math.log1p(cart_adds)
+    )
+
+    age_days = 0.0
+    if created_at is not None:
+        now = now or datetime.now()
+        age_days = max((now - created_at).total_seconds(), 0.0) / 86400
+    value += settings["recency_weight"] * 0.5 ** (
+        age_days / settings["recency_half_life_days"]
+    )
+    return round(value, PRECISION)
+
+
+def prior_rating(connection=None, refresh: bool = False) -> float:
+    """Mean rating of reviewed active products, cached between rescores"""
+    global _prior, _prior_at
+
+    if (
+        not refresh
+        and _prior is not None
+        and time.monotonic() - _prior_at < PRIOR_REFRESH_INTERVAL
+    ):
+        return _prior
+
+    with _lock:
+        query = db.select(db.func.avg(Product.rating)).where(
+            Product.is_active == True, Product.review_count > 0
+        )
+        executor = connection if connection is not None else db.session
+        mean = executor.execute(query).scalar()
+        if mean is None:
+            return 0.0  # nothing reviewed yet; ask again next time
+        _prior = float(mean)
+        _prior_at = time.monotonic()
+        return _prior
+
+
+def engagement(connection, product_ids):
+    """Get ({id: like count}, {id: cart adds}) for the given products"""
+    counts = []
+    for model in (UserLike, Cart):
+        rows = connection.execute(
+            db.select(model.product_id, db.func.count())
+            .where(model.product_id.in_(product_ids))
+            .group_by(model.product_id)
+        )
+        counts.append(dict(rows.all()))
+    return counts[0], counts[1]
+
+
+def update_scores(connection, product_ids, prior=None) -> List[str]:
+    """Rescore products on an open connection; get the IDs whose score changed
+
+    The caller records the changed products in the catalog change log.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return []
+
+    table = Product.__table__
+    rows = connection.execute(
+        db.select(
+            table.c.id,
+            table.c.rating,
+            table.c.review_count,
+            table.c.created_at,
+            table.c.popularity_score,
+        ).where(table.c.id.in_(product_ids))
+    ).all()
+    likes, carts = engagement(connection, product_ids)
+    prior = prior_rating(connection) if prior is None else prior
+    now = datetime.now()
+
+    updates = []
+    for row in rows:
+        value = score(
+            row.rating,
+            row.review_count,
+            likes.get(row.id, 0),
+            carts.get(row.id, 0),
+            row.created_at,
+            prior,
+            now,
+        )
+        if value != row.popularity_score:
+            updates.append({"_id": row.id, "_score": value})
+
+    if updates:
+        # Keep updated_at: the score is not part of the product's representation
+        connection.execute(
+            table.update()
+            .where(table.c.id == db.bindparam("_id"))
+            .values(
+                popularity_score=db.bindparam("_score"),
+                updated_at=table.c.updated_at,
+            ),
+            updates,
+        )
+    return [update["_id"] for update in updates]
+
+
+def refresh(session, product_ids) -> List[str]:
+    """Rescore products in the session's transaction, after a like or cart write
+
+    Rescored products are marked pending rather than recorded as catalog
+    changes, so the catalog version stays put.
+    """
+    session.flush()
+    connection = session.connection()
+    changed = update_scores(connection, product_ids)
+    PopularityPending.add(connection, changed)
+    return changed
+
+
+def publish_pending(batch_size: int = 1000) -> int:
+    """Record pending rescored products in the change log; get how many"""
+    table = PopularityPending.__table__
+    published = 0
+    while True:
+        product_ids = (
+            db.session.execute(
+                db.select(table.c.product_id)
+                .order_by(table.c.product_id)
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not product_ids:
+            break
+
+        try:
+            connection = db.session.connection()
+            CatalogChange.record(connection, product_ids)
+            connection.execute(
+                table.delete().where(table.c.product_id.in_(product_ids))
+            )
+            CatalogChange.mark_changed(db.session)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        published += len(product_ids)
+    return published
+
+
+def recompute_all(batch_size: int = 1000) -> Dict[str, int]:
+    """Publish pending scores, then rescore every product one batch at a time"""
+    summary = {"published": publish_pending(batch_size), "scored": 0, "changed": 0}
+    prior = prior_rating(refresh=True)
+    after = None
+    while True:
+        query = db.select(Product.id).order_by(Product.id).limit(batch_size)
+        if after is not None:
+            query = query.where(Product.id > after)
+        product_ids = db.session.execute(query).scalars().all()
+        if not product_ids:
+            break
+
+        try:
+            connection = db.session.connection()
+            changed = update_scores(connection, product_ids, prior)
+            CatalogChange.record(connection, changed)
+            if changed:
+                CatalogChange.mark_changed(db.session)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        summary["scored"] += len(product_ids)
+        summary["changed"] += len(changed)
+        after = product_ids[-1]
+
+    logger.info(f"Recomputed popularity scores: {summary}")
+    return summary
+
+
+@event.listens_for(Product, "before_insert")
+def score_new_product(mapper, connection, target):
+    target.popularity_score = score(
+        target.rating,
+        target.review_count,
+        0,
+        0,
+        target.created_at,
+        prior_rating(connection),
+    )
+
+
+@event.listens_for(Product, "before_update")
+def rescore_product(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in SCORED_COLUMNS):
+        return
+
+    likes, carts = engagement(connection, [target.id])
+    target.popularity_score = score(
+        target.rating,
+        target.review_count,
+        likes.get(target.id, 0),
+        carts.get(target.id, 0),
+        target.created_at,
+        prior_rating(connection),
+    )
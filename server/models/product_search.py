@@ -0,0 +1,291 @@
+"""Full-text search index over product name, brand, features and description.
+
+SQLite uses an FTS5 table kept in sync by triggers and ranked with BM25.
+PostgreSQL uses a GIN expression index on a weighted tsvector ranked with
+ts_rank_cd, which the database maintains on every write. Other engines, or a
+SQLite build without FTS5, fall back to substring matching.
+
+On PostgreSQL, pg_trgm GIN indexes on the lowercased name and the brand,
+category and subcategory keys serve fuzzy word lookups for spelling
+correction, when the extension can be installed.
+"""
+
+import logging
+import re
+
+from sqlalchemy import MetaData, Table, Column, String, Text, text
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "products_fts"
+GIN_INDEX = "ix_products_search_vector"
+MAX_TERMS = 10
+
+# BM25 column weights for the FTS5 table, in column order after product_id
+FTS_WEIGHTS = (0.0, 10.0, 6.0, 3.0, 1.0)
+
+# Must match the indexed expression exactly for PostgreSQL to use the index
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(brand, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(features, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+# Query-only handle on the FTS5 table; kept out of db.metadata so create_all skips it
+products_fts = Table(
+    FTS_TABLE,
+    MetaData(),
+    Column("product_id", String(36)),
+    Column("name", Text),
+    Column("brand", Text),
+    Column("features", Text),
+    Column("description", Text),
+)
+
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        product_id UNINDEXED, name, brand, features, description,
+        tokenize = 'porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products
+    BEGIN
+        INSERT INTO {FTS_TABLE} (product_id, name, brand, features, description)
+        VALUES (new.id, new.name, new.brand, new.features, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE product_id = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF id, name, brand, features, description ON products
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE product_id = old.id;
+        INSERT INTO {FTS_TABLE} (product_id, name, brand, features, description)
+        VALUES (new.id, new.name, new.brand, new.features, new.description);
+    END""",
+]
+
+SQLITE_REBUILD = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"""INSERT INTO {FTS_TABLE} (product_id, name, brand, features, description)
+    SELECT id, name, brand, features, description FROM products""",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS products_fts_update",
+    "DROP TRIGGER IF EXISTS products_fts_delete",
+    "DROP TRIGGER IF EXISTS products_fts_insert",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON products "
+    f"USING GIN (({SEARCH_VECTOR_SQL}))",
+]
+
+POSTGRES_DROP = [f"DROP INDEX IF EXISTS {GIN_INDEX}"]
+
+TRIGRAM_INDEXES = {
+    "ix_products_name_trgm": "lower(name)",
+    "ix_products_brand_key_trgm": "brand_key",
+    "ix_products_category_key_trgm": "category_key",
+    "ix_products_subcategory_key_trgm": "subcategory_key",
+}
+
+TRIGRAM_DDL = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+    f"CREATE INDEX IF NOT EXISTS {name} ON products "
+    f"USING GIN (({expression}) gin_trgm_ops)"
+    for name, expression in TRIGRAM_INDEXES.items()
+]
+
+TRIGRAM_DROP = [f"DROP INDEX IF EXISTS {name}" for name in TRIGRAM_INDEXES]
+
+_available = {}
+_trigram_available = {}
+
+
+def create_search_index(connection) -> bool:
+    """Create the search index for the connection's engine and backfill it"""
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.execute(text(statement))
+        return True
+
+    if dialect != "sqlite":
+        return False
+
+    try:
+        for statement in SQLITE_DDL:
+            connection.execute(text(statement))
+    except Exception as e:
+        logger.warning(f"SQLite FTS5 unavailable, using substring search: {str(e)}")
+        return False
+
+    # Triggers are lost when batch migrations recreate the products table
+    indexed = connection.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+    total = connection.execute(text("SELECT count(*) FROM products")).scalar()
+    if indexed != total:
+        for statement in SQLITE_REBUILD:
+            connection.execute(text(statement))
+        logger.info(f"Rebuilt product search index with {total} products")
+
+    return True
+
+
+def create_trigram_index(connection) -> bool:
+    """Create the pg_trgm indexes on PostgreSQL; False elsewhere or without pg_trgm"""
+    if connection.dialect.name != "postgresql":
+        return False
+
+    # Installing an extension needs privileges; a failure must not abort the caller
+    savepoint = connection.begin_nested()
+    try:
+        for statement in TRIGRAM_DDL:
+            connection.execute(text(statement))
+        savepoint.commit()
+        return True
+    except Exception as e:
+        savepoint.rollback()
+        logger.warning(
+            f"pg_trgm unavailable, spelling correction stays in memory: {str(e)}"
+        )
+        return False
+
+
+def drop_trigram_index(connection):
+    """Drop the pg_trgm indexes; the extension is left installed"""
+    if connection.dialect.name == "postgresql":
+        for statement in TRIGRAM_DROP:
+            connection.execute(text(statement))
+
+
+def has_trigram_index(engine) -> bool:
+    """Check whether the pg_trgm indexes exist on this engine"""
+    key = str(engine.url)
+    if key not in _trigram_available:
+        available = False
+        if engine.dialect.name == "postgresql":
+            with engine.connect() as connection:
+                found = connection.execute(
+                    text("SELECT count(*) FROM pg_indexes WHERE indexname IN :names")
+                    .bindparams(db.bindparam("names", expanding=True)),
+                    {"names": list(TRIGRAM_INDEXES)},
+                ).scalar()
+            available = found == len(TRIGRAM_INDEXES)
+        _trigram_available[key] = available
+    return _trigram_available[key]
+
+
+def drop_search_index(connection):
+    """Drop the search index for the connection's engine"""
+    dialect = connection.dialect.name
+    statements = {"postgresql": POSTGRES_DROP, "sqlite": SQLITE_DROP}.get(dialect, [])
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def ensure_search_index(engine) -> bool:
+    """Create the search index if it is missing and remember whether it is usable"""
+    trigram = False
+    try:
+        with engine.begin() as connection:
+            available = create_search_index(connection)
+            trigram = create_trigram_index(connection)
+    except Exception as e:
+        logger.error(f"Error creating product search index: {str(e)}")
+        available = False
+
+    _available[str(engine.url)] = available
+    _trigram_available[str(engine.url)] = trigram
+    return available
+
+
+def is_available(engine) -> bool:
+    """Check whether full-text search can serve queries on this engine"""
+    key = str(engine.url)
+    if key not in _available:
+        if engine.dialect.name == "postgresql":
+            _available[key] = True
+        elif engine.dialect.name == "sqlite":
+            with engine.connect() as connection:
+                _available[key] = (
+                    connection.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                        {"name": FTS_TABLE},
+                    ).first()
+                    is not None
+                )
+        else:
+            _available[key] = False
+    return _available[key]
+
+
+def search_terms(search_query: str):
+    """Split a free-text query into at most MAX_TERMS lowercase word tokens"""
+    return re.findall(r"\w+", search_query.lower())[:MAX_TERMS]
+
+
+def has_term(term: str) -> bool:
+    """Whether an active product's indexed text has a word starting with term
+
+    False when full-text search is not available.
+    """
+    engine = db.session.get_bind()
+    if not is_available(engine):
+        return False
+
+    if engine.dialect.name == "postgresql":
+        statement = text(
+            f"SELECT 1 FROM products WHERE is_active = true AND ({SEARCH_VECTOR_SQL}) "
+            "@@ to_tsquery('english', :term) LIMIT 1"
+        )
+        parameters = {"term": f"{term}:*"}
+    else:
+        statement = text(
+            f"SELECT 1 FROM {FTS_TABLE} JOIN products "
+            f"ON products.id = {FTS_TABLE}.product_id "
+            f"WHERE {FTS_TABLE} MATCH :term AND products.is_active = 1 LIMIT 1"
+        )
+        parameters = {"term": f'"{term}"*'}
+    return db.session.execute(statement, parameters).first() is not None
+
+
+def apply_search(query, search_query: str):
+    """Restrict a Product query to full-text matches, ordered by relevance
+
+    Every term must match, and each term also matches as a prefix so partially
+    typed words still find results. Returns None when full-text search is not
+    available, so the caller can fall back to substring matching.
+    """
+    from models.product import Product
+
+    engine = db.session.get_bind()
+    if not is_available(engine):
+        return None
+
+    terms = search_terms(search_query)
+    if not terms:
+        return query.filter(db.false())
+
+    if engine.dialect.name == "postgresql":
+        tsquery = db.func.to_tsquery(
+            db.literal_column("'english'"),
+            " & ".join(f"{term}:*" for term in terms),
+        )
+        vector = db.literal_column(f"({SEARCH_VECTOR_SQL})")
+        return query.filter(vector.op("@@")(tsquery)).order_by(
+            db.func.ts_rank_cd(vector, tsquery).desc()
+        )
+
+    match = " ".join(f'"{term}"*' for term in terms)
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    return (
+        query.join(products_fts, products_fts.c.product_id == Product.id)
+        .filter(db.text(f"{FTS_TABLE} MATCH :fts_match").bindparams(fts_match=match))
+        .order_by(db.text(f"bm25({FTS_TABLE}, {weights})"))
+    )
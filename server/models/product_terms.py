@@ -0,0 +1,186 @@
+"""Normalized filter keys for product categories, subcategories and brands.
+
+Each product stores a lowercase, whitespace-collapsed copy of its category,
+subcategory and brand in an indexed *_key column, so filters are exact index
+lookups instead of ilike('%x%') scans. User and LLM input is resolved to
+those keys with a vocabulary built from the keys in the catalog:
+
+- case, spacing, punctuation, "&"/"and" and a trailing plural are ignored,
+  so "headphone", "Head-phones" and "HEADPHONES" all resolve to "headphones";
+- SYNONYMS maps common aliases onto catalog values, when that value exists;
+- anything else resolves to the catalog keys that contain it, which keeps
+  the old substring behaviour ("gaming" matches every gaming subcategory).
+
+Features are indexed as terms: lowercased words with plurals and common
+suffixes folded, so "Active Noise Canceling" and "noise cancelling" share
+the terms "nois" and "cancel".
+"""
+
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Filter name -> normalized key column on products
+KEY_COLUMNS = {
+    "category": "category_key",
+    "subcategory": "subcategory_key",
+    "brand": "brand_key",
+}
+
+# Alias -> catalog value it stands for; ignored when the value is not in the catalog
+SYNONYMS = {
+    "subcategory": {
+        "cell phone": "smartphones",
+        "mobile": "smartphones",
+        "mobile phone": "smartphones",
+        "phone": "smartphones",
+        "earphone": "earbuds",
+        "in-ear": "earbuds",
+        "headset": "headphones",
+        "notebook": "laptops",
+        "console": "gaming consoles",
+        "game console": "gaming consoles",
+        "smart speaker": "smart speakers",
+        "tv": "televisions",
+        "television": "televisions",
+    },
+    "brand": {
+        "hp": "hewlett-packard",
+        "lg electronics": "lg",
+        "samsung electronics": "samsung",
+    },
+}
+
+FEATURE_STOPWORDS = {"a", "an", "and", "for", "of", "the", "with"}
+
+# Seconds a vocabulary built from another process's writes may be out of date
+REFRESH_INTERVAL = 10.0
+
+_vocabulary = None
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def normalize(value: Optional[str]) -> Optional[str]:
+    """Key for a category, subcategory or brand value"""
+    if value is None:
+        return None
+    return " ".join(str(value).lower().split())
+
+
+def lookup_form(value: str) -> str:
+    """Form under which spelling variants of a value compare equal"""
+    words = normalize(value).replace("&", " and ").split()
+    if words:
+        words[-1] = _singular(words[-1])
+    return re.sub(r"[^a-z0-9]+", "", "".join(words))
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def feature_terms(feature: str) -> List[str]:
+    """Index terms of a feature, in order and without duplicates"""
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", str(feature).lower()):
+        if word in FEATURE_STOPWORDS:
+            continue
+        term = _stem(word) if word.isalpha() else word
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _stem(word: str) -> str:
+    word = _singular(word)
+    for suffix in ("ation", "ing", "ed", "e"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[: -len(suffix)]
+            break
+    if len(word) > 3 and word[-1] == word[-2]:
+        word = word[:-1]
+    return word
+
+
+class Vocabulary:
+    """Resolves free-form filter values to the keys present in the catalog"""
+
+    def __init__(self, keys: Dict[str, List[str]]):
+        self.keys = keys
+        self.forms = {}
+        for name, values in keys.items():
+            forms = {}
+            for key in values:
+                forms.setdefault(lookup_form(key), []).append(key)
+            for alias, target in SYNONYMS.get(name, {}).items():
+                matches = forms.get(lookup_form(target))
+                if matches:
+                    forms.setdefault(lookup_form(alias), list(matches))
+            self.forms[name] = forms
+
+    def resolve(self, name: str, term: str) -> List[str]:
+        """Keys a filter value stands for; the normalized value if none match"""
+        key = normalize(term)
+        form = lookup_form(term)
+        if not form:
+            return [key]
+
+        matches = self.forms.get(name, {}).get(form)
+        if matches:
+            return matches
+
+        matches = [value for value in self.keys.get(name, []) if key in value]
+        return matches or [key]
+
+
+def vocabulary() -> Vocabulary:
+    """Get the vocabulary of the active catalog, rebuilt when it may be stale"""
+    global _vocabulary, _built_at
+
+    current = _vocabulary
+    if current is not None and time.monotonic() - _built_at < REFRESH_INTERVAL:
+        return current
+
+    with _lock:
+        if _vocabulary is not current and _vocabulary is not None:
+            return _vocabulary
+
+        from models.product import Product
+
+        keys = {}
+        for name, column in KEY_COLUMNS.items():
+            key_column = getattr(Product, column)
+            keys[name] = sorted(
+                key
+                for (key,) in db.session.query(key_column)
+                .filter(Product.is_active == True, key_column.isnot(None))
+                .distinct()
+            )
+
+        _vocabulary = Vocabulary(keys)
+        _built_at = time.monotonic()
+        return _vocabulary
+
+
+def resolve(name: str, term: str) -> List[str]:
+    """Keys of the catalog that a category, subcategory or brand filter selects"""
+    return vocabulary().resolve(name, term)
+
+
+def invalidate():
+    """Rebuild the vocabulary on next use, e.g. after this process wrote products"""
+    global _built_at
+    _built_at = 0.0
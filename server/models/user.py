@@ -20,7 +20,11 @@ class User(db.Model):
     is_active = db.Column(db.Boolean, default=True)
 
     chat_sessions = db.relationship(
-        "ChatSession", backref="user", lazy=True, cascade="all, delete-orphan"
+        "ChatSession",
+        backref="user",
+        lazy=True,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     def __init__(self, id, email, name, password=None):
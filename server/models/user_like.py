@@ -7,8 +7,12 @@ class UserLike(db.Model):
     __tablename__ = "user_likes"
 
     id = db.Column(db.String(36), primary_key=True)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False)
-    product_id = db.Column(db.String(36), db.ForeignKey("products.id"), nullable=False)
+    user_id = db.Column(
+        db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    product_id = db.Column(
+        db.String(36), db.ForeignKey("products.id", ondelete="CASCADE"), nullable=False
+    )
     created_at = db.Column(db.DateTime, default=datetime.now())
     
     # Ensure a user can only like a product once
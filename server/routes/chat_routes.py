@@ -4,11 +4,14 @@ import logging
 import uuid
 
 from services.chat_service import ChatService
+from services.chat_job_service import ChatJobService
+from services.message_buffer import message_buffer
 from models.chat_session import ChatSession
 
 logger = logging.getLogger(__name__)
 chat_bp = Blueprint("chat", __name__)
 chat_service = ChatService()
+chat_job_service = ChatJobService()
 
 
 @chat_bp.route("/message", methods=["POST"])
@@ -32,6 +35,18 @@ def send_message():
         except:
             pass
 
+        if request.args.get("async", "0").lower() in ("1", "true"):
+            job = chat_job_service.enqueue(session_id, user_message, user_id)
+
+            return jsonify(
+                {
+                    "success": True,
+                    "job_id": job.id,
+                    "status": job.status,
+                    "session_id": session_id,
+                }
+            ), 202
+
         response = chat_service.process_message(session_id, user_message, user_id)
 
         return jsonify(
@@ -43,11 +58,53 @@ def send_message():
         return jsonify({"success": False, "message": "Failed to process message"}), 500
 
 
+@chat_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_chat_job(job_id):
+    """Poll or long-poll an asynchronous chat job"""
+    try:
+        from flask import current_app
+
+        wait = min(
+            request.args.get("wait", 0, type=float),
+            current_app.config["CHAT_JOB_MAX_WAIT"],
+        )
+
+        user_id = None
+        try:
+            verify_jwt_in_request(optional=True)
+            user_id = get_jwt_identity()
+        except:
+            pass
+
+        job = chat_job_service.get_job(job_id)
+        if not job:
+            return jsonify({"success": False, "message": "Chat job not found"}), 404
+
+        if job.user_id and job.user_id != user_id:
+            return jsonify({"success": False, "message": "Access denied"}), 403
+
+        if wait > 0 and not job.is_finished():
+            job = chat_job_service.wait_for_job(job_id, wait)
+
+        return jsonify({"success": True, "job": job.to_dict()}), 200
+
+    except Exception as e:
+        logger.error(f"Error in get_chat_job endpoint: {str(e)}")
+        return jsonify({"success": False, "message": "Failed to get chat job"}), 500
+
+
 @chat_bp.route("/history/<session_id>", methods=["GET"])
 def get_chat_history(session_id):
     """Get chat history for a session"""
     try:
-        limit = request.args.get("limit", 50, type=int)
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+        before = request.args.get("before")
+        after = request.args.get("after")
+
+        if before and after:
+            return jsonify(
+                {"success": False, "message": "Use either before or after, not both"}
+            ), 400
 
         user_id = None
         try:
@@ -56,17 +113,27 @@ def get_chat_history(session_id):
         except:
             pass
 
-        chat_session = ChatSession.query.get(session_id)
+        chat_session = chat_service.get_session(session_id)
         if not chat_session:
             return jsonify({"success": False, "message": "Chat session not found"}), 404
 
         if chat_session.user_id and chat_session.user_id != user_id:
             return jsonify({"success": False, "message": "Access denied"}), 403
 
-        history = chat_service.get_chat_history(session_id, limit)
+        try:
+            history, page = chat_service.get_chat_history(
+                session_id, limit, before=before, after=after
+            )
+        except ValueError:
+            return jsonify({"success": False, "message": "Invalid cursor"}), 400
 
         return jsonify(
-            {"success": True, "history": history, "session": chat_session.to_dict()}
+            {
+                "success": True,
+                "history": history,
+                "page": page,
+                "session": chat_session.to_dict(),
+            }
         ), 200
 
     except Exception as e:
@@ -77,19 +144,20 @@ def get_chat_history(session_id):
 @chat_bp.route("/sessions", methods=["GET"])
 @jwt_required()
 def get_user_sessions():
-    """Get all chat sessions for the authenticated user"""
+    """Get a page of chat sessions for the authenticated user"""
     try:
         current_user_id = get_jwt_identity()
+        limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+        cursor = request.args.get("cursor")
 
-        sessions = (
-            ChatSession.query.filter_by(user_id=current_user_id)
-            .order_by(ChatSession.updated_at.desc())
-            .all()
-        )
+        try:
+            sessions, page = chat_service.list_user_sessions(
+                current_user_id, limit, cursor
+            )
+        except ValueError:
+            return jsonify({"success": False, "message": "Invalid cursor"}), 400
 
-        return jsonify(
-            {"success": True, "sessions": [session.to_dict() for session in sessions]}
-        ), 200
+        return jsonify({"success": True, "sessions": sessions, "page": page}), 200
 
     except Exception as e:
         logger.error(f"Error in get_user_sessions endpoint: {str(e)}")
@@ -109,6 +177,8 @@ def delete_session(session_id):
         except:
             pass
 
+        message_buffer.flush()
+
         chat_session = ChatSession.query.get(session_id)
         if not chat_session:
             return jsonify({"success": False, "message": "Chat session not found"}), 404
@@ -116,12 +186,7 @@ def delete_session(session_id):
         if chat_session.user_id and chat_session.user_id != user_id:
             return jsonify({"success": False, "message": "Access denied"}), 403
 
-        chat_service.clear_session_memory(session_id)
-
-        from app import db
-
-        db.session.delete(chat_session)
-        db.session.commit()
+        chat_service.delete_session(session_id)
 
         return jsonify(
             {"success": True, "message": "Chat session deleted successfully"}
@@ -143,6 +208,8 @@ def clear_session(session_id):
         except:
             pass
 
+        message_buffer.flush()
+
         chat_session = ChatSession.query.get(session_id)
         if not chat_session:
             return jsonify({"success": False, "message": "Chat session not found"}), 404
@@ -150,13 +217,7 @@ def clear_session(session_id):
         if chat_session.user_id and chat_session.user_id != user_id:
             return jsonify({"success": False, "message": "Access denied"}), 403
 
-        from models.message import Message
-        from app import db
-
-        Message.query.filter_by(chat_session_id=session_id).delete()
-        chat_service.clear_session_memory(session_id)
-
-        db.session.commit()
+        chat_service.clear_session_messages(session_id)
 
         return jsonify(
             {"success": True, "message": "Chat session cleared successfully"}
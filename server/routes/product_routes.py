@@ -2,73 +2,236 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, jwt_required
 import logging
 
+from models import product_cache
 from models.product import Product
-from services.product_service import ProductService
+from services.facet_service import FacetService
+from services.product_import_service import IMPORT_FORMATS, ProductImportService
+from services.product_service import SEARCH_MODES, ProductService
 from services.auth_service import AuthService
+from services.catalog_aggregates import catalog_aggregates
+from services.catalog_snapshot import catalog_snapshot
+from services.suggest_service import suggest_service
+from utils import fast_json
+from utils.http_cache import conditional
 
 logger = logging.getLogger(__name__)
 product_bp = Blueprint("products", __name__)
+
+MAX_BATCH_IDS = 500
+MAX_SUGGESTIONS = 20
 product_service = ProductService()
+import_service = ProductImportService()
+facet_service = FacetService()
+
+
+def _filters_from_args(args):
+    """Read the listing filters that are present in the query string"""
+    filters = {
+        "category": args.get("category"),
+        "subcategory": args.get("subcategory"),
+        "brand": args.get("brand"),
+        "min_price": args.get("min_price", type=float),
+        "max_price": args.get("max_price", type=float),
+        "min_rating": args.get("min_rating", type=float),
+        "in_stock_only": args.get("in_stock_only", "false").lower() == "true",
+        "features": _split(args.get("features")),
+        "features_mode": args.get("features_mode") if args.get("features") else None,
+    }
+    return {
+        name: value
+        for name, value in filters.items()
+        if value is not None and value is not False and value != "" and value != []
+    }
+
+
+def _features_mode_error(filters):
+    """400 response for an unknown features_mode, or None"""
+    if filters.get("features_mode", "all") in Product.FEATURE_MODES:
+        return None
+    return jsonify(
+        {
+            "success": False,
+            "message": "features_mode must be one of: "
+            f"{', '.join(Product.FEATURE_MODES)}",
+        }
+    ), 400
+
+
+def _split(value):
+    """Read a comma-separated string or a JSON list as a list of strings"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def _fields(value):
+    """Read sparse field selection; id is always included. Raises ValueError"""
+    names = _split(value)
+    if not names:
+        return None
+
+    unknown = [name for name in names if name not in Product.FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}. "
+            f"fields must be among: {', '.join(Product.FIELDS)}"
+        )
+    return tuple(dict.fromkeys(["id"] + names))
+
+
+def _is_listing():
+    # Search results depend on the vector index and the search deadline
+    return not request.args.get("search")
 
 
 @product_bp.route("/", methods=["GET"])
+@conditional(catalog_snapshot.state, when=_is_listing)
 def get_products():
     """Get products with optional filtering"""
     try:
-        category = request.args.get("category")
-        subcategory = request.args.get("subcategory")
-        brand = request.args.get("brand")
-        min_price = request.args.get("min_price", type=float)
-        max_price = request.args.get("max_price", type=float)
-        min_rating = request.args.get("min_rating", type=float)
-        in_stock_only = request.args.get("in_stock_only", "false").lower() == "true"
+        filters = _filters_from_args(request.args)
         search_query = request.args.get("search")
-        limit = request.args.get("limit", 50, type=int)
+        mode = request.args.get("mode")
+        sort = request.args.get("sort", "rating")
+        cursor = request.args.get("cursor")
+        include_total = request.args.get("include_total", "false").lower() == "true"
+        correct = request.args.get("correct", "true").lower() != "false"
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+
+        try:
+            fields = _fields(request.args.get("fields"))
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        if sort not in Product.SORTS:
+            return jsonify(
+                {
+                    "success": False,
+                    "message": f"sort must be one of: {', '.join(Product.SORTS)}",
+                }
+            ), 400
+
+        if mode and mode not in SEARCH_MODES:
+            return jsonify(
+                {
+                    "success": False,
+                    "message": f"mode must be one of: {', '.join(SEARCH_MODES)}",
+                }
+            ), 400
+
+        error = _features_mode_error(filters)
+        if error:
+            return error
 
         if not search_query:
-            products = Product.search_by_filters(
-                category=category,
-                subcategory=subcategory,
-                brand=brand,
-                min_price=min_price,
-                max_price=max_price,
-                min_rating=min_rating,
-                in_stock_only=in_stock_only,
-                limit=limit,
+            try:
+                products, page = product_service.list_products(
+                    filters, sort, limit, cursor, include_total
+                )
+            except ValueError:
+                return jsonify({"success": False, "message": "Invalid cursor"}), 400
+            products = product_cache.fragments(products, fields)
+        else:
+            # Search results are ranked by relevance and not paginated
+            product_ids, search_info = product_service.search_ids(
+                search_query, filters, limit, mode, correct
             )
+            products = product_service.fragments(product_ids, fields)
+            page = {"limit": limit, "has_more": False, "next_cursor": None}
+
+        body = {
+            "success": True,
+            "products": products,
+            "count": len(products),
+            "page": page,
+        }
+        if search_query and search_info.get("corrected_query"):
+            body["corrected_query"] = search_info["corrected_query"]
+        return fast_json.response(body)
+
+    except Exception as e:
+        logger.error(f"Error in get_products endpoint: {str(e)}")
+        return jsonify({"success": False, "message": "Failed to get products"}), 500
+
+
+@product_bp.route("/facets", methods=["GET"])
+@conditional(catalog_snapshot.state)
+def get_facets():
+    """Get facet counts for the current filters and search"""
+    try:
+        filters = _filters_from_args(request.args)
+        error = _features_mode_error(filters)
+        if error:
+            return error
+
+        search_query = request.args.get("search")
+        if search_query:
+            # Count the products the search returns, corrected only if it must be
+            if request.args.get("correct", "true").lower() != "false":
+                search_query = product_service.lexical_query(search_query, filters)
+            filters["search_query"] = search_query
+
+        facets = facet_service.get_facets(filters)
+
+        return jsonify({"success": True, "facets": facets}), 200
+
+    except Exception as e:
+        logger.error(f"Error in get_facets endpoint: {str(e)}")
+        return jsonify({"success": False, "message": "Failed to get facets"}), 500
+
+
+def _is_get():
+    return request.method == "GET"
+
+
+@product_bp.route("/batch", methods=["GET", "POST"])
+@conditional(catalog_snapshot.state, when=_is_get)
+def get_products_batch():
+    """Get many products by ID in one request, in the order given"""
+    try:
+        if request.method == "POST":
+            data = request.get_json(silent=True) or {}
+            ids, fields = data.get("ids"), data.get("fields")
         else:
-            filters = {}
-            if category:
-                filters["category"] = category
-            if subcategory:
-                filters["subcategory"] = subcategory
-            if brand:
-                filters["brand"] = brand
-            if min_price is not None:
-                filters["min_price"] = min_price
-            if max_price is not None:
-                filters["max_price"] = max_price
-            if min_rating is not None:
-                filters["min_rating"] = min_rating
-            if in_stock_only:
-                filters["in_stock_only"] = in_stock_only
-
-            products = product_service.search_products(search_query, filters, limit)
+            ids, fields = request.args.get("ids"), request.args.get("fields")
 
-        return jsonify(
+        product_ids = _split(ids)
+        try:
+            fields = _fields(fields)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        if not product_ids:
+            return jsonify({"success": False, "message": "ids is required"}), 400
+
+        if len(product_ids) > MAX_BATCH_IDS:
+            return jsonify(
+                {
+                    "success": False,
+                    "message": f"At most {MAX_BATCH_IDS} ids per request",
+                }
+            ), 400
+
+        products, missing = product_service.get_products_by_ids(product_ids)
+
+        return fast_json.response(
             {
                 "success": True,
-                "products": [product.to_dict() for product in products],
+                "products": product_cache.fragments(products, fields),
                 "count": len(products),
+                "missing": missing,
             }
-        ), 200
+        )
 
     except Exception as e:
-        logger.error(f"Error in get_products endpoint: {str(e)}")
+        logger.error(f"Error in get_products_batch endpoint: {str(e)}")
         return jsonify({"success": False, "message": "Failed to get products"}), 500
 
 
 @product_bp.route("/<product_id>", methods=["GET"])
+@conditional(catalog_snapshot.state)
 def get_product(product_id):
     """Get a specific product by ID"""
     try:
@@ -77,7 +240,9 @@ def get_product(product_id):
         if not product:
             return jsonify({"success": False, "message": "Product not found"}), 404
 
-        return jsonify({"success": True, "product": product.to_dict()}), 200
+        return fast_json.response(
+            {"success": True, "product": product_cache.fragment(product)}
+        )
 
     except Exception as e:
         logger.error(f"Error in get_product endpoint: {str(e)}")
@@ -86,7 +251,7 @@ def get_product(product_id):
 
 @product_bp.route("/search", methods=["POST"])
 def search_products():
-    """Advanced product search with semantic similarity"""
+    """Advanced product search: vector, lexical or hybrid"""
     try:
         data = request.get_json()
 
@@ -98,23 +263,62 @@ def search_products():
         query = data["query"]
         filters = data.get("filters", {})
         limit = data.get("limit", 20)
+        mode = data.get("mode")
+        correct = data.get("correct", True) is not False
+
+        if mode and mode not in SEARCH_MODES:
+            return jsonify(
+                {
+                    "success": False,
+                    "message": f"mode must be one of: {', '.join(SEARCH_MODES)}",
+                }
+            ), 400
 
-        products = product_service.search_products(query, filters, limit)
+        error = _features_mode_error(filters)
+        if error:
+            return error
 
-        return jsonify(
+        product_ids, search_info = product_service.search_ids(
+            query, filters, limit, mode, correct
+        )
+        products = product_service.fragments(product_ids)
+        if products:
+            # Popular queries are suggested as typed, so record what was searched
+            suggest_service.record_query(search_info.get("corrected_query", query))
+
+        return fast_json.response(
             {
                 "success": True,
-                "products": [product.to_dict() for product in products],
+                "products": products,
                 "count": len(products),
                 "query": query,
+                "search": search_info,
             }
-        ), 200
+        )
 
     except Exception as e:
         logger.error(f"Error in search_products endpoint: {str(e)}")
         return jsonify({"success": False, "message": "Search failed"}), 500
 
 
+@product_bp.route("/suggest", methods=["GET"])
+def suggest_products():
+    """Typeahead suggestions for a search box prefix"""
+    try:
+        query = request.args.get("q", "")
+        limit = min(max(request.args.get("limit", 8, type=int), 1), MAX_SUGGESTIONS)
+
+        suggestions = suggest_service.suggest(query, limit)
+
+        return fast_json.response(
+            {"success": True, "query": query, "suggestions": suggestions}
+        )
+
+    except Exception as e:
+        logger.error(f"Error in suggest_products endpoint: {str(e)}")
+        return jsonify({"success": False, "message": "Failed to get suggestions"}), 500
+
+
 @product_bp.route("/recommendations", methods=["GET"])
 def get_recommendations():
     """Get product recommendations"""
@@ -139,13 +343,13 @@ def get_recommendations():
             product_id=product_id, user_preferences=user_preferences, limit=limit
         )
 
-        return jsonify(
+        return fast_json.response(
             {
                 "success": True,
-                "recommendations": [product.to_dict() for product in recommendations],
+                "recommendations": product_cache.fragments(recommendations),
                 "count": len(recommendations),
             }
-        ), 200
+        )
 
     except Exception as e:
         logger.error(f"Error in get_recommendations endpoint: {str(e)}")
@@ -155,85 +359,41 @@ def get_recommendations():
 
 
 @product_bp.route("/categories", methods=["GET"])
+@conditional(catalog_snapshot.state)
 def get_categories():
     """Get all product categories and subcategories"""
     try:
-        from sqlalchemy import distinct
-
-        categories = (
-            Product.query.with_entities(distinct(Product.category), Product.subcategory)
-            .filter(Product.is_active == True)
-            .all()
+        return fast_json.response(
+            {"success": True, "categories": catalog_aggregates.fragment("categories")}
         )
 
-        category_map = {}
-        for category, subcategory in categories:
-            if category not in category_map:
-                category_map[category] = set()
-            category_map[category].add(subcategory)
-
-        result = []
-        for category, subcategories in category_map.items():
-            result.append({"category": category, "subcategories": list(subcategories)})
-
-        return jsonify({"success": True, "categories": result}), 200
-
     except Exception as e:
         logger.error(f"Error in get_categories endpoint: {str(e)}")
         return jsonify({"success": False, "message": "Failed to get categories"}), 500
 
 
 @product_bp.route("/brands", methods=["GET"])
+@conditional(catalog_snapshot.state)
 def get_brands():
     """Get all product brands"""
     try:
-        from sqlalchemy import distinct
-
-        brands = (
-            Product.query.with_entities(distinct(Product.brand))
-            .filter(Product.is_active == True)
-            .order_by(Product.brand)
-            .all()
+        return fast_json.response(
+            {"success": True, "brands": catalog_aggregates.fragment("brands")}
         )
 
-        brand_list = [brand[0] for brand in brands]
-
-        return jsonify({"success": True, "brands": brand_list}), 200
-
     except Exception as e:
         logger.error(f"Error in get_brands endpoint: {str(e)}")
         return jsonify({"success": False, "message": "Failed to get brands"}), 500
 
 
 @product_bp.route("/stats", methods=["GET"])
+@conditional(catalog_snapshot.state)
 def get_product_stats():
     """Get product statistics"""
     try:
-        from sqlalchemy import func
-
-        stats = {
-            "total_products": Product.query.filter(Product.is_active == True).count(),
-            "total_categories": Product.query.with_entities(
-                func.count(func.distinct(Product.category))
-            ).scalar(),
-            "total_brands": Product.query.with_entities(
-                func.count(func.distinct(Product.brand))
-            ).scalar(),
-            "price_range": {
-                "min": Product.query.with_entities(func.min(Product.price)).scalar()
-                or 0,
-                "max": Product.query.with_entities(func.max(Product.price)).scalar()
-                or 0,
-            },
-            "average_rating": round(
-                Product.query.with_entities(func.avg(Product.rating)).scalar() or 0, 2
-            ),
-            "in_stock_count": Product.query.filter(
-                Product.stock > 0, Product.is_active == True
-            ).count(),
-        }
-
-        return jsonify({"success": True, "stats": stats}), 200
+        return fast_json.response(
+            {"success": True, "stats": catalog_aggregates.fragment("stats")}
+        )
 
     except Exception as e:
         logger.error(f"Error in get_product_stats endpoint: {str(e)}")
@@ -277,6 +437,37 @@ def create_product():
         return jsonify({"success": False, "message": "Failed to create product"}), 500
 
 
+@product_bp.route("/import", methods=["POST"])
+@jwt_required()
+def import_products():
+    """Stream an NDJSON or CSV product feed into the catalog (admin only)"""
+    try:
+        content_type = request.mimetype or ""
+        format = request.args.get("format") or (
+            "csv" if content_type == "text/csv" else "ndjson"
+        )
+        if format not in IMPORT_FORMATS:
+            return jsonify(
+                {
+                    "success": False,
+                    "message": f"format must be one of: {', '.join(IMPORT_FORMATS)}",
+                }
+            ), 400
+
+        summary = import_service.import_stream(
+            request.stream,
+            format,
+            batch_size=request.args.get("batch_size", type=int),
+            index=request.args.get("index", "true").lower() == "true",
+        )
+
+        return jsonify({"success": True, "import": summary}), 200
+
+    except Exception as e:
+        logger.error(f"Error in import_products endpoint: {str(e)}")
+        return jsonify({"success": False, "message": "Failed to import products"}), 500
+
+
 @product_bp.route("/<product_id>", methods=["PUT"])
 @jwt_required()
 def update_product(product_id):
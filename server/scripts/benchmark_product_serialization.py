@@ -0,0 +1,88 @@
+import argparse
+import time
+import uuid
+from datetime import datetime
+
+from app import create_app
+from flask import jsonify
+from models import Product, product_cache
+from utils import fast_json
+
+
+def build_products(count):
+    """Build detached products shaped like the seeded catalog"""
+    now = datetime.now()
+    return [
+        Product(
+            id=str(uuid.uuid4()),
+            name=f"Benchmark Product {index}",
+            description="A product used to benchmark listing serialization. " * 4,
+            price=99.99 + index,
+            original_price=149.99 + index,
+            category="Electronics",
+            subcategory="Headphones",
+            brand="Benchmark",
+            rating=4.5,
+            review_count=index,
+            image_url=f"https://example.com/images/{index}.jpg",
+            stock=index % 7,
+            features=["Noise cancelling", "Bluetooth 5.3", "30 hour battery"],
+            is_on_sale=True,
+            is_active=True,
+            created_at=now,
+            updated_at=now,
+        )
+        for index in range(count)
+    ]
+
+
+def timed(label, func, rounds):
+    func()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        body = func()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / rounds
+    print(f"{label:<38} {elapsed_ms:8.2f} ms/page  {len(body) / 1024:8.1f} KiB")
+    return elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark product list serialization")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.test_request_context():
+        products = build_products(args.page_size)
+        page = {"limit": args.page_size, "has_more": True, "next_cursor": "x"}
+
+        def baseline():
+            return jsonify(
+                {
+                    "success": True,
+                    "products": [product.to_dict() for product in products],
+                    "count": len(products),
+                    "page": page,
+                }
+            ).get_data()
+
+        def cached():
+            return fast_json.response(
+                {
+                    "success": True,
+                    "products": product_cache.fragments(products),
+                    "count": len(products),
+                    "page": page,
+                }
+            ).get_data()
+
+        encoder = "orjson" if fast_json.orjson is not None else "json"
+        print(f"{args.page_size} products per page, {args.rounds} rounds, {encoder}")
+        before = timed("to_dict + jsonify", baseline, args.rounds)
+        after = timed("cached fragments + fast_json", cached, args.rounds)
+        print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
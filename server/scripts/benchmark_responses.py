@@ -0,0 +1,84 @@
+import argparse
+import time
+
+from app import create_app
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+from models import product_cache
+from utils import fast_json
+
+from scripts.benchmark_product_serialization import build_products
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def measure(app, build, encoding, rounds):
+    """CPU ms per request and bytes on the wire, hooks and compression included"""
+    headers = {"Accept-Encoding": encoding}
+    with app.test_request_context("/api/products/", headers=headers):
+        body = app.process_response(build()).get_data()
+        started = time.process_time()
+        for _ in range(rounds):
+            body = app.process_response(build()).get_data()
+        elapsed_ms = (time.process_time() - started) * 1000 / rounds
+    return elapsed_ms, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark JSON encoding and compression of a product listing"
+    )
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.debug = False
+    products = build_products(args.page_size)
+    page = {"limit": args.page_size, "has_more": True, "next_cursor": "x"}
+
+    def payload(items):
+        return {
+            "success": True,
+            "products": items,
+            "count": len(items),
+            "page": page,
+        }
+
+    orjson_provider = app.json
+    flask_provider = DefaultJSONProvider(app)
+
+    def flask_jsonify():
+        app.json = flask_provider
+        try:
+            return jsonify(payload([product.to_dict() for product in products]))
+        finally:
+            app.json = orjson_provider
+
+    def orjson_jsonify():
+        return jsonify(payload([product.to_dict() for product in products]))
+
+    def cached_fragments():
+        return fast_json.response(payload(product_cache.fragments(products)))
+
+    cases = [
+        ("to_dict + Flask jsonify", flask_jsonify),
+        (f"to_dict + {type(orjson_provider).__name__}", orjson_jsonify),
+        ("cached fragments + fast_json", cached_fragments),
+    ]
+
+    print(
+        f"{args.page_size} products per response, {args.rounds} rounds, "
+        f"compression {'on' if app.config['COMPRESSION_ENABLED'] else 'off'}"
+    )
+    print(f"{'':<34}" + "".join(f"{encoding:>22}" for encoding in ENCODINGS))
+    for label, build in cases:
+        cells = []
+        for encoding in ENCODINGS:
+            elapsed_ms, size = measure(app, build, encoding, args.rounds)
+            cells.append(f"{elapsed_ms:7.2f} ms {size / 1024:7.1f} KiB")
+        print(f"{label:<34}" + "".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+logger = logging.getLogger("scripts.chat_worker")
+
+
+def run_worker(worker_index):
+    """Claim and run queued chat jobs until the process is asked to stop"""
+    from app import create_app
+    from services.chat_job_service import ChatJobService
+    from services.chat_service import ChatService
+
+    stopping = False
+
+    def handle_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    app = create_app()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{worker_index}"
+
+    with app.app_context():
+        job_service = ChatJobService()
+        chat_service = ChatService()
+        poll_interval = app.config["CHAT_JOB_POLL_INTERVAL"]
+        last_recovery = 0.0
+
+        logger.info(f"Chat worker {worker_id} started")
+
+        while not stopping:
+            if time.monotonic() - last_recovery > app.config["CHAT_JOB_STALE_AFTER"]:
+                job_service.requeue_stale_jobs()
+                last_recovery = time.monotonic()
+
+            try:
+                job = job_service.claim_next_job(worker_id)
+            except Exception as e:
+                logger.error(f"Chat worker {worker_id} failed to claim a job: {str(e)}")
+                from models import db
+
+                db.session.rollback()
+                job = None
+
+            if not job:
+                time.sleep(poll_interval)
+                continue
+
+            job = job_service.run_job(job, chat_service)
+            logger.info(f"Chat job {job.id} finished with status {job.status}")
+
+        logger.info(f"Chat worker {worker_id} stopped")
+
+
+def main():
+    processes = int(os.environ.get("CHAT_WORKER_PROCESSES", 2))
+    print(f"Starting {processes} chat worker processes...")
+
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(index,), daemon=False)
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    def stop_workers(signum, frame):
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    signal.signal(signal.SIGINT, stop_workers)
+
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import logging
+import signal
+import time
+
+logger = logging.getLogger("scripts.embedding_indexer")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Drain the embedding outbox into the vector index"
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Drain what is due now, then exit"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Make rows that ran out of attempts due again before draining",
+    )
+    args = parser.parse_args()
+
+    from app import create_app
+    from services.embedding_indexer import embedding_indexer
+
+    stopping = False
+
+    def handle_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    app = create_app()
+    with app.app_context():
+        if args.retry_failed:
+            print(f"Retrying {embedding_indexer.retry_failed()} failed rows")
+
+        if args.once:
+            print(embedding_indexer.drain())
+            print(f"{embedding_indexer.pending_count()} rows still pending")
+            return
+
+        logger.info("Embedding indexer started")
+        while not stopping:
+            try:
+                totals = embedding_indexer.drain()
+                if any(totals.values()):
+                    logger.info(f"Drained embedding outbox: {totals}")
+            except Exception as e:
+                logger.error(f"Error draining embedding outbox: {str(e)}")
+                from models import db
+
+                db.session.rollback()
+
+            time.sleep(app.config["EMBEDDING_OUTBOX_POLL_INTERVAL"])
+
+        logger.info("Embedding indexer stopped")
+
+
+if __name__ == "__main__":
+    main()
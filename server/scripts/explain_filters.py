@@ -0,0 +1,81 @@
+import argparse
+import time
+
+from app import create_app
+from models import db, product_terms
+from models.product import Product
+from sqlalchemy import text
+
+
+def legacy_query(category=None, subcategory=None, brand=None):
+    """The substring filters used before the normalized key columns"""
+    query = Product.query.filter(Product.is_active == True)
+    if category:
+        query = query.filter(Product.category.ilike(f"%{category}%"))
+    if subcategory:
+        query = query.filter(Product.subcategory.ilike(f"%{subcategory}%"))
+    if brand:
+        query = query.filter(Product.brand.ilike(f"%{brand}%"))
+    return query
+
+
+def explain(query):
+    """Get the database's plan for a query, with the real timings on PostgreSQL"""
+    dialect = db.engine.dialect
+    sql = str(
+        query.statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    )
+    if dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS)"
+    elif dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN"
+    else:
+        prefix = "EXPLAIN"
+    rows = db.session.execute(text(f"{prefix} {sql}")).fetchall()
+    return [" | ".join(str(value) for value in row) for row in rows]
+
+
+def timed(query, rounds):
+    query.all()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        count = len(query.all())
+    return (time.perf_counter() - started) * 1000 / rounds, count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare plans and latency of substring and key filters"
+    )
+    parser.add_argument("--category")
+    parser.add_argument("--subcategory", default="headphone")
+    parser.add_argument("--brand")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    filters = {
+        name: getattr(args, name)
+        for name in ("category", "subcategory", "brand")
+        if getattr(args, name)
+    }
+
+    app = create_app()
+    with app.app_context():
+        for name, value in filters.items():
+            print(f"{name}={value!r} -> {product_terms.resolve(name, value)}")
+
+        queries = {
+            "before (ilike)": legacy_query(**filters),
+            "after (keys)": Product.filter_query(**filters),
+        }
+        for label, query in queries.items():
+            query = query.order_by(Product.rating.desc()).limit(args.limit)
+            elapsed_ms, count = timed(query, args.rounds)
+            print(f"\n{label}: {elapsed_ms:.2f} ms/query, {count} rows")
+            for line in explain(query):
+                print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import json
+import sys
+
+from app import create_app
+from services.embedding_indexer import embedding_indexer
+from services.product_import_service import IMPORT_FORMATS, ProductImportService
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stream an NDJSON or CSV product feed into the catalog"
+    )
+    parser.add_argument("path", help="Feed file, or - for standard input")
+    parser.add_argument(
+        "--format",
+        choices=IMPORT_FORMATS,
+        help="Feed format; defaults to csv for .csv files, otherwise ndjson",
+    )
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Do not queue embedding updates for the imported products",
+    )
+    args = parser.parse_args()
+
+    format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    app = create_app()
+    # Index in the foreground after the import, not from a background thread
+    embedding_indexer.enabled = False
+
+    with app.app_context():
+        service = ProductImportService()
+        if args.path == "-":
+            summary = service.import_stream(
+                sys.stdin.buffer, format, args.batch_size, not args.no_index
+            )
+        else:
+            with open(args.path, "rb") as feed:
+                summary = service.import_stream(
+                    feed, format, args.batch_size, not args.no_index
+                )
+
+        if summary["queued"]:
+            print(f"Indexing {summary['queued']} products...")
+            summary["index"] = embedding_indexer.drain()
+
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import logging
+import signal
+import time
+
+logger = logging.getLogger("scripts.recompute_popularity")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recompute product popularity scores"
+    )
+    parser.add_argument(
+        "--every",
+        type=float,
+        help="Keep running, recomputing every this many seconds",
+    )
+    parser.add_argument(
+        "--publish-every",
+        type=float,
+        default=60.0,
+        help="With --every, publish scores moved by likes and cart writes "
+        "this often in between",
+    )
+    parser.add_argument("--batch-size", type=int)
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import db, product_popularity
+
+    stopping = False
+
+    def handle_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    app = create_app()
+    with app.app_context():
+        batch_size = args.batch_size or app.config["POPULARITY_BATCH_SIZE"]
+        if not args.every:
+            print(product_popularity.recompute_all(batch_size))
+            return
+
+        logger.info("Popularity recompute started")
+        next_run = next_publish = time.monotonic()
+        while not stopping:
+            now = time.monotonic()
+            try:
+                if now >= next_run:
+                    product_popularity.recompute_all(batch_size)
+                    next_run = now + args.every
+                    next_publish = now + args.publish_every
+                elif now >= next_publish:
+                    product_popularity.publish_pending(batch_size)
+                    next_publish = now + args.publish_every
+            except Exception as e:
+                logger.error(f"Error recomputing popularity scores: {str(e)}")
+                db.session.rollback()
+                next_run = max(next_run, now + args.publish_every)
+                next_publish = now + args.publish_every
+
+            while not stopping and time.monotonic() < min(next_run, next_publish):
+                time.sleep(1)
+
+        logger.info("Popularity recompute stopped")
+
+
+if __name__ == "__main__":
+    main()
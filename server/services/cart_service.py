@@ -1,12 +1,15 @@
 import uuid
-from models import Cart, Product
+from models import Cart, Product, User, db, product_cache, product_popularity
 
 
 class CartService:
     def add_to_cart(self, user_id: str, product_id: str, quantity: int = 1):
         """Add a product to the user's cart"""
-        from app import db
         try:
+            # Cart rows reference a user; guests must log in first
+            if not user_id or not User.query.get(user_id):
+                return {"success": False, "message": "Please log in to add items to your cart"}
+
             # Check if product exists
             product = Product.query.get(product_id)
             if not product:
@@ -28,6 +31,7 @@ class CartService:
                     quantity=quantity,
                 )
                 db.session.add(cart_item)
+                product_popularity.refresh(db.session, [product_id])
             
             db.session.commit()
             return {"success": True, "message": "Product added to cart", "cart_item": cart_item.to_dict()}
@@ -47,7 +51,7 @@ class CartService:
                 if product:
                     cart_data.append({
                         **item.to_dict(),
-                        "product": product.to_dict()
+                        "product": product_cache.to_dict(product)
                     })
             
             return cart_data
@@ -58,10 +62,18 @@ class CartService:
     def remove_from_cart(self, user_id: str, item_id: str):
         """Remove an item from the user's cart"""
         try:
-            cart_item = Cart.query.filter_by(id=item_id, user_id=user_id).first()
-            if cart_item:
-                db.session.delete(cart_item)
-                db.session.commit()
+            product_ids = [
+                product_id
+                for (product_id,) in Cart.query.filter_by(
+                    id=item_id, user_id=user_id
+                ).with_entities(Cart.product_id)
+            ]
+            deleted = Cart.query.filter_by(id=item_id, user_id=user_id).delete(
+                synchronize_session=False
+            )
+            product_popularity.refresh(db.session, product_ids)
+            db.session.commit()
+            if deleted:
                 return {"success": True, "message": "Item removed from cart"}
             return {"success": False, "message": "Item not found in cart"}
         except Exception as e:
@@ -88,7 +100,14 @@ class CartService:
     def clear_cart(self, user_id: str):
         """Clear all items from the user's cart"""
         try:
-            Cart.query.filter_by(user_id=user_id).delete()
+            product_ids = [
+                product_id
+                for (product_id,) in Cart.query.filter_by(
+                    user_id=user_id
+                ).with_entities(Cart.product_id)
+            ]
+            Cart.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+            product_popularity.refresh(db.session, product_ids)
             db.session.commit()
             return {"success": True, "message": "Cart cleared"}
         except Exception as e:
@@ -0,0 +1,206 @@
+import logging
+import threading
+from typing import Any, Dict
+
+import numpy as np
+from models import db
+from models.catalog_change import CatalogChange
+from models.catalog_summary import CatalogSummary
+from models.product import Product
+from utils import fast_json, tracing
+
+from .catalog_snapshot import catalog_snapshot
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES = ("categories", "brands", "stats")
+
+
+class CatalogAggregates:
+    """Per-process categories, brands and stats of the active catalog
+
+    The aggregates are computed in one pass and kept, pre-encoded, for the
+    current catalog version. With the catalog snapshot enabled they come from
+    its columns, which are refreshed incrementally from the change log.
+    Without it they come from one grouped query, optionally shared between
+    processes through the catalog_summaries table.
+    """
+
+    def __init__(self):
+        self.persist = False
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Bind the aggregates to an application and read its settings"""
+        self.persist = app.config["CATALOG_SUMMARY_PERSIST"]
+        self._entry = None
+
+    def get(self) -> Dict[str, Any]:
+        """Get {"version", "categories", "brands", "stats"} for the current version"""
+        columns = catalog_snapshot.get()
+        version = (
+            columns.version if columns is not None else CatalogChange.current_version()
+        )
+
+        entry = self._entry
+        if entry is None or entry["version"] != version:
+            with self._lock:
+                entry = self._entry
+                if entry is None or entry["version"] != version:
+                    entry = self._build(version, columns)
+                    self._entry = entry
+
+        return entry
+
+    def fragment(self, name: str):
+        """Get one aggregate as pre-encoded JSON for fast_json responses"""
+        return self.get()["encoded"][name]
+
+    def _build(self, version, columns) -> Dict[str, Any]:
+        with tracing.span("catalog.aggregates"):
+            if columns is not None:
+                aggregates = self._from_columns(columns)
+            else:
+                aggregates = self._load_persisted(version)
+                if aggregates is None:
+                    aggregates = self._from_sql()
+                    self._persist(version, aggregates)
+
+        entry = {name: aggregates[name] for name in AGGREGATES}
+        entry["version"] = version
+        entry["encoded"] = {
+            name: fast_json.raw(fast_json.dumps(aggregates[name]))
+            for name in AGGREGATES
+        }
+        return entry
+
+    def _from_columns(self, columns) -> Dict[str, Any]:
+        """Aggregate the live rows of the snapshot"""
+        alive = columns.alive
+        category_codes = columns.codes["category"][alive]
+        subcategory_codes = columns.codes["subcategory"][alive]
+        brand_codes = np.unique(columns.codes["brand"][alive])
+        prices = columns.numeric["price"][alive]
+        ratings = columns.numeric["rating"][alive]
+        ratings = ratings[~np.isnan(ratings)]
+
+        categories = {}
+        if len(category_codes):
+            pairs = np.unique(
+                np.stack([category_codes, subcategory_codes], axis=1), axis=0
+            )
+            category_values = columns.dictionaries["category"]
+            subcategory_values = columns.dictionaries["subcategory"]
+            for category_code, subcategory_code in pairs:
+                categories.setdefault(category_values[category_code], set()).add(
+                    subcategory_values[subcategory_code]
+                )
+
+        brand_values = columns.dictionaries["brand"]
+        return _format(
+            categories=categories,
+            brands=[brand_values[code] for code in brand_codes],
+            total=int(alive.sum()),
+            min_price=float(prices.min()) if len(prices) else None,
+            max_price=float(prices.max()) if len(prices) else None,
+            rating_sum=float(ratings.sum()),
+            rating_count=len(ratings),
+            in_stock=int((columns.numeric["stock"][alive] > 0).sum()),
+        )
+
+    def _from_sql(self) -> Dict[str, Any]:
+        """Aggregate the active catalog with one grouped query"""
+        groups = [Product.category, Product.subcategory, Product.brand]
+        rows = (
+            db.session.query(
+                *groups,
+                db.func.count(),
+                db.func.min(Product.price),
+                db.func.max(Product.price),
+                db.func.sum(Product.rating),
+                db.func.count(Product.rating),
+                db.func.sum(db.case((Product.stock > 0, 1), else_=0)),
+            )
+            .filter(Product.is_active == True)
+            .group_by(*groups)
+            .all()
+        )
+
+        categories = {}
+        brands = set()
+        totals = {"total": 0, "rating_sum": 0.0, "rating_count": 0, "in_stock": 0}
+        min_price = max_price = None
+        for category, subcategory, brand, count, low, high, *rest in rows:
+            rating_sum, rating_count, in_stock = rest
+            categories.setdefault(category, set()).add(subcategory)
+            brands.add(brand)
+            totals["total"] += count
+            totals["rating_sum"] += rating_sum or 0.0
+            totals["rating_count"] += rating_count
+            totals["in_stock"] += in_stock or 0
+            if low is not None:
+                min_price = low if min_price is None else min(min_price, low)
+            if high is not None:
+                max_price = high if max_price is None else max(max_price, high)
+
+        return _format(
+            categories=categories,
+            brands=brands,
+            min_price=min_price,
+            max_price=max_price,
+            **totals,
+        )
+
+    def _load_persisted(self, version):
+        if not self.persist:
+            return None
+        try:
+            return CatalogSummary.load(version)
+        except Exception as e:
+            logger.warning(f"Error loading catalog summary: {str(e)}")
+            db.session.rollback()
+            return None
+
+    def _persist(self, version, aggregates):
+        if not self.persist:
+            return
+        try:
+            CatalogSummary.store(version, aggregates)
+        except Exception as e:
+            # Another process stored this version first
+            logger.debug(f"Catalog summary not stored: {str(e)}")
+            db.session.rollback()
+
+
+def _format(
+    categories,
+    brands,
+    total,
+    min_price,
+    max_price,
+    rating_sum,
+    rating_count,
+    in_stock,
+) -> Dict[str, Any]:
+    """Shape raw aggregates like the /categories, /brands and /stats responses"""
+    return {
+        "categories": [
+            {"category": category, "subcategories": sorted(subcategories)}
+            for category, subcategories in sorted(categories.items())
+        ],
+        "brands": sorted(brands),
+        "stats": {
+            "total_products": total,
+            "total_categories": len(categories),
+            "total_brands": len(brands),
+            "price_range": {"min": min_price or 0, "max": max_price or 0},
+            "average_rating": round(rating_sum / rating_count, 2)
+            if rating_count
+            else 0,
+            "in_stock_count": in_stock,
+        },
+    }
+
+
+catalog_aggregates = CatalogAggregates()
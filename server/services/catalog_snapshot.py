@@ -0,0 +1,543 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from models import db, product_terms
+from models.catalog_change import CatalogChange
+from models.product import Product
+from models.product_feature import ProductFeature
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+
+# Changes re-read below the snapshot version, so a write whose change ID was
+# allocated earlier but committed later than a newer one is not missed
+CHANGE_OVERLAP = 100
+
+NUMERIC_COLUMNS = {
+    "price": np.float64,
+    "original_price": np.float64,
+    "rating": np.float64,
+    "review_count": np.int64,
+    "stock": np.int64,
+    "discount_percentage": np.int64,
+    "popularity_score": np.float64,
+    "created_at": np.dtype("datetime64[us]"),
+}
+DICTIONARY_COLUMNS = ("category", "subcategory", "brand")
+FLAG_COLUMNS = ("is_on_sale",)
+
+# Loaded last in each row and kept only as an inverted index of feature terms
+FEATURES_COLUMN = "features"
+
+LOADED_COLUMNS = (
+    ["id"]
+    + list(NUMERIC_COLUMNS)
+    + list(DICTIONARY_COLUMNS)
+    + list(FLAG_COLUMNS)
+    + [FEATURES_COLUMN]
+)
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+class CatalogColumns:
+    """Immutable columnar copy of the active catalog at one catalog version
+
+    Numeric fields are NumPy arrays, category/subcategory/brand are dictionary
+    encoded as integer codes, and flags are boolean masks. Feature terms are
+    an inverted index of sorted row positions per term. Rows of deleted or
+    deactivated products stay in place with alive=False until the next rebuild.
+    """
+
+    def __init__(
+        self,
+        version,
+        ids,
+        numeric,
+        codes,
+        dictionaries,
+        flags,
+        alive,
+        row_terms,
+        postings,
+    ):
+        self.version = version
+        self.ids = ids
+        self.positions = {product_id: index for index, product_id in enumerate(ids)}
+        self.numeric = numeric
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.flags = flags
+        self.alive = alive
+        self.row_terms = row_terms
+        self.postings = postings
+        self._id_array = None
+        self._id_rank = None
+        self._orders = {}
+
+    @classmethod
+    def from_rows(cls, version, rows):
+        """Build columns from (id, *numeric, *dictionary, *flags, features) rows"""
+        rows = list(rows)
+        ids = [row[0] for row in rows]
+        numeric = {}
+        for offset, (name, dtype) in enumerate(NUMERIC_COLUMNS.items(), start=1):
+            numeric[name] = np.array(
+                [_number(row[offset], dtype) for row in rows], dtype=dtype
+            )
+
+        codes = {}
+        dictionaries = {}
+        base = 1 + len(NUMERIC_COLUMNS)
+        for offset, name in enumerate(DICTIONARY_COLUMNS, start=base):
+            values = []
+            lookup = {}
+            column_codes = np.empty(len(rows), dtype=np.int32)
+            for index, row in enumerate(rows):
+                column_codes[index] = _encode(row[offset] or "", values, lookup)
+            codes[name] = column_codes
+            dictionaries[name] = values
+
+        base += len(DICTIONARY_COLUMNS)
+        flags = {
+            name: np.array([bool(row[offset]) for row in rows], dtype=bool)
+            for offset, name in enumerate(FLAG_COLUMNS, start=base)
+        }
+
+        alive = np.ones(len(rows), dtype=bool)
+
+        row_terms = [_row_terms(row[-1]) for row in rows]
+        positions = {}
+        for position, terms in enumerate(row_terms):
+            for term in terms:
+                positions.setdefault(term, []).append(position)
+        postings = {
+            term: np.array(term_positions, dtype=np.int64)
+            for term, term_positions in positions.items()
+        }
+
+        return cls(
+            version, ids, numeric, codes, dictionaries, flags, alive, row_terms, postings
+        )
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    @property
+    def dead_rows(self):
+        return len(self.ids) - len(self)
+
+    def with_changes(self, version, rows, removed_ids):
+        """Copy with changed rows overwritten or appended and removed rows hidden"""
+        numeric = {name: array.copy() for name, array in self.numeric.items()}
+        codes = {name: array.copy() for name, array in self.codes.items()}
+        dictionaries = {
+            name: list(values) for name, values in self.dictionaries.items()
+        }
+        lookups = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in dictionaries.items()
+        }
+        flags = {name: array.copy() for name, array in self.flags.items()}
+        alive = self.alive.copy()
+        row_terms = list(self.row_terms)
+        removed_terms = {}
+        added_terms = {}
+
+        for product_id in removed_ids:
+            position = self.positions.get(product_id)
+            if position is not None:
+                alive[position] = False
+
+        appended = []
+        for row in rows:
+            position = self.positions.get(row[0])
+            if position is None:
+                appended.append(row)
+                continue
+
+            for offset, (name, dtype) in enumerate(NUMERIC_COLUMNS.items(), start=1):
+                numeric[name][position] = _number(row[offset], dtype)
+            base = 1 + len(NUMERIC_COLUMNS)
+            for offset, name in enumerate(DICTIONARY_COLUMNS, start=base):
+                codes[name][position] = _encode(
+                    row[offset] or "", dictionaries[name], lookups[name]
+                )
+            base += len(DICTIONARY_COLUMNS)
+            for offset, name in enumerate(FLAG_COLUMNS, start=base):
+                flags[name][position] = bool(row[offset])
+            alive[position] = True
+
+            terms = _row_terms(row[-1])
+            for term in set(row_terms[position]) - set(terms):
+                removed_terms.setdefault(term, []).append(position)
+            for term in set(terms) - set(row_terms[position]):
+                added_terms.setdefault(term, []).append(position)
+            row_terms[position] = terms
+
+        ids = self.ids
+        if appended:
+            ids = ids + [row[0] for row in appended]
+            for offset, (name, dtype) in enumerate(NUMERIC_COLUMNS.items(), start=1):
+                extra = [_number(row[offset], dtype) for row in appended]
+                numeric[name] = np.concatenate(
+                    [numeric[name], np.array(extra, dtype=dtype)]
+                )
+            base = 1 + len(NUMERIC_COLUMNS)
+            for offset, name in enumerate(DICTIONARY_COLUMNS, start=base):
+                extra = [
+                    _encode(row[offset] or "", dictionaries[name], lookups[name])
+                    for row in appended
+                ]
+                codes[name] = np.concatenate(
+                    [codes[name], np.array(extra, dtype=np.int32)]
+                )
+            base += len(DICTIONARY_COLUMNS)
+            for offset, name in enumerate(FLAG_COLUMNS, start=base):
+                extra = [bool(row[offset]) for row in appended]
+                flags[name] = np.concatenate([flags[name], np.array(extra, dtype=bool)])
+            alive = np.concatenate([alive, np.ones(len(appended), dtype=bool)])
+
+            for position, row in enumerate(appended, start=len(row_terms)):
+                terms = _row_terms(row[-1])
+                for term in terms:
+                    added_terms.setdefault(term, []).append(position)
+                row_terms.append(terms)
+
+        # Posting arrays are shared with the previous copy, so replace, never modify
+        postings = dict(self.postings)
+        for term in set(removed_terms) | set(added_terms):
+            term_positions = postings.get(term, _NO_ROWS)
+            if term in removed_terms:
+                term_positions = term_positions[
+                    ~np.isin(term_positions, removed_terms[term])
+                ]
+            if term in added_terms:
+                term_positions = np.union1d(term_positions, added_terms[term])
+            if len(term_positions):
+                postings[term] = term_positions
+            else:
+                postings.pop(term, None)
+
+        return CatalogColumns(
+            version,
+            ids,
+            numeric,
+            codes,
+            dictionaries,
+            flags,
+            alive,
+            row_terms,
+            postings,
+        )
+
+    def value_mask(self, name: str, term: Optional[str]) -> np.ndarray:
+        """Mask of rows whose value has one of the keys the term resolves to"""
+        keys = set(product_terms.resolve(name, term))
+        matching = [
+            code
+            for code, value in enumerate(self.dictionaries[name])
+            if product_terms.normalize(value) in keys
+        ]
+        return np.isin(self.codes[name], matching)
+
+    def mask(
+        self,
+        category=None,
+        subcategory=None,
+        brand=None,
+        min_price=None,
+        max_price=None,
+        min_rating=None,
+        in_stock_only=False,
+        features=None,
+        features_mode="all",
+    ) -> np.ndarray:
+        """Mask of live rows matching the same filters as Product.filter_query"""
+        mask = self.alive.copy()
+
+        if category:
+            mask &= self.value_mask("category", category)
+        if subcategory:
+            mask &= self.value_mask("subcategory", subcategory)
+        if brand:
+            mask &= self.value_mask("brand", brand)
+        if min_price is not None:
+            mask &= self.numeric["price"] >= min_price
+        if max_price is not None:
+            mask &= self.numeric["price"] <= max_price
+        if min_rating is not None:
+            mask &= self.numeric["rating"] >= min_rating
+        if in_stock_only:
+            mask &= self.numeric["stock"] > 0
+        if features:
+            if features_mode not in Product.FEATURE_MODES:
+                raise ValueError(f"Unknown features_mode: {features_mode}")
+            mask &= self.feature_mask(Product.feature_list(features), features_mode)
+
+        return mask
+
+    def feature_mask(self, features: List[str], mode: str = "all") -> np.ndarray:
+        """Mask of rows having every term of all ("all") or any ("any") features"""
+        groups = [set(product_terms.feature_terms(feature)) for feature in features]
+        groups = [terms for terms in groups if terms]
+        mask = np.zeros(len(self.ids), dtype=bool)
+        if not groups:
+            mask[:] = True
+            return mask
+
+        if mode == "all":
+            groups = [set().union(*groups)]
+        for terms in groups:
+            mask[self.intersect_postings(terms)] = True
+        return mask
+
+    def intersect_postings(self, terms: Iterable[str]) -> np.ndarray:
+        """Row positions in every term's posting list, smallest list first
+
+        Each step binary-searches the surviving positions in the next list, so
+        the cost follows the smallest list rather than the largest.
+        """
+        lists = sorted((self.postings.get(term, _NO_ROWS) for term in terms), key=len)
+        result = lists[0]
+        for postings in lists[1:]:
+            if not len(result):
+                break
+            found = np.minimum(np.searchsorted(postings, result), len(postings) - 1)
+            result = result[postings[found] == result]
+        return result
+
+    def filter_ids(self, limit: Optional[int] = None, **filters) -> List[str]:
+        """IDs of matching products, highest rated first"""
+        positions = np.flatnonzero(self.mask(**filters))
+        ratings = np.nan_to_num(self.numeric["rating"][positions], nan=-1.0)
+        order = positions[np.argsort(-ratings, kind="stable")]
+        if limit is not None:
+            order = order[:limit]
+        return [self.ids[position] for position in order]
+
+    def sort_order(self, column: str) -> np.ndarray:
+        """Row positions ordered by (column, id) ascending, computed once per copy"""
+        order = self._orders.get(column)
+        if order is None:
+            if self._id_rank is None:
+                self._id_array = np.array(self.ids, dtype=str)
+                self._id_rank = np.empty(len(self.ids), dtype=np.int64)
+                self._id_rank[np.argsort(self._id_array, kind="stable")] = np.arange(
+                    len(self.ids)
+                )
+            order = np.lexsort((self._id_rank, self.numeric[column]))
+            self._orders[column] = order
+        return order
+
+    def page_ids(
+        self,
+        column: str,
+        descending: bool,
+        limit: int,
+        after: Optional[tuple] = None,
+        **filters,
+    ) -> List[str]:
+        """Up to limit IDs of matching products in (column, id) order after a key
+
+        after is the (column value, id) of the last row of the previous page; the
+        page starts strictly after it, so it need not exist any more.
+        """
+        order = self.sort_order(column)
+        if after is not None:
+            keys = self.numeric[column][order]
+            key = np.array(after[0], dtype=keys.dtype)
+            low = int(np.searchsorted(keys, key, side="left"))
+            high = int(np.searchsorted(keys, key, side="right"))
+            tied_ids = self._id_array[order[low:high]]
+            side = "left" if descending else "right"
+            split = low + int(np.searchsorted(tied_ids, after[1], side=side))
+            order = order[:split] if descending else order[split:]
+
+        if descending:
+            order = order[::-1]
+
+        mask = self.mask(**filters)
+        positions = order[mask[order]][:limit]
+        return [self.ids[position] for position in positions]
+
+    def match_ids(self, product_ids: Iterable[str], **filters) -> List[str]:
+        """Keep the given IDs, in order, that are live and match the filters"""
+        product_ids = list(product_ids)
+        positions = np.array(
+            [self.positions.get(product_id, -1) for product_id in product_ids],
+            dtype=np.int64,
+        )
+        known = positions >= 0
+        keep = np.zeros(len(product_ids), dtype=bool)
+        keep[known] = self.mask(**filters)[positions[known]]
+        return [product_id for product_id, kept in zip(product_ids, keep) if kept]
+
+    def values_by_id(self, column: str, product_ids: Iterable[str]) -> Dict[str, float]:
+        """Get {id: value} of a numeric column for the given IDs that are live"""
+        values = self.numeric[column]
+        result = {}
+        for product_id in product_ids:
+            position = self.positions.get(product_id)
+            if position is not None and self.alive[position]:
+                result[product_id] = values[position].item()
+        return result
+
+
+class CatalogSnapshot:
+    """Per-process columnar snapshot of the catalog, refreshed from the change log.
+
+    Readers get the current CatalogColumns without locking. At most once per
+    CATALOG_SNAPSHOT_REFRESH_INTERVAL a reader checks the catalog version; if
+    it moved, only the changed products are re-read and applied to a copy that
+    replaces the current one. A process that commits a product write checks on
+    its next read, so it always sees its own writes. A full rebuild happens on
+    first use, and when more than a quarter of the rows changed or are dead.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.refresh_interval = 1.0
+        self._columns = None
+        self._changed_at = None
+        self._checked_at = 0.0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Bind the snapshot to an application and read its settings"""
+        self.app = app
+        self.enabled = app.config["CATALOG_SNAPSHOT_ENABLED"]
+        self.refresh_interval = app.config["CATALOG_SNAPSHOT_REFRESH_INTERVAL"]
+        CatalogChange.on_commit(self.expire)
+
+    def expire(self):
+        """Check the catalog version on the next get(), ignoring the interval"""
+        self._checked_at = 0.0
+
+    def get(self) -> Optional[CatalogColumns]:
+        """Get the current columns, refreshing them if the catalog changed"""
+        if not self.enabled:
+            return None
+
+        if self._pid != os.getpid():
+            # Locks do not survive a fork; the inherited columns are still valid
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing catalog snapshot: {str(e)}")
+                db.session.rollback()
+                return None
+
+        return self._columns
+
+    @property
+    def version(self) -> Optional[int]:
+        columns = self._columns
+        return columns.version if columns is not None else None
+
+    def state(self):
+        """Get (catalog version, time of the last change) for HTTP validators
+
+        Served from the snapshot when it is enabled, so most requests answer
+        without touching the database.
+        """
+        columns = self.get()
+        if columns is None:
+            return CatalogChange.current_state()
+        return columns.version, self._changed_at
+
+    def refresh(self, full: bool = False):
+        """Bring the snapshot up to the current catalog version"""
+        if not self._lock.acquire(blocking=self._columns is None):
+            return  # another thread is refreshing; keep serving the current copy
+
+        try:
+            self._checked_at = time.monotonic()
+            columns = self._columns
+            version, self._changed_at = CatalogChange.current_state()
+
+            if not full and columns is not None and columns.version == version:
+                return
+
+            with tracing.span("catalog.snapshot_refresh"):
+                if full or columns is None:
+                    self._columns = self._load_all(version)
+                    logger.info(
+                        f"Built catalog snapshot of {len(self._columns)} products "
+                        f"at version {version}"
+                    )
+                    return
+
+                changes, latest = CatalogChange.changed_since(
+                    max(columns.version - CHANGE_OVERLAP, 0)
+                )
+                if len(changes) > max(len(columns.ids) // 4, CHANGE_OVERLAP):
+                    self._columns = self._load_all(version)
+                    return
+
+                updated = self._load_rows(changes)
+                removed = set(changes) - {row[0] for row in updated}
+                columns = columns.with_changes(max(latest, version), updated, removed)
+
+                if columns.dead_rows > len(columns.ids) // 4:
+                    columns = self._load_all(version)
+
+                self._columns = columns
+        finally:
+            self._lock.release()
+
+    def _load_all(self, version) -> CatalogColumns:
+        rows = (
+            db.session.query(*[getattr(Product, name) for name in LOADED_COLUMNS])
+            .filter(Product.is_active == True)
+            .all()
+        )
+        return CatalogColumns.from_rows(version, rows)
+
+    def _load_rows(self, changes: Dict[str, str]):
+        product_ids = [
+            product_id
+            for product_id, operation in changes.items()
+            if operation != CatalogChange.OPERATION_DELETE
+        ]
+        if not product_ids:
+            return []
+
+        return (
+            db.session.query(*[getattr(Product, name) for name in LOADED_COLUMNS])
+            .filter(Product.id.in_(product_ids), Product.is_active == True)
+            .all()
+        )
+
+
+def _number(value, dtype):
+    if value is None:
+        if dtype is np.float64:
+            return np.nan
+        return np.datetime64("NaT") if np.dtype(dtype).kind == "M" else 0
+    return value
+
+
+def _row_terms(features) -> tuple:
+    return tuple(sorted(ProductFeature.terms(features)))
+
+
+def _encode(value, values, lookup):
+    code = lookup.get(value)
+    if code is None:
+        code = lookup[value] = len(values)
+        values.append(value)
+    return code
+
+
+catalog_snapshot = CatalogSnapshot()
@@ -0,0 +1,148 @@
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import current_app
+from models import db
+from models.chat_job import ChatJob
+
+from .message_buffer import message_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class ChatJobService:
+    """Service for queueing chat turns and running them outside the web workers"""
+
+    def enqueue(
+        self, session_id: str, user_message: str, user_id: str = None
+    ) -> ChatJob:
+        """Store a queued chat job and return it"""
+        try:
+            job = ChatJob(
+                id=str(uuid.uuid4()),
+                chat_session_id=session_id,
+                message=user_message,
+                user_id=user_id,
+            )
+            db.session.add(job)
+            db.session.commit()
+
+            logger.info(f"Enqueued chat job {job.id} for session {session_id}")
+            return job
+
+        except Exception as e:
+            logger.error(f"Error enqueueing chat job: {str(e)}")
+            db.session.rollback()
+            raise
+
+    def get_job(self, job_id: str) -> Optional[ChatJob]:
+        """Get a chat job by ID"""
+        return ChatJob.query.get(job_id)
+
+    def wait_for_job(self, job_id: str, timeout: float = 0) -> Optional[ChatJob]:
+        """Long-poll a job until it finishes or the timeout elapses"""
+        poll_interval = current_app.config["CHAT_JOB_POLL_INTERVAL"]
+        deadline = time.monotonic() + max(timeout, 0)
+
+        while True:
+            job = self.get_job(job_id)
+            if not job or job.is_finished() or time.monotonic() >= deadline:
+                return job
+
+            # End the read transaction so the next poll sees the worker's commit
+            db.session.rollback()
+            time.sleep(min(poll_interval, max(deadline - time.monotonic(), 0)))
+
+    def claim_next_job(self, worker_id: str) -> Optional[ChatJob]:
+        """Atomically move the oldest queued job to running and return it"""
+        candidates = (
+            db.session.query(ChatJob.id)
+            .filter(ChatJob.status == ChatJob.STATUS_QUEUED)
+            .order_by(ChatJob.created_at.asc())
+            .limit(5)
+            .all()
+        )
+
+        for (job_id,) in candidates:
+            claimed = (
+                ChatJob.query.filter(
+                    ChatJob.id == job_id, ChatJob.status == ChatJob.STATUS_QUEUED
+                ).update(
+                    {
+                        ChatJob.status: ChatJob.STATUS_RUNNING,
+                        ChatJob.worker_id: worker_id,
+                        ChatJob.started_at: datetime.now(),
+                        ChatJob.attempts: ChatJob.attempts + 1,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.session.commit()
+
+            if claimed == 1:
+                return self.get_job(job_id)
+
+        return None
+
+    def run_job(self, job: ChatJob, chat_service) -> ChatJob:
+        """Run a claimed job through the chat pipeline and store the outcome"""
+        try:
+            response = chat_service.process_message(
+                job.chat_session_id, job.message, job.user_id
+            )
+            # Other processes serve the history, so make the turn durable now
+            message_buffer.flush()
+            job.set_result(response)
+            job.status = ChatJob.STATUS_SUCCEEDED
+            job.error = None
+
+        except Exception as e:
+            logger.error(f"Error running chat job {job.id}: {str(e)}")
+            db.session.rollback()
+            job = self.get_job(job.id)
+            job.status = ChatJob.STATUS_FAILED
+            job.error = "Failed to process message"
+
+        job.finished_at = datetime.now()
+        db.session.commit()
+        return job
+
+    def requeue_stale_jobs(self) -> int:
+        """Requeue jobs whose worker died mid-turn, failing them after max attempts"""
+        stale_before = datetime.now() - timedelta(
+            seconds=current_app.config["CHAT_JOB_STALE_AFTER"]
+        )
+        max_attempts = current_app.config["CHAT_JOB_MAX_ATTEMPTS"]
+
+        try:
+            stale = ChatJob.query.filter(
+                ChatJob.status == ChatJob.STATUS_RUNNING,
+                ChatJob.started_at < stale_before,
+            )
+            failed = stale.filter(ChatJob.attempts >= max_attempts).update(
+                {
+                    ChatJob.status: ChatJob.STATUS_FAILED,
+                    ChatJob.error: "Chat worker stopped before finishing the job",
+                    ChatJob.finished_at: datetime.now(),
+                },
+                synchronize_session=False,
+            )
+            requeued = stale.filter(ChatJob.attempts < max_attempts).update(
+                {ChatJob.status: ChatJob.STATUS_QUEUED, ChatJob.worker_id: None},
+                synchronize_session=False,
+            )
+            db.session.commit()
+
+            if failed or requeued:
+                logger.warning(
+                    f"Recovered stale chat jobs: {requeued} requeued, {failed} failed"
+                )
+            return requeued + failed
+
+        except Exception as e:
+            logger.error(f"Error requeueing stale chat jobs: {str(e)}")
+            db.session.rollback()
+            return 0
@@ -1,7 +1,8 @@
+import functools
 import json
 import logging
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from flask import current_app
 from langchain.agents import AgentType, initialize_agent
@@ -9,11 +10,16 @@ from langchain.memory import ConversationBufferWindowMemory
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from langchain.tools import Tool
 from langchain_google_genai import ChatGoogleGenerativeAI
+from sqlalchemy import and_, or_
+from models import db
 from models.chat_session import ChatSession
 from models.message import Message
 from models.product import Product
+from utils import tracing
+from utils.pagination import decode_cursor, encode_cursor
 
 from .cart_service import CartService
+from .message_buffer import message_buffer
 from .product_service import ProductService
 from .vector_service import VectorService
 
@@ -61,17 +67,17 @@ class ChatService:
             )
         return self.memory_sessions[session_id]
 
-    def create_tools(self) -> List[Tool]:
-        """Create tools for the LangChain agent"""
+    def create_tools(self, user_id: Optional[str] = None) -> List[Tool]:
+        """Create tools for the LangChain agent, acting for the given user"""
         tools = [
             Tool(
                 name="search_products",
-                description="Find products using semantic search. Input: search query (str).",
+                description="Find products by meaning, keywords or exact model names. Input: search query (str).",
                 func=self._search_products_tool,
             ),
             Tool(
                 name="filter_products",
-                description="Filter products. Input: JSON string with keys: category, subcategory, brand, min_price, max_price, min_rating, in_stock_only, features (list), search_query, limit.",
+                description="Filter products. Input: JSON string with keys: category, subcategory, brand, min_price, max_price, min_rating, in_stock_only, features (list; a product must have all of them unless features_mode is 'any'), features_mode, search_query, limit.",
                 func=self._filter_products_tool,
             ),
             Tool(
@@ -87,19 +93,21 @@ class ChatService:
             Tool(
                 name="add_to_cart",
                 description="Add a product to the user's cart. Input: JSON string with keys: product_id (str), quantity (int, optional, default 1).",
-                func=self._add_to_cart_tool,
+                func=functools.partial(self._add_to_cart_tool, user_id=user_id),
             ),
         ]
         return tools
 
+    @tracing.traced("tool.search_products")
     def _search_products_tool(self, query: str) -> str:
-        """Tool function for semantic product search"""
+        """Tool function for product search in the configured search mode"""
         try:
-            similar_products = self.vector_service.search_similar_products(
-                query, top_k=6
+            product_ids, _ = self.product_service.search_ids(
+                query, limit=6, correct=False
             )
+            products = self.product_service.representations(product_ids)
 
-            if not similar_products:
+            if not products:
                 return json.dumps(
                     {
                         "message": "No products found for the given query.",
@@ -107,13 +115,14 @@ class ChatService:
                     }
                 )
 
-            product_ids = [p["id"] for p in similar_products]
-            products = Product.query.filter(Product.id.in_(product_ids)).all()
+            product_ids = [product["id"] for product in products]
 
             result = "Found the following products:\n"
             for product in products:
-                result += f"- {product.name} by {product.brand} - ${product.price}\n"
-                result += f"  {product.description[:100]}...\n"
+                result += (
+                    f"- {product['name']} by {product['brand']} - ${product['price']}\n"
+                )
+                result += f"  {product['description'][:100]}...\n"
 
             return json.dumps({"message": result, "product_ids": product_ids})
 
@@ -126,11 +135,14 @@ class ChatService:
                 }
             )
 
+    @tracing.traced("tool.filter_products")
     def _filter_products_tool(self, filter_json: str) -> str:
         """Tool function for filtering products"""
         try:
             filters = json.loads(filter_json)
-            products = Product.search_by_filters(**filters)
+            products = self.product_service.representations(
+                self.product_service.filter_ids(**filters)
+            )
 
             if not products:
                 return json.dumps(
@@ -142,9 +154,11 @@ class ChatService:
 
             result = f"Found {len(products)} products matching your criteria:\n"
             for product in products[:5]:
-                result += f"- {product.name} by {product.brand} - ${product.price}\n"
+                result += (
+                    f"- {product['name']} by {product['brand']} - ${product['price']}\n"
+                )
 
-            product_ids = [product.id for product in products[:5]]
+            product_ids = [product["id"] for product in products[:5]]
             return json.dumps({"message": result, "product_ids": product_ids})
 
         except Exception as e:
@@ -156,6 +170,7 @@ class ChatService:
                 }
             )
 
+    @tracing.traced("tool.get_product_details")
     def _get_product_details_tool(self, product_id: str) -> str:
         """Tool function for getting product details"""
         try:
@@ -178,6 +193,7 @@ class ChatService:
             logger.error(f"Error in get_product_details_tool: {str(e)}")
             return "Error occurred while getting product details."
 
+    @tracing.traced("tool.get_recommendations")
     def _get_recommendations_tool(self, input_text: str) -> str:
         """Tool function for getting product recommendations"""
         try:
@@ -215,8 +231,9 @@ class ChatService:
             logger.error(f"Error in get_recommendations_tool: {str(e)}")
             return "Error occurred while getting recommendations."
 
-    def _add_to_cart_tool(self, input_json: str) -> str:
-        """Tool function to add a product to the user's cart"""
+    @tracing.traced("tool.add_to_cart")
+    def _add_to_cart_tool(self, input_json: str, user_id: Optional[str] = None) -> str:
+        """Tool function to add a product to the user's cart; guests must log in"""
         try:
             # Log the input for debugging
             logger.info(f"add_to_cart_tool input: {input_json}")
@@ -224,10 +241,17 @@ class ChatService:
             data = json.loads(input_json)
             product_id = data.get("product_id")
             quantity = data.get("quantity", 1)
-            user_id = data.get("user_id", "guest_user")
 
             logger.info(f"Parsed data: product_id={product_id}, quantity={quantity}, user_id={user_id}")
 
+            if not user_id:
+                return json.dumps(
+                    {
+                        "message": "Please log in to add items to your cart.",
+                        "success": False,
+                    }
+                )
+
             if not product_id:
                 return json.dumps(
                     {"message": "Missing product_id for add to cart.", "success": False}
@@ -307,6 +331,7 @@ class ChatService:
                 product_names.append(product.name)
         return product_names
 
+    @tracing.traced_turn("chat.turn")
     def process_message(
         self, session_id: str, user_message: str, user_id: str = None
     ) -> Dict[str, Any]:
@@ -315,13 +340,12 @@ class ChatService:
             self.initialize()
 
         try:
-            chat_session = ChatSession.query.get(session_id)
+            with tracing.span("db.session_lookup"):
+                chat_session = self.get_session(session_id)
             if not chat_session:
-                chat_session = ChatSession(id=session_id, user_id=user_id)
-                from app import db
-
-                db.session.add(chat_session)
-                db.session.commit()
+                message_buffer.add_session(
+                    ChatSession(id=session_id, user_id=user_id)
+                )
 
             user_msg = Message(
                 id=str(uuid.uuid4()),
@@ -329,9 +353,7 @@ class ChatService:
                 content=user_message,
                 is_bot=False,
             )
-            from app import db
-
-            db.session.add(user_msg)
+            message_buffer.add_message(user_msg)
 
             memory = self.get_or_create_memory(session_id)
             chat_history = []
@@ -342,15 +364,16 @@ class ChatService:
                     elif isinstance(msg, str):
                         chat_history.append(msg)
 
-            tools = self.create_tools()
-            agent = initialize_agent(
-                tools=tools,
-                llm=self.llm,
-                agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
-                memory=memory,
-                verbose=True,
-                handle_parsing_errors=True,
-            )
+            tools = self.create_tools(user_id)
+            with tracing.span("chat.agent_setup"):
+                agent = initialize_agent(
+                    tools=tools,
+                    llm=self.llm,
+                    agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
+                    memory=memory,
+                    verbose=True,
+                    handle_parsing_errors=True,
+                )
 
             system_prompt = """You are Storey, an AI shopping assistant for an electronics e-commerce store.
             You help customers find the perfect tech products based on their needs and preferences.   
@@ -366,15 +389,16 @@ class ChatService:
             - If the user says "add this to cart" or similar, use the product name from your most recent message
 
             Available tools:
-            - search_products: Find products using semantic search. Input: search query (str).
-            - filter_products: Filter products. Input: JSON string with keys: category, subcategory, brand, min_price, max_price, min_rating, in_stock_only, features (list), search_query, limit.
+            - search_products: Find products by meaning, keywords or exact model names. Input: search query (str).
+            - filter_products: Filter products. Input: JSON string with keys: category, subcategory, brand, min_price, max_price, min_rating, in_stock_only, features (list; a product must have all of them unless features_mode is 'any'), features_mode, search_query, limit.
             - get_product_details: Get product details. Input: product ID (str).
             - get_recommendations: Get recommendations. Input: product ID (str) or preference description (str).
             - add_to_cart: Add a product to the user's cart. Input: JSON string with keys: product_id (str or product name), quantity (int, optional, default 1).
             """
 
             agent_input = {"input": f"{system_prompt}\n\nUser: {user_message}"}
-            result = agent(agent_input)
+            with tracing.span("chat.agent"):
+                result = agent(agent_input)
             ai_response = (
                 result["output"]
                 if isinstance(result, dict) and "output" in result
@@ -410,14 +434,17 @@ class ChatService:
                     pass
 
             if not product_ids:
-                product_names = self._extract_product_names_from_text(message_text)
-                if product_names:
-                    product_ids = [
-                        p.id
-                        for p in Product.query.filter(
-                            Product.name.in_(product_names)
-                        ).all()
-                    ]
+                with tracing.span("db.product_name_match"):
+                    product_names = self._extract_product_names_from_text(
+                        message_text
+                    )
+                    if product_names:
+                        product_ids = [
+                            p.id
+                            for p in Product.query.filter(
+                                Product.name.in_(product_names)
+                            ).all()
+                        ]
 
             ai_msg = Message(
                 id=str(uuid.uuid4()),
@@ -427,16 +454,17 @@ class ChatService:
                 message_type="product" if product_ids else "text",
                 products=product_ids,
             )
-            db.session.add(ai_msg)
-            db.session.commit()
+            message_buffer.add_message(ai_msg)
 
             products = []
             if product_ids:
-                products = [
-                    Product.query.get(pid).to_dict()
-                    for pid in product_ids
-                    if Product.query.get(pid)
-                ]
+                with tracing.span("db.product_hydration"):
+                    products_by_id = Message.load_products(product_ids)
+                    products = [
+                        products_by_id[pid]
+                        for pid in product_ids
+                        if pid in products_by_id
+                    ]
 
             return {
                 "id": ai_msg.id,
@@ -455,10 +483,7 @@ class ChatService:
                 content="I'm sorry, I encountered an error. Please try again.",
                 is_bot=True,
             )
-            from app import db
-
-            db.session.add(error_msg)
-            db.session.commit()
+            message_buffer.add_message(error_msg)
             return {
                 "id": error_msg.id,
                 "content": error_msg.content,
@@ -475,23 +500,190 @@ class ChatService:
 
         return product_ids
 
+    def get_session(self, session_id: str) -> Optional[ChatSession]:
+        """Get a chat session, including one still waiting in the write buffer"""
+        chat_session = ChatSession.query.get(session_id)
+        return chat_session or message_buffer.get_pending_session(session_id)
+
     def get_chat_history(
-        self, session_id: str, limit: int = 50
-    ) -> List[Dict[str, Any]]:
-        """Get chat history for a session"""
-        try:
-            messages = (
-                Message.query.filter_by(chat_session_id=session_id)
-                .order_by(Message.created_at.asc())
-                .limit(limit)
+        self,
+        session_id: str,
+        limit: int = 50,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Get a page of chat history using (created_at, id) keyset cursors
+
+        Without a cursor the newest page is returned. ``before`` pages towards
+        older messages and ``after`` towards newer ones; each page is in
+        chronological order. Buffered messages are merged in so a session
+        always sees its own writes.
+        """
+        cursor = decode_cursor(before or after, 2) if (before or after) else None
+        newest_first = after is None
+
+        query = Message.query.filter(Message.chat_session_id == session_id)
+        if cursor:
+            cursor_created_at, cursor_id = cursor
+            if before:
+                query = query.filter(
+                    or_(
+                        Message.created_at < cursor_created_at,
+                        and_(
+                            Message.created_at == cursor_created_at,
+                            Message.id < cursor_id,
+                        ),
+                    )
+                )
+            else:
+                query = query.filter(
+                    or_(
+                        Message.created_at > cursor_created_at,
+                        and_(
+                            Message.created_at == cursor_created_at,
+                            Message.id > cursor_id,
+                        ),
+                    )
+                )
+
+        if newest_first:
+            query = query.order_by(Message.created_at.desc(), Message.id.desc())
+        else:
+            query = query.order_by(Message.created_at.asc(), Message.id.asc())
+
+        with tracing.span("db.history_page"):
+            messages = query.limit(limit + 1).all()
+
+        loaded_ids = {msg.id for msg in messages}
+        for msg in message_buffer.get_pending_messages(session_id):
+            position = (msg.created_at, msg.id)
+            if msg.id in loaded_ids:
+                continue
+            if cursor and before and position >= tuple(cursor):
+                continue
+            if cursor and after and position <= tuple(cursor):
+                continue
+            messages.append(msg)
+
+        messages.sort(key=lambda msg: (msg.created_at, msg.id))
+        has_more = len(messages) > limit
+        messages = messages[-limit:] if newest_first else messages[:limit]
+
+        with tracing.span("db.history_products"):
+            products_by_message = Message.hydrate_products(messages)
+
+        history = [
+            msg.to_dict(
+                include_product_details=True, products=products_by_message[msg.id]
+            )
+            for msg in messages
+        ]
+
+        has_older = has_more if newest_first else True
+        has_newer = has_more if not newest_first else before is not None
+        page = {
+            "limit": limit,
+            "has_older": bool(messages) and has_older,
+            "has_newer": bool(messages) and has_newer,
+            "before": encode_cursor(messages[0].created_at, messages[0].id)
+            if messages
+            else None,
+            "after": encode_cursor(messages[-1].created_at, messages[-1].id)
+            if messages
+            else after,
+        }
+
+        return history, page
+
+    def list_user_sessions(
+        self, user_id: str, limit: int = 20, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Get a page of a user's chat sessions, most recently active first
+
+        Message counts, last-message time and preview are denormalized on the
+        session row, so a page is a single indexed query on
+        (user_id, updated_at, id).
+        """
+        query = ChatSession.query.filter(ChatSession.user_id == user_id)
+
+        if cursor:
+            cursor_updated_at, cursor_id = decode_cursor(cursor, 2)
+            query = query.filter(
+                or_(
+                    ChatSession.updated_at < cursor_updated_at,
+                    and_(
+                        ChatSession.updated_at == cursor_updated_at,
+                        ChatSession.id < cursor_id,
+                    ),
+                )
+            )
+
+        with tracing.span("db.session_list"):
+            sessions = (
+                query.order_by(ChatSession.updated_at.desc(), ChatSession.id.desc())
+                .limit(limit + 1)
                 .all()
             )
 
-            return [msg.to_dict(include_product_details=True) for msg in messages]
+        has_more = len(sessions) > limit
+        sessions = sessions[:limit]
+        page = {
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(sessions[-1].updated_at, sessions[-1].id)
+            if has_more
+            else None,
+        }
+
+        return [
+            session.to_dict(include_session_data=False) for session in sessions
+        ], page
+
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a chat session with its messages in a single statement
+
+        Messages and their product links go with it through ON DELETE CASCADE,
+        so nothing is loaded into the ORM.
+        """
+        try:
+            with tracing.span("db.session_delete"):
+                deleted = ChatSession.query.filter_by(id=session_id).delete(
+                    synchronize_session=False
+                )
+                db.session.commit()
+
+            self.clear_session_memory(session_id)
+            return deleted > 0
+
+        except Exception as e:
+            logger.error(f"Error deleting chat session {session_id}: {str(e)}")
+            db.session.rollback()
+            raise
+
+    def clear_session_messages(self, session_id: str) -> int:
+        """Delete all messages of a session and reset its denormalized stats"""
+        try:
+            with tracing.span("db.session_clear"):
+                deleted = Message.query.filter_by(chat_session_id=session_id).delete(
+                    synchronize_session=False
+                )
+                ChatSession.query.filter_by(id=session_id).update(
+                    {
+                        ChatSession.message_count: 0,
+                        ChatSession.last_message_at: None,
+                        ChatSession.last_message_preview: None,
+                    },
+                    synchronize_session=False,
+                )
+                db.session.commit()
+
+            self.clear_session_memory(session_id)
+            return deleted
 
         except Exception as e:
-            logger.error(f"Error getting chat history: {str(e)}")
-            return []
+            logger.error(f"Error clearing chat session {session_id}: {str(e)}")
+            db.session.rollback()
+            raise
 
     def clear_session_memory(self, session_id: str):
         """Clear memory for a specific session"""
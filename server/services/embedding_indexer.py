@@ -0,0 +1,288 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from models import db
+from models.catalog_change import CatalogChange
+from models.embedding_outbox import EmbeddingOutbox
+from models.index_version import IndexVersion
+from models.product import Product
+from utils import tracing
+
+from .search_cache import search_cache
+from .vector_service import VectorService
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingIndexer:
+    """Drains the embedding outbox into the vector index.
+
+    Each batch claims due outbox rows with a lease, coalesces them to one
+    update per product, and reconciles the index with the product's current
+    row: active products are embedded with one batched upsert, missing or
+    inactive ones are deleted. Products with only metadata updates queued
+    have their vector metadata set in place, without inference. Rows are
+    deleted only after the index call succeeds; on failure they are retried
+    with exponential backoff, and a claim whose drainer died becomes due
+    again when its lease expires.
+
+    With EMBEDDING_INDEXER_THREAD each process runs a background drainer,
+    woken right after it commits a product write. scripts/embedding_indexer.py
+    runs a standalone one.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.batch_size = 100
+        self.poll_interval = 5.0
+        self.max_attempts = 10
+        self.retry_delay = 5.0
+        self.max_retry_delay = 900.0
+        self.lease = 300.0
+        self.vector_service = None
+        self._pid = None
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Bind the indexer to an application and read its settings"""
+        self.app = app
+        self.enabled = app.config["EMBEDDING_INDEXER_THREAD"]
+        self.batch_size = app.config["EMBEDDING_OUTBOX_BATCH_SIZE"]
+        self.poll_interval = app.config["EMBEDDING_OUTBOX_POLL_INTERVAL"]
+        self.max_attempts = app.config["EMBEDDING_OUTBOX_MAX_ATTEMPTS"]
+        self.retry_delay = app.config["EMBEDDING_OUTBOX_RETRY_DELAY"]
+        self.max_retry_delay = app.config["EMBEDDING_OUTBOX_MAX_RETRY_DELAY"]
+        self.lease = app.config["EMBEDDING_OUTBOX_LEASE"]
+
+        if self.enabled:
+            CatalogChange.on_commit(self.wake)
+            app.before_request(self._ensure_worker)
+
+    def wake(self):
+        """Make the background drainer run now instead of at its next poll"""
+        if not self.enabled:
+            return
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def _ensure_worker(self):
+        """Start the drainer thread, once per process (gunicorn forks after preload)"""
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._wakeup = threading.Event()
+                self._pid = os.getpid()
+
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="embedding-indexer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.drain()
+            except Exception as e:
+                logger.error(f"Error in embedding indexer thread: {str(e)}")
+
+    def drain(self, max_batches: Optional[int] = None) -> Dict[str, int]:
+        """Process due outbox rows batch by batch until none are left"""
+        totals = {"upserted": 0, "updated": 0, "deleted": 0, "failed": 0}
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            result = self.process_batch()
+            if result is None:
+                break
+            for name in totals:
+                totals[name] += result[name]
+            batches += 1
+        return totals
+
+    def process_batch(self) -> Optional[Dict[str, int]]:
+        """Claim and index one batch; None when nothing is due"""
+        rows = self._claim()
+        if not rows:
+            return None
+
+        product_ids = list(dict.fromkeys(row.product_id for row in rows))
+        reembed = {
+            row.product_id
+            for row in rows
+            if row.operation != EmbeddingOutbox.OPERATION_METADATA
+        }
+        products = {
+            product.id: product
+            for product in Product.query.filter(Product.id.in_(product_ids)).all()
+        }
+        upserts, updates, deletes = [], [], []
+        for product_id in product_ids:
+            product = products.get(product_id)
+            if product is None or not product.is_active:
+                deletes.append(product_id)
+            elif product_id in reembed or product.embedding_id is None:
+                upserts.append(product)
+            else:
+                updates.append(product)
+
+        try:
+            with tracing.span("vector.outbox_batch"):
+                if upserts:
+                    self._vector_service().batch_upsert_products(
+                        [_document(product) for product in upserts]
+                    )
+                if updates:
+                    self._vector_service().update_product_metadata(
+                        {product.id: _metadata(product) for product in updates}
+                    )
+                if deletes:
+                    self._vector_service().delete_product_embeddings(deletes)
+        except Exception as e:
+            logger.error(f"Error indexing {len(product_ids)} products: {str(e)}")
+            db.session.rollback()
+            self._release(rows, str(e))
+            return {
+                "upserted": 0,
+                "updated": 0,
+                "deleted": 0,
+                "failed": len(product_ids),
+            }
+
+        outbox = EmbeddingOutbox.__table__
+        db.session.execute(
+            outbox.delete().where(outbox.c.id.in_([row.id for row in rows]))
+        )
+        if upserts:
+            table = Product.__table__
+            db.session.execute(
+                table.update()
+                .where(table.c.id.in_([product.id for product in upserts]))
+                .values(embedding_id=table.c.id, updated_at=table.c.updated_at)
+            )
+        # Cached vector and hybrid results predate this batch
+        IndexVersion.bump(db.session.connection(), IndexVersion.VECTOR)
+        db.session.commit()
+        search_cache.expire_vector_version()
+
+        return {
+            "upserted": len(upserts),
+            "updated": len(updates),
+            "deleted": len(deletes),
+            "failed": 0,
+        }
+
+    def pending_count(self) -> int:
+        """Count outbox rows that still have attempts left"""
+        return EmbeddingOutbox.query.filter(
+            EmbeddingOutbox.attempts < self.max_attempts
+        ).count()
+
+    def retry_failed(self) -> int:
+        """Make rows that ran out of attempts due again"""
+        retried = EmbeddingOutbox.query.filter(
+            EmbeddingOutbox.attempts >= self.max_attempts
+        ).update(
+            {
+                EmbeddingOutbox.attempts: 0,
+                EmbeddingOutbox.available_at: datetime.now(),
+                EmbeddingOutbox.claimed_by: None,
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return retried
+
+    def _claim(self) -> List[EmbeddingOutbox]:
+        """Lease the oldest due rows to this call and return them"""
+        now = datetime.now()
+        due = (
+            EmbeddingOutbox.available_at <= now,
+            EmbeddingOutbox.attempts < self.max_attempts,
+        )
+        ids = [
+            row_id
+            for (row_id,) in db.session.query(EmbeddingOutbox.id)
+            .filter(*due)
+            .order_by(EmbeddingOutbox.id)
+            .limit(self.batch_size)
+            .all()
+        ]
+        if not ids:
+            db.session.rollback()
+            return []
+
+        token = uuid.uuid4().hex
+        EmbeddingOutbox.query.filter(EmbeddingOutbox.id.in_(ids), *due).update(
+            {
+                EmbeddingOutbox.claimed_by: token,
+                EmbeddingOutbox.available_at: now + timedelta(seconds=self.lease),
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+
+        return (
+            EmbeddingOutbox.query.filter(
+                EmbeddingOutbox.id.in_(ids), EmbeddingOutbox.claimed_by == token
+            )
+            .order_by(EmbeddingOutbox.id)
+            .all()
+        )
+
+    def _release(self, rows: List[EmbeddingOutbox], error: str):
+        """Schedule failed rows for a retry with exponential backoff"""
+        now = datetime.now()
+        for row in rows:
+            row = db.session.merge(row)
+            row.attempts += 1
+            row.last_error = error[:1000]
+            row.claimed_by = None
+            delay = min(
+                self.retry_delay * 2 ** (row.attempts - 1), self.max_retry_delay
+            )
+            row.available_at = now + timedelta(seconds=delay)
+            if row.attempts >= self.max_attempts:
+                logger.error(
+                    f"Giving up indexing product {row.product_id} after "
+                    f"{row.attempts} attempts"
+                )
+        db.session.commit()
+
+    def _vector_service(self) -> VectorService:
+        if self.vector_service is None:
+            self.vector_service = VectorService()
+        return self.vector_service
+
+
+def _document(product: Product) -> Dict:
+    return {
+        "id": product.id,
+        "text": product.get_search_text(),
+        "metadata": _metadata(product),
+    }
+
+
+def _metadata(product: Product) -> Dict:
+    return {
+        "category": product.category,
+        "subcategory": product.subcategory,
+        "brand": product.brand,
+        "price": product.price,
+        "rating": product.rating,
+        "in_stock": product.is_in_stock(),
+    }
+
+
+embedding_indexer = EmbeddingIndexer()
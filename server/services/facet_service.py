@@ -0,0 +1,233 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+from models import db, product_search
+from models.catalog_change import CatalogChange
+from models.product import Product
+from utils import tracing
+from utils.cache import LRUCache
+
+from .catalog_snapshot import catalog_snapshot
+
+logger = logging.getLogger(__name__)
+
+RATING_FLOORS = [4, 3, 2, 1]
+
+_cache = None
+
+
+class FacetService:
+    """Service for sidebar facet counts over the current filter and search state"""
+
+    def get_facets(self, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Get category, subcategory and brand counts, a price histogram, rating
+        buckets and stock counts for the products matching the filters
+
+        Results are cached per normalized filter key and catalog version, so a
+        product write invalidates them.
+        """
+        global _cache
+
+        if _cache is None:
+            _cache = LRUCache(max_size=current_app.config["FACET_CACHE_SIZE"])
+
+        filters = dict(filters or {})
+        columns = catalog_snapshot.get()
+        version = (
+            columns.version if columns is not None else CatalogChange.current_version()
+        )
+        key = (version, self.normalize_filters(filters))
+
+        facets = _cache.get(key)
+        if facets is None:
+            with tracing.span("catalog.facets"):
+                if columns is not None:
+                    counts = self._snapshot_counts(columns, filters)
+                else:
+                    counts = self._sql_counts(filters)
+            facets = self._format(counts)
+            _cache.set(key, facets)
+
+        return facets
+
+    @staticmethod
+    def normalize_filters(filters: Dict[str, Any]) -> tuple:
+        """Hashable key for filters that select the same products"""
+        normalized = []
+        for name, value in sorted(filters.items()):
+            if value is None or value is False or value == "":
+                continue
+            if name == "search_query":
+                value = " ".join(product_search.search_terms(value))
+            elif isinstance(value, str):
+                value = value.strip().lower()
+            elif isinstance(value, (list, tuple)):
+                value = tuple(sorted(str(item).strip().lower() for item in value))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = float(value)
+            normalized.append((name, value))
+        return tuple(normalized)
+
+    def _price_edges(self) -> List[float]:
+        return current_app.config["FACET_PRICE_EDGES"]
+
+    def _snapshot_counts(self, columns, filters) -> Dict[str, Any]:
+        """Count every facet with one vectorized pass over the snapshot"""
+        search_query = filters.pop("search_query", None)
+        mask = columns.mask(**filters)
+
+        if search_query:
+            rows = (
+                Product.filter_query(search_query=search_query)
+                .order_by(None)
+                .with_entities(Product.id)
+                .all()
+            )
+            matched = np.zeros(len(columns.ids), dtype=bool)
+            positions = [
+                columns.positions[product_id]
+                for (product_id,) in rows
+                if product_id in columns.positions
+            ]
+            matched[positions] = True
+            mask &= matched
+
+        prices = columns.numeric["price"][mask]
+        ratings = np.nan_to_num(columns.numeric["rating"][mask], nan=0.0)
+        edges = self._price_edges()
+
+        counts = {
+            "total": int(mask.sum()),
+            "in_stock": int((columns.numeric["stock"][mask] > 0).sum()),
+            "on_sale": int(columns.flags["is_on_sale"][mask].sum()),
+            "min_price": float(prices.min()) if len(prices) else None,
+            "max_price": float(prices.max()) if len(prices) else None,
+            "price_buckets": np.bincount(
+                np.searchsorted(edges, prices, side="right"),
+                minlength=len(edges) + 1,
+            ).tolist(),
+            "rating_floors": np.bincount(
+                np.clip(np.floor(ratings), 0, 5).astype(np.int64), minlength=6
+            ).tolist(),
+        }
+
+        for name in ("category", "subcategory", "brand"):
+            values = columns.dictionaries[name]
+            per_code = np.bincount(columns.codes[name][mask], minlength=len(values))
+            counts[name] = {
+                values[code]: int(count)
+                for code, count in enumerate(per_code)
+                if count
+            }
+
+        return counts
+
+    def _sql_counts(self, filters) -> Dict[str, Any]:
+        """Count every facet with one grouped query"""
+        edges = self._price_edges()
+        price_bucket = db.case(
+            *[(Product.price < edge, index) for index, edge in enumerate(edges)],
+            else_=len(edges),
+        )
+        # floor() first: CAST rounds on PostgreSQL, and buckets must match np.floor
+        rating_floor = db.cast(
+            db.func.floor(db.func.coalesce(Product.rating, 0)), db.Integer
+        )
+        in_stock = db.case((Product.stock > 0, 1), else_=0)
+        on_sale = db.case((Product.is_on_sale == True, 1), else_=0)
+        groups = [
+            Product.category,
+            Product.subcategory,
+            Product.brand,
+            price_bucket,
+            rating_floor,
+            in_stock,
+            on_sale,
+        ]
+
+        rows = (
+            Product.filter_query(**filters)
+            .order_by(None)
+            .with_entities(
+                *groups,
+                db.func.count(),
+                db.func.min(Product.price),
+                db.func.max(Product.price),
+            )
+            .group_by(*groups)
+            .all()
+        )
+
+        counts = {
+            "total": 0,
+            "in_stock": 0,
+            "on_sale": 0,
+            "min_price": None,
+            "max_price": None,
+            "price_buckets": [0] * (len(edges) + 1),
+            "rating_floors": [0] * 6,
+            "category": {},
+            "subcategory": {},
+            "brand": {},
+        }
+        for row in rows:
+            category, subcategory, brand, bucket, floor, stocked, sale, count = row[:8]
+            counts["total"] += count
+            counts["in_stock"] += count if stocked else 0
+            counts["on_sale"] += count if sale else 0
+            counts["price_buckets"][bucket] += count
+            counts["rating_floors"][min(max(floor, 0), 5)] += count
+            for name, value in (
+                ("category", category),
+                ("subcategory", subcategory),
+                ("brand", brand),
+            ):
+                counts[name][value] = counts[name].get(value, 0) + count
+            counts["min_price"] = _bound(min, counts["min_price"], row[8])
+            counts["max_price"] = _bound(max, counts["max_price"], row[9])
+
+        return counts
+
+    def _format(self, counts) -> Dict[str, Any]:
+        edges = self._price_edges()
+        bounds = [None] + list(edges) + [None]
+        histogram = [
+            {"min": bounds[index], "max": bounds[index + 1], "count": count}
+            for index, count in enumerate(counts["price_buckets"])
+            if count
+        ]
+
+        floors = counts["rating_floors"]
+        rating = [
+            {"min": floor, "count": sum(floors[floor:])} for floor in RATING_FLOORS
+        ]
+
+        return {
+            "total": counts["total"],
+            "categories": _ranked(counts["category"]),
+            "subcategories": _ranked(counts["subcategory"]),
+            "brands": _ranked(counts["brand"]),
+            "price": {
+                "min": counts["min_price"],
+                "max": counts["max_price"],
+                "histogram": histogram,
+            },
+            "rating": rating,
+            "in_stock_count": counts["in_stock"],
+            "on_sale_count": counts["on_sale"],
+        }
+
+
+def _ranked(counts: Dict[str, int]) -> List[Dict[str, Any]]:
+    return [
+        {"value": value, "count": count}
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+def _bound(func, current: Optional[float], value: Optional[float]):
+    if value is None:
+        return current
+    return value if current is None else func(current, value)
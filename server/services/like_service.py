@@ -1,7 +1,7 @@
 import uuid
 
 from app import db
-from models import Product, UserLike
+from models import Product, UserLike, product_cache, product_popularity
 
 
 class LikeService:
@@ -14,6 +14,7 @@ class LikeService:
         if existing_like:
             # Unlike the product
             db.session.delete(existing_like)
+            product_popularity.refresh(db.session, [product_id])
             db.session.commit()
             return False, "Product unliked"
         else:
@@ -24,6 +25,7 @@ class LikeService:
                 product_id=product_id,
             )
             db.session.add(new_like)
+            product_popularity.refresh(db.session, [product_id])
             db.session.commit()
             return True, "Product liked"
 
@@ -31,15 +33,16 @@ class LikeService:
         """Get all products liked by a user"""
         likes = UserLike.query.filter_by(user_id=user_id).all()
         
-        return [
-            {
-                **like.to_dict(),
-                "product": Product.query.get(like.product_id).to_dict()
-                if Product.query.get(like.product_id)
-                else None,
-            }
-            for like in likes
-        ]
+        result = []
+        for like in likes:
+            product = Product.query.get(like.product_id)
+            result.append(
+                {
+                    **like.to_dict(),
+                    "product": product_cache.to_dict(product) if product else None,
+                }
+            )
+        return result
 
     def is_liked_by_user(self, user_id: str, product_id: str):
         """Check if a product is liked by a user"""
@@ -71,8 +74,10 @@ class LikeService:
         for product_id, likes_count in popular_products:
             product = Product.query.get(product_id)
             if product:
-                product_dict = product.to_dict()
-                product_dict['likes_count'] = likes_count
+                product_dict = {
+                    **product_cache.to_dict(product),
+                    'likes_count': likes_count,
+                }
                 result.append(product_dict)
         
         return result
@@ -0,0 +1,349 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from models.chat_session import ChatSession
+from models.message import Message
+from models.message_product import MessageProduct
+from models.product import Product
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 200
+
+
+class MessageWriteBuffer:
+    """Write-behind buffer for chat sessions and messages.
+
+    Chat turns hand their session and message rows to the buffer instead of
+    committing them on the request path. A background thread drains the
+    bounded queue and writes each batch with multi-row inserts in a single
+    transaction. When the queue is full the caller writes its own row
+    synchronously, which keeps memory bounded and applies backpressure.
+
+    Rows that fail for a reason other than an integrity error (a locked
+    database, a dropped connection) stay pending and are written again ahead
+    of newer rows, after an exponential backoff, up to MESSAGE_BUFFER_MAX_RETRIES
+    times. Only rows that violate a constraint are dropped at once.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.max_size = 1000
+        self.batch_size = 100
+        self.flush_interval = 0.25
+        self.max_retries = 5
+        self.retry_delay = 1.0
+        self._pid = None
+        self._queue = None
+        self._pending = {}
+        self._retries = []
+        self._attempts = {}
+        self._retry_at = 0.0
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        """Bind the buffer to an application and read its settings"""
+        self.app = app
+        self.enabled = app.config["MESSAGE_BUFFER_ENABLED"]
+        self.max_size = app.config["MESSAGE_BUFFER_MAX_SIZE"]
+        self.batch_size = app.config["MESSAGE_BUFFER_BATCH_SIZE"]
+        self.flush_interval = app.config["MESSAGE_BUFFER_FLUSH_INTERVAL"]
+        self.max_retries = app.config["MESSAGE_BUFFER_MAX_RETRIES"]
+        self.retry_delay = app.config["MESSAGE_BUFFER_RETRY_DELAY"]
+        atexit.register(self.shutdown)
+
+    def _ensure_worker(self):
+        """Start the flush thread, once per process (gunicorn forks after preload)"""
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+
+        with self._pending_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_size)
+                self._pending = {}
+                self._retries = []
+                self._attempts = {}
+                self._write_lock = threading.Lock()
+                self._wakeup = threading.Event()
+                self._pid = os.getpid()
+
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="message-write-buffer", daemon=True
+                )
+                self._thread.start()
+
+    def add_session(self, chat_session: ChatSession):
+        """Queue a new chat session row"""
+        self._enqueue("session", chat_session)
+
+    def add_message(self, message: Message):
+        """Queue a chat message row"""
+        self._enqueue("message", message)
+
+    def _enqueue(self, kind: str, obj):
+        if not self.enabled:
+            # Write through: errors reach the caller, as without the buffer
+            try:
+                self._insert_rows([(kind, obj)])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return
+
+        self._ensure_worker()
+        session_id = obj.id if kind == "session" else obj.chat_session_id
+
+        with self._pending_lock:
+            pending = self._pending.setdefault(
+                session_id, {"session": None, "messages": []}
+            )
+            if kind == "session":
+                pending["session"] = obj
+            else:
+                pending["messages"].append(obj)
+
+        try:
+            self._queue.put_nowait((kind, obj))
+        except queue.Full:
+            logger.warning("Message write buffer is full, writing synchronously")
+            self.flush()
+            with self._write_lock:
+                self._write_and_forget([(kind, obj)])
+            return
+
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def get_pending_session(self, session_id: str) -> Optional[ChatSession]:
+        """Get a chat session that is queued but not yet written"""
+        with self._pending_lock:
+            pending = self._pending.get(session_id)
+            return pending["session"] if pending else None
+
+    def get_pending_messages(self, session_id: str) -> List[Message]:
+        """Get messages of a session that are queued but not yet written"""
+        with self._pending_lock:
+            pending = self._pending.get(session_id)
+            return list(pending["messages"]) if pending else []
+
+    def flush(self):
+        """Write everything currently queued, retrying failed rows first"""
+        if not self._queue or self._pid != os.getpid():
+            return
+
+        with self._write_lock:
+            batch, self._retries = self._retries, []
+            while len(batch) >= self.batch_size:
+                self._write_and_forget(batch[: self.batch_size])
+                batch = batch[self.batch_size :]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+                if len(batch) >= self.batch_size:
+                    self._write_and_forget(batch)
+                    batch = []
+
+            if batch:
+                self._write_and_forget(batch)
+
+    def shutdown(self):
+        """Flush remaining rows when the process exits"""
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing message buffer on shutdown: {str(e)}")
+        if self._retries:
+            logger.error(f"Lost {len(self._retries)} unwritten chat rows on shutdown")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if time.monotonic() < self._retry_at:
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error in message buffer flush thread: {str(e)}")
+
+    def _write_and_forget(self, batch):
+        if self.app is None:
+            return
+
+        with self.app.app_context():
+            failed = {id(obj) for kind, obj in self._write_batch(batch)}
+
+        done = []
+        for kind, obj in batch:
+            if id(obj) not in failed:
+                self._attempts.pop(id(obj), None)
+                done.append((kind, obj))
+                continue
+
+            attempts = self._attempts.get(id(obj), 0) + 1
+            if attempts > self.max_retries:
+                logger.error(
+                    f"Dropping chat {kind} row after {self.max_retries} retries"
+                )
+                self._attempts.pop(id(obj), None)
+                done.append((kind, obj))
+            else:
+                self._attempts[id(obj)] = attempts
+                self._retries.append((kind, obj))
+                delay = self.retry_delay * 2 ** (attempts - 1)
+                self._retry_at = max(self._retry_at, time.monotonic() + delay)
+        self._forget(done)
+
+    def _forget(self, batch):
+        with self._pending_lock:
+            for kind, obj in batch:
+                session_id = obj.id if kind == "session" else obj.chat_session_id
+                pending = self._pending.get(session_id)
+                if not pending:
+                    continue
+
+                if kind == "session":
+                    pending["session"] = None
+                elif obj in pending["messages"]:
+                    pending["messages"].remove(obj)
+
+                if pending["session"] is None and not pending["messages"]:
+                    del self._pending[session_id]
+
+    def _write_batch(self, batch) -> List[tuple]:
+        """Insert a batch of sessions and messages in one transaction
+
+        Returns the rows to try again later. Rows that violate a constraint
+        are dropped.
+        """
+        try:
+            with tracing.span("db.message_flush"):
+                self._insert_rows(batch)
+                db.session.commit()
+            return []
+
+        except IntegrityError as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                logger.error(f"Dropping unwritable chat {batch[0][0]} row: {str(e)}")
+                return []
+
+        except Exception as e:
+            logger.warning(f"Error writing chat message batch, will retry: {str(e)}")
+            db.session.rollback()
+            return list(batch)
+
+        # Retry row by row so one bad row does not drop the whole batch
+        failed = []
+        for item in batch:
+            try:
+                self._insert_rows([item])
+                db.session.commit()
+            except IntegrityError as row_error:
+                logger.error(
+                    f"Dropping unwritable chat {item[0]} row: {str(row_error)}"
+                )
+                db.session.rollback()
+            except Exception as row_error:
+                logger.warning(f"Error writing chat {item[0]} row: {str(row_error)}")
+                db.session.rollback()
+                failed.append(item)
+        return failed
+
+    def _insert_rows(self, batch):
+        sessions = [_row(obj) for kind, obj in batch if kind == "session"]
+        messages = [_row(obj) for kind, obj in batch if kind == "message"]
+
+        if sessions:
+            existing = {
+                session_id
+                for (session_id,) in db.session.query(ChatSession.id).filter(
+                    ChatSession.id.in_([row["id"] for row in sessions])
+                )
+            }
+            sessions = [row for row in sessions if row["id"] not in existing]
+            if sessions:
+                db.session.execute(ChatSession.__table__.insert(), sessions)
+
+        if messages:
+            db.session.execute(Message.__table__.insert(), messages)
+
+            links = [
+                {"message_id": obj.id, "position": position, "product_id": product_id}
+                for kind, obj in batch
+                if kind == "message"
+                for position, product_id in enumerate(obj.get_products())
+            ]
+            if links:
+                known = {
+                    product_id
+                    for (product_id,) in db.session.query(Product.id).filter(
+                        Product.id.in_({link["product_id"] for link in links})
+                    )
+                }
+                links = [link for link in links if link["product_id"] in known]
+            if links:
+                db.session.execute(MessageProduct.__table__.insert(), links)
+
+            activity = {}
+            for row in messages:
+                stats = activity.setdefault(
+                    row["chat_session_id"], {"count": 0, "last": row}
+                )
+                stats["count"] += 1
+                if row["created_at"] >= stats["last"]["created_at"]:
+                    stats["last"] = row
+
+            table = ChatSession.__table__
+            db.session.execute(
+                table.update()
+                .where(table.c.id == db.bindparam("b_id"))
+                .values(
+                    message_count=table.c.message_count + db.bindparam("b_count"),
+                    last_message_at=db.bindparam("b_last_at"),
+                    last_message_preview=db.bindparam("b_preview"),
+                    updated_at=db.bindparam("b_last_at"),
+                ),
+                [
+                    {
+                        "b_id": session_id,
+                        "b_count": stats["count"],
+                        "b_last_at": stats["last"]["created_at"],
+                        "b_preview": stats["last"]["content"][:PREVIEW_LENGTH],
+                    }
+                    for session_id, stats in activity.items()
+                ],
+            )
+
+
+def _row(obj) -> Dict[str, Any]:
+    """Get the column values of a transient model instance, applying defaults"""
+    row = {}
+    for column in obj.__table__.columns:
+        value = getattr(obj, column.name)
+        if value is None and column.default is not None:
+            default = column.default
+            value = default.arg(None) if default.is_callable else default.arg
+        row[column.name] = value
+    return row
+
+
+message_buffer = MessageWriteBuffer()
@@ -0,0 +1,437 @@
+import csv
+import io
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from flask import current_app
+from models import db, product_popularity, product_terms
+from models.catalog_change import CatalogChange
+from models.embedding_outbox import INDEXED_COLUMNS, EmbeddingOutbox, operation_for
+from models.product import Product
+from models.product_feature import ProductFeature
+from sqlalchemy import text
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+REQUIRED_FIELDS = ("name", "description", "price", "category", "subcategory", "brand")
+
+# Feed keys in to_dict() spelling -> column names
+ALIASES = {
+    "originalPrice": "original_price",
+    "reviewCount": "review_count",
+    "imageUrl": "image_url",
+    "isOnSale": "is_on_sale",
+    "salePercentage": "sale_percentage",
+    "isActive": "is_active",
+}
+
+# Columns taken from the feed; a product whose values all match is left alone
+FEED_COLUMNS = (
+    "id",
+    "name",
+    "description",
+    "price",
+    "original_price",
+    "category",
+    "subcategory",
+    "brand",
+    "rating",
+    "review_count",
+    "image_url",
+    "stock",
+    "features",
+    "is_on_sale",
+    "sale_percentage",
+    "is_active",
+)
+WRITTEN_COLUMNS = (
+    FEED_COLUMNS
+    + ("discount_percentage",)
+    + tuple(product_terms.KEY_COLUMNS.values())
+    + ("created_at", "updated_at")
+)
+
+STAGING_TABLE = "products_import"
+
+
+class ProductImportService:
+    """Service for streaming NDJSON or CSV product feeds into the catalog
+
+    Rows are validated one at a time and written in batches, so memory use
+    does not grow with the feed. Each batch is one multi-row upsert (COPY into
+    a staging table on PostgreSQL) in its own transaction, recorded in the
+    catalog change log, with the feature index and popularity score of changed
+    products rewritten. Products that are new, or whose text or vector metadata
+    changed, are queued in the embedding outbox in the same transaction.
+    """
+
+    def import_stream(
+        self,
+        stream,
+        format: str,
+        batch_size: Optional[int] = None,
+        index: bool = True,
+    ) -> Dict[str, Any]:
+        """Import a feed from a binary or text stream and summarize the result"""
+        if format not in IMPORT_FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+
+        config = current_app.config
+        batch_size = batch_size or config["PRODUCT_IMPORT_BATCH_SIZE"]
+        max_errors = config["PRODUCT_IMPORT_MAX_ERRORS"]
+        started = time.perf_counter()
+        summary = {
+            "rows": 0,
+            "inserted": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "invalid": 0,
+            "queued": 0,
+            "errors": [],
+        }
+
+        batch = {}
+        for line, record in self.iter_records(stream, format):
+            summary["rows"] += 1
+            try:
+                row = normalize_row(record)
+            except ValueError as e:
+                summary["invalid"] += 1
+                if len(summary["errors"]) < max_errors:
+                    summary["errors"].append({"line": line, "message": str(e)})
+                continue
+
+            batch[row["id"]] = row  # a later row for the same ID wins
+            if len(batch) >= batch_size:
+                self._import_batch(list(batch.values()), summary, index)
+                batch = {}
+
+        if batch:
+            self._import_batch(list(batch.values()), summary, index)
+
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"Imported {summary['rows']} rows: {summary['inserted']} inserted, "
+            f"{summary['updated']} updated, {summary['unchanged']} unchanged, "
+            f"{summary['invalid']} invalid"
+        )
+        return summary
+
+    @staticmethod
+    def iter_records(stream, format: str) -> Iterator[Tuple[int, Any]]:
+        """Yield (line number, raw record) pairs from an NDJSON or CSV stream"""
+        if not isinstance(stream, io.TextIOBase):
+            if isinstance(stream, io.RawIOBase) or not hasattr(stream, "read1"):
+                stream = io.BufferedReader(stream)
+            stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+        if format == "csv":
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+            return
+
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e.msg}")
+
+    def _import_batch(self, rows: List[Dict[str, Any]], summary, index: bool):
+        with tracing.span("import.batch"):
+            connection = db.session.connection()
+            existing = self._existing_rows(connection, [row["id"] for row in rows])
+
+            changed = []
+            to_index = {
+                EmbeddingOutbox.OPERATION_UPSERT: [],
+                EmbeddingOutbox.OPERATION_METADATA: [],
+            }
+            features = {}
+            for row in rows:
+                current = existing.get(row["id"])
+                if current is not None and all(
+                    current[name] == row[name] for name in FEED_COLUMNS
+                ):
+                    summary["unchanged"] += 1
+                    continue
+
+                changed.append(row)
+                summary["updated" if current is not None else "inserted"] += 1
+                if current is None or current["features"] != row["features"]:
+                    features[row["id"]] = row["features"]
+                if current is None or (
+                    row["is_active"] and current["embedding_id"] is None
+                ):
+                    operation = EmbeddingOutbox.OPERATION_UPSERT
+                else:
+                    operation = operation_for(
+                        {
+                            name
+                            for name in INDEXED_COLUMNS
+                            if current[name] != row[name]
+                        },
+                        current["stock"],
+                        row["stock"],
+                    )
+                if operation is not None:
+                    to_index[operation].append(row["id"])
+
+            if not changed:
+                db.session.rollback()
+                return
+
+            now = datetime.now()
+            for row in changed:
+                row["created_at"] = row["updated_at"] = now
+
+            try:
+                if self._use_copy(connection):
+                    self._copy_upsert(connection, changed)
+                else:
+                    self._upsert(connection, changed, set(existing))
+                ProductFeature.replace(connection, features)
+                product_popularity.update_scores(
+                    connection, [row["id"] for row in changed]
+                )
+                CatalogChange.record(connection, [row["id"] for row in changed])
+                if index:
+                    for operation, product_ids in to_index.items():
+                        EmbeddingOutbox.enqueue(connection, product_ids, operation)
+                CatalogChange.mark_changed(db.session)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+        if index:
+            summary["queued"] += sum(len(ids) for ids in to_index.values())
+
+    def _existing_rows(self, connection, product_ids) -> Dict[str, Dict[str, Any]]:
+        table = Product.__table__
+        columns = [table.c[name] for name in FEED_COLUMNS + ("embedding_id",)]
+        result = connection.execute(
+            db.select(*columns).where(table.c.id.in_(product_ids))
+        )
+        return {row.id: row._asdict() for row in result}
+
+    def _upsert(self, connection, rows, existing_ids):
+        """Multi-row INSERT ... ON CONFLICT DO UPDATE, keeping created_at"""
+        table = Product.__table__
+        dialect = connection.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return self._insert_or_update(connection, rows, existing_ids)
+
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={
+                name: statement.excluded[name]
+                for name in WRITTEN_COLUMNS
+                if name not in ("id", "created_at")
+            },
+        )
+        connection.execute(statement, [_written(row) for row in rows])
+
+    def _insert_or_update(self, connection, rows, existing_ids):
+        """Portable fallback: bulk insert new rows and bulk update existing ones"""
+        table = Product.__table__
+        new_rows = [_written(row) for row in rows if row["id"] not in existing_ids]
+        if new_rows:
+            connection.execute(table.insert(), new_rows)
+
+        updated = []
+        for row in rows:
+            if row["id"] in existing_ids:
+                values = _written(row)
+                del values["created_at"]
+                values["_id"] = values.pop("id")
+                updated.append(values)
+        if updated:
+            connection.execute(
+                table.update().where(table.c.id == db.bindparam("_id")),
+                updated,
+            )
+
+    def _use_copy(self, connection) -> bool:
+        return (
+            current_app.config["PRODUCT_IMPORT_USE_COPY"]
+            and connection.dialect.name == "postgresql"
+            and connection.dialect.driver == "psycopg2"
+        )
+
+    def _copy_upsert(self, connection, rows):
+        """COPY the batch into a temporary staging table, then upsert from it"""
+        columns = ", ".join(WRITTEN_COLUMNS)
+        updates = ", ".join(
+            f"{name} = EXCLUDED.{name}"
+            for name in WRITTEN_COLUMNS
+            if name not in ("id", "created_at")
+        )
+
+        buffer = io.StringIO()
+        # COPY reads an unquoted empty field as NULL and a quoted one as ''
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NOTNULL)
+        for row in rows:
+            writer.writerow([_copy_value(row[name]) for name in WRITTEN_COLUMNS])
+        buffer.seek(0)
+
+        connection.execute(
+            text(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} "
+                f"(LIKE products INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+        )
+        cursor = connection.connection.driver_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+
+        connection.execute(
+            text(
+                f"INSERT INTO products ({columns}) "
+                f"SELECT {columns} FROM {STAGING_TABLE} "
+                f"ON CONFLICT (id) DO UPDATE SET {updates}"
+            )
+        )
+
+
+def normalize_row(record) -> Dict[str, Any]:
+    """Validate a raw feed record and convert it to product column values
+
+    Raises ValueError with a readable message for an invalid record.
+    """
+    if isinstance(record, ValueError):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("Each record must be an object")
+
+    values = {}
+    for key, value in record.items():
+        if key is None:
+            raise ValueError("Row has more values than the header")
+        name = ALIASES.get(key, key)
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                value = None
+        values[name] = value
+
+    missing = [name for name in REQUIRED_FIELDS if values.get(name) is None]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    row = {
+        "id": _string(values, "id", 36) or str(uuid.uuid4()),
+        "name": _string(values, "name", 200),
+        "description": _string(values, "description"),
+        "price": _number(values, "price", float, minimum=0),
+        "original_price": _number(values, "original_price", float, minimum=0),
+        "category": _string(values, "category", 100),
+        "subcategory": _string(values, "subcategory", 100),
+        "brand": _string(values, "brand", 100),
+        "rating": _number(values, "rating", float, minimum=0, maximum=5, default=0.0),
+        "review_count": _number(values, "review_count", int, minimum=0, default=0),
+        "image_url": _string(values, "image_url", 500),
+        "stock": _number(values, "stock", int, minimum=0, default=0),
+        "features": _features(values.get("features")),
+        "is_on_sale": _boolean(values, "is_on_sale", default=False),
+        "sale_percentage": _number(
+            values, "sale_percentage", int, minimum=0, maximum=100
+        ),
+        "is_active": _boolean(values, "is_active", default=True),
+    }
+    row["discount_percentage"] = row["sale_percentage"] or Product.discount_for(
+        row["price"], row["original_price"]
+    )
+    for name, column in product_terms.KEY_COLUMNS.items():
+        row[column] = product_terms.normalize(row[name])
+    return row
+
+
+def _string(values, name, max_length=None) -> Optional[str]:
+    value = values.get(name)
+    if value is None:
+        return None
+    value = str(value)
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f"{name} is longer than {max_length} characters")
+    return value
+
+
+def _number(values, name, kind, minimum=None, maximum=None, default=None):
+    value = values.get(name)
+    if value is None:
+        return default
+    try:
+        number = kind(float(value)) if kind is int else kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if kind is int and float(value) != number:
+        raise ValueError(f"{name} must be a whole number")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    if maximum is not None and number > maximum:
+        raise ValueError(f"{name} must be at most {maximum}")
+    return number
+
+
+def _boolean(values, name, default) -> bool:
+    value = values.get(name)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).lower()
+    if normalized in ("true", "1", "yes"):
+        return True
+    if normalized in ("false", "0", "no"):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
+def _features(value) -> Optional[str]:
+    """Store features as a JSON list; CSV cells may hold JSON or a|b|c"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if value.startswith("["):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                raise ValueError("features must be a JSON list or a|b|c")
+        else:
+            value = [feature.strip() for feature in value.split("|")]
+    if not isinstance(value, list):
+        raise ValueError("features must be a list")
+    return json.dumps([str(feature) for feature in value if str(feature).strip()])
+
+
+def _written(row) -> Dict[str, Any]:
+    return {name: row[name] for name in WRITTEN_COLUMNS}
+
+
+def _copy_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
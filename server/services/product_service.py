@@ -1,10 +1,45 @@
+import functools
 import logging
-from typing import List, Dict, Any, Optional
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Tuple
+
+from flask import current_app
+from models import product_cache
 from models.product import Product
+from sqlalchemy import and_, or_
+from utils import tracing
+from utils.pagination import decode_cursor, encode_cursor
+from utils.ranking import apply_prior, reciprocal_rank_fusion
+
+from .catalog_snapshot import catalog_snapshot
+from .search_cache import search_cache
+from .spelling_service import spelling_service
 from .vector_service import VectorService
 
 logger = logging.getLogger(__name__)
 
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _search_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Get the shared pool for hybrid search legs, created once per process"""
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="hybrid-search"
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
 
 class ProductService:
     """Service for product-related operations"""
@@ -13,30 +48,13 @@ class ProductService:
         self.vector_service = VectorService()
 
     def create_product(self, product_data: Dict[str, Any]) -> Product:
-        """Create a new product and generate its embedding"""
+        """Create a new product; its embedding is queued in the same transaction"""
         try:
             product = Product(**product_data)
 
             from app import db
 
             db.session.add(product)
-            db.session.flush()
-
-            search_text = product.get_search_text()
-            metadata = {
-                "category": product.category,
-                "subcategory": product.subcategory,
-                "brand": product.brand,
-                "price": product.price,
-                "rating": product.rating,
-                "in_stock": product.is_in_stock(),
-            }
-
-            self.vector_service.upsert_product_embedding(
-                product.id, search_text, metadata
-            )
-
-            product.embedding_id = product.id
             db.session.commit()
 
             logger.info(f"Created product: {product.name}")
@@ -52,7 +70,7 @@ class ProductService:
     def update_product(
         self, product_id: str, update_data: Dict[str, Any]
     ) -> Optional[Product]:
-        """Update a product and refresh its embedding"""
+        """Update a product; an embedding refresh is queued if indexed fields changed"""
         try:
             product = Product.query.get(product_id)
             if not product:
@@ -62,29 +80,6 @@ class ProductService:
                 if hasattr(product, key):
                     setattr(product, key, value)
 
-            content_fields = [
-                "name",
-                "description",
-                "features",
-                "category",
-                "subcategory",
-                "brand",
-            ]
-            if any(field in update_data for field in content_fields):
-                search_text = product.get_search_text()
-                metadata = {
-                    "category": product.category,
-                    "subcategory": product.subcategory,
-                    "brand": product.brand,
-                    "price": product.price,
-                    "rating": product.rating,
-                    "in_stock": product.is_in_stock(),
-                }
-
-                self.vector_service.upsert_product_embedding(
-                    product.id, search_text, metadata
-                )
-
             from app import db
 
             db.session.commit()
@@ -100,14 +95,12 @@ class ProductService:
             raise
 
     def delete_product(self, product_id: str) -> bool:
-        """Delete a product and its embedding"""
+        """Delete a product; removing its embedding is queued in the same transaction"""
         try:
             product = Product.query.get(product_id)
             if not product:
                 return False
 
-            self.vector_service.delete_product_embedding(product_id)
-
             from app import db
 
             db.session.delete(product)
@@ -123,69 +116,504 @@ class ProductService:
             db.session.rollback()
             raise
 
-    def search_products(
-        self, query: str, filters: Dict[str, Any] = None, limit: int = 20
-    ) -> List[Product]:
-        """Search products using both vector similarity and traditional filters"""
-        try:
-            vector_results = self.vector_service.search_similar_products(
-                query,
-                top_k=limit * 2,
-            )
+    def filter_products(self, limit: int = 50, **filters) -> List[Product]:
+        """Filter products on the catalog snapshot, falling back to SQL"""
+        return self._load_products(self.filter_ids(limit, **filters))
 
-            if not vector_results:
-                return Product.search_by_filters(search_query=query, limit=limit)
+    def filter_ids(self, limit: int = 50, **filters) -> List[str]:
+        """Get the IDs of products matching the filters, through the result cache"""
 
-            product_ids = [result["id"] for result in vector_results]
+        def compute():
+            products = self._filter(limit, **filters)
+            product_cache.warm(products)
+            return {
+                "ids": [product.id for product in products],
+                "scores": [None] * len(products),
+                "info": {},
+            }
 
-            query_builder = Product.query.filter(Product.id.in_(product_ids))
+        result, _ = search_cache.get_or_compute("filter", None, filters, limit, compute)
+        return result["ids"]
 
-            if filters:
-                if filters.get("category"):
-                    query_builder = query_builder.filter(
-                        Product.category == filters["category"]
-                    )
+    def _filter(self, limit, **filters) -> List[Product]:
+        """Filter on the snapshot; text queries go through the full-text index"""
+        columns = None if filters.get("search_query") else catalog_snapshot.get()
+        if columns is None:
+            return Product.search_by_filters(limit=limit, **filters)
 
-                if filters.get("subcategory"):
-                    query_builder = query_builder.filter(
-                        Product.subcategory == filters["subcategory"]
-                    )
+        filters.pop("search_query", None)
+        with tracing.span("catalog.filter"):
+            product_ids = columns.filter_ids(limit=limit, **filters)
+        return self._load_products(product_ids)
 
-                if filters.get("brand"):
-                    query_builder = query_builder.filter(
-                        Product.brand == filters["brand"]
+    def list_products(
+        self,
+        filters: Dict[str, Any] = None,
+        sort: str = "rating",
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+    ) -> Tuple[List[Product], Dict[str, Any]]:
+        """Get a keyset-paginated page of products in one of Product.SORTS
+
+        A page starts strictly after the cursor's (sort key, id), so deep pages
+        cost the same as the first: a range scan on the (is_active, sort column,
+        id) index, or a slice of the snapshot's presorted order. The total is
+        only counted when asked for. Raises ValueError for an unknown sort or an
+        invalid cursor.
+        """
+        if sort not in Product.SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+
+        column, descending = Product.SORTS[sort]
+        filters = dict(filters or {})
+
+        after = None
+        if cursor:
+            cursor_sort, value, product_id = decode_cursor(cursor, 3)
+            if cursor_sort != sort:
+                raise ValueError("Cursor belongs to a different sort")
+            after = (value, product_id)
+
+        total = None
+        columns = catalog_snapshot.get()
+        if columns is not None:
+            with tracing.span("catalog.page"):
+                product_ids = columns.page_ids(
+                    column, descending, limit + 1, after, **filters
+                )
+                if include_total:
+                    total = int(columns.mask(**filters).sum())
+            has_more = len(product_ids) > limit
+            products = self._load_products(product_ids[:limit])
+        else:
+            sort_column = getattr(Product, column)
+            query = Product.filter_query(**filters)
+            if after is not None:
+                value, product_id = after
+                if descending:
+                    query = query.filter(
+                        or_(
+                            sort_column < value,
+                            and_(sort_column == value, Product.id < product_id),
+                        )
                     )
-
-                if filters.get("min_price") is not None:
-                    query_builder = query_builder.filter(
-                        Product.price >= filters["min_price"]
+                else:
+                    query = query.filter(
+                        or_(
+                            sort_column > value,
+                            and_(sort_column == value, Product.id > product_id),
+                        )
                     )
 
-                if filters.get("max_price") is not None:
-                    query_builder = query_builder.filter(
-                        Product.price <= filters["max_price"]
-                    )
+            order = (
+                (sort_column.desc(), Product.id.desc())
+                if descending
+                else (sort_column.asc(), Product.id.asc())
+            )
+            with tracing.span("db.product_page"):
+                products = query.order_by(*order).limit(limit + 1).all()
+                if include_total:
+                    total = Product.filter_query(**filters).order_by(None).count()
+            has_more = len(products) > limit
+            products = products[:limit]
+
+        page = {
+            "sort": sort,
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(
+                sort, getattr(products[-1], column), products[-1].id
+            )
+            if has_more and products
+            else None,
+        }
+        if include_total:
+            page["total"] = total
+
+        return products, page
+
+    def get_products_by_ids(
+        self, product_ids: List[str]
+    ) -> Tuple[List[Product], List[str]]:
+        """Get products by ID with one query, in request order, and the missing IDs
+
+        Like the detail endpoint, inactive products are returned so carts and
+        likes can still render them. Duplicate IDs are returned once.
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return [], []
+
+        with tracing.span("db.product_lookup"):
+            found = {
+                product.id: product
+                for product in Product.query.filter(Product.id.in_(product_ids)).all()
+            }
 
-                if filters.get("min_rating") is not None:
-                    query_builder = query_builder.filter(
-                        Product.rating >= filters["min_rating"]
-                    )
+        products = [
+            found[product_id] for product_id in product_ids if product_id in found
+        ]
+        missing = [product_id for product_id in product_ids if product_id not in found]
+        return products, missing
 
-                if filters.get("in_stock_only"):
-                    query_builder = query_builder.filter(Product.stock > 0)
+    def _load_products(self, product_ids: List[str]) -> List[Product]:
+        """Load products by ID with one query, keeping the given order"""
+        if not product_ids:
+            return []
+
+        # is_active is checked here; filtering it in SQL can steer the planner
+        # off the primary key onto an (is_active, ...) index
+        with tracing.span("db.product_lookup"):
+            products = [
+                product
+                for product in Product.query.filter(Product.id.in_(product_ids)).all()
+                if product.is_active
+            ]
+
+        positions = {product_id: index for index, product_id in enumerate(product_ids)}
+        products.sort(key=lambda product: positions[product.id])
+        return products
+
+    def fragments(self, product_ids: List[str], fields=None) -> list:
+        """Get JSON fragments for IDs from search_ids() or filter_ids()"""
+        return product_cache.fragments_by_id(product_ids, self._load_products, fields)
 
-            products = query_builder.all()
+    def representations(self, product_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get shared to_dict() outputs for IDs from search_ids() or filter_ids()"""
+        return product_cache.to_dicts_by_id(product_ids, self._load_products)
 
-            product_score_map = {
-                result["id"]: result["score"] for result in vector_results
+    def search_products(
+        self,
+        query: str,
+        filters: Dict[str, Any] = None,
+        limit: int = 20,
+        mode: str = None,
+    ) -> List[Product]:
+        """Search products in the given mode, defaulting to SEARCH_DEFAULT_MODE"""
+        products, _ = self.search(query, filters, limit, mode)
+        return products
+
+    def search(
+        self,
+        query: str,
+        filters: Dict[str, Any] = None,
+        limit: int = 20,
+        mode: str = None,
+    ) -> Tuple[List[Product], Dict[str, Any]]:
+        """Search products and report how the results were produced"""
+        product_ids, info = self.search_ids(query, filters, limit, mode)
+        return self._load_products(product_ids), info
+
+    def search_ids(
+        self,
+        query: str,
+        filters: Dict[str, Any] = None,
+        limit: int = 20,
+        mode: str = None,
+        correct: bool = True,
+    ) -> Tuple[List[str], Dict[str, Any]]:
+        """Search products and get the ranked IDs and how they were produced
+
+        Results come from the search result cache when the same query ran at
+        the current catalog version; info then has cached=True and the legs
+        of the search that produced them. Unless correct is False, a query
+        with no lexical match is searched again with misspelled words
+        corrected, on the lexical side only; if that matches, info has the
+        query searched for as corrected_query. The vector side always
+        searches the query as typed.
+        """
+        mode = mode or current_app.config["SEARCH_DEFAULT_MODE"]
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        filters = dict(filters or {})
+
+        def compute():
+            products, scores, info = self._search(
+                query, filters, limit, mode, correct
+            )
+            product_cache.warm(products)
+            return {
+                "ids": [product.id for product in products],
+                "scores": [scores.get(product.id) for product in products],
+                "info": info,
             }
-            products.sort(key=lambda p: product_score_map.get(p.id, 0), reverse=True)
 
-            return products[:limit]
+        result, cached = search_cache.get_or_compute(
+            f"search:{mode}", query, filters, limit, compute, correct=correct
+        )
+        return list(result["ids"]), dict(result["info"], cached=cached)
+
+    def lexical_query(self, query: str, filters: Dict[str, Any] = None) -> str:
+        """The query as typed, or its correction if only that has a lexical match"""
+        _, searched = self._did_you_mean(
+            query,
+            lambda text: Product.filter_query(search_query=text, **(filters or {}))
+            .with_entities(Product.id)
+            .limit(1)
+            .all(),
+        )
+        return searched
+
+    def _did_you_mean(self, query: str, search):
+        """Get search(query) and query, or search(corrected) and the correction
+
+        The correction is only searched when the query as typed finds nothing,
+        and only kept when it finds something.
+        """
+        results = search(query)
+        if results:
+            return results, query
+
+        corrected = spelling_service.correct(query)
+        if corrected:
+            corrected_results = search(corrected)
+            if corrected_results:
+                return corrected_results, corrected
+        return results, query
+
+    def _search(
+        self,
+        query: str,
+        filters: Dict[str, Any],
+        limit: int,
+        mode: str,
+        correct: bool = False,
+    ) -> Tuple[List[Product], Dict[str, float], Dict[str, Any]]:
+        """Run a search; returns products, their scores by ID and the search info"""
+        if mode == "hybrid":
+            return self.hybrid_search(query, filters, limit, correct)
+
+        started = time.perf_counter()
+        scores = {}
+        status = "ok"
+        searched = query
+        if mode == "lexical":
+
+            def search(text):
+                return Product.search_by_filters(
+                    search_query=text, limit=limit, **filters
+                )
 
+            if correct:
+                products, searched = self._did_you_mean(query, search)
+            else:
+                products = search(query)
+        else:
+            try:
+                products, scores = self.vector_search(query, filters, limit)
+            except Exception as e:
+                logger.error(f"Error searching products: {str(e)}")
+                products, status = [], "error"
+
+        info = {
+            "mode": mode,
+            "legs": {
+                mode: {
+                    "ms": round((time.perf_counter() - started) * 1000, 2),
+                    "count": len(products),
+                    "status": status,
+                }
+            },
+        }
+        if searched != query:
+            info["corrected_query"] = searched
+        return products, scores, info
+
+    def vector_search(
+        self, query: str, filters: Dict[str, Any] = None, limit: int = 20
+    ) -> Tuple[List[Product], Dict[str, float]]:
+        """Search products using vector similarity, falling back to the text index
+
+        Similarity is reranked with the popularity prior. Returns the products
+        and their scores by ID.
+        """
+        vector_results = self.vector_service.search_similar_products(
+            query,
+            top_k=limit * 2,
+        )
+
+        if not vector_results:
+            products = Product.search_by_filters(
+                search_query=query, limit=limit, **(filters or {})
+            )
+            return products, {}
+
+        product_ids = [result["id"] for result in vector_results]
+
+        products = (
+            Product.filter_query(**(filters or {}))
+            .filter(Product.id.in_(product_ids))
+            .all()
+        )
+
+        product_score_map = self._popularity_rerank(
+            {result["id"]: result["score"] for result in vector_results},
+            {product.id: product.popularity_score for product in products},
+        )
+        products.sort(key=lambda p: product_score_map.get(p.id, 0), reverse=True)
+
+        return products[:limit], product_score_map
+
+    def hybrid_search(
+        self,
+        query: str,
+        filters: Dict[str, Any] = None,
+        limit: int = 20,
+        correct: bool = False,
+    ) -> Tuple[List[Product], Dict[str, float], Dict[str, Any]]:
+        """Run lexical and vector search concurrently and fuse them with RRF
+
+        Each leg runs on the shared pool in its own app context and returns
+        product IDs only. With correct, the lexical leg searches the corrected
+        query when the query as typed has no match, and info reports it as
+        corrected_query. A leg still running at SEARCH_HYBRID_DEADLINE_MS is
+        dropped: the request goes on with the results it has, possibly none,
+        while the leg finishes in the background. The fused IDs are loaded
+        with a single filtered query. Returns the products, their fused scores by ID
+        and the search info.
+        """
+        config = current_app.config
+        app = current_app._get_current_object()
+        candidates = limit * 2
+        executor = _search_executor(config["SEARCH_HYBRID_WORKERS"])
+
+        legs = {
+            name: executor.submit(
+                self._run_leg, app, name, func, query, filters, candidates
+            )
+            for name, func in (
+                ("lexical", functools.partial(self._lexical_ids, correct=correct)),
+                ("vector", self._vector_ids),
+            )
+        }
+
+        pending = set(legs.values())
+        deadline = time.monotonic() + config["SEARCH_HYBRID_DEADLINE_MS"] / 1000
+        rankings = {}
+        info = {"mode": "hybrid", "legs": {}}
+
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=max(deadline - time.monotonic(), 0),
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                break
+
+            for future in done:
+                name, ids, searched, elapsed_ms, error = future.result()
+                info["legs"][name] = {
+                    "ms": elapsed_ms,
+                    "count": len(ids),
+                    "status": "error" if error else "ok",
+                }
+                if ids:
+                    rankings[name] = ids
+                if searched != query:
+                    info["corrected_query"] = searched
+
+        for name, future in legs.items():
+            if future in pending:
+                future.cancel()  # only stops a leg still queued for a worker
+                info["legs"][name] = {"ms": None, "count": 0, "status": "dropped"}
+                logger.warning(f"Hybrid search dropped the {name} leg for: {query}")
+
+        fused = reciprocal_rank_fusion(
+            rankings,
+            weights={
+                "lexical": config["SEARCH_HYBRID_LEXICAL_WEIGHT"],
+                "vector": config["SEARCH_HYBRID_VECTOR_WEIGHT"],
+            },
+            k=config["SEARCH_RRF_K"],
+        )
+        if not fused:
+            return [], {}, info
+
+        fused_ids = [product_id for product_id, _ in fused]
+        with tracing.span("db.product_lookup"):
+            products = (
+                Product.filter_query(**(filters or {}))
+                .filter(Product.id.in_(fused_ids))
+                .all()
+            )
+
+        positions = {product_id: index for index, product_id in enumerate(fused_ids)}
+        products.sort(key=lambda product: positions[product.id])
+        return products[:limit], dict(fused), info
+
+    def _run_leg(self, app, name, func, query, filters, candidates):
+        """Run one hybrid search leg in its own app context
+
+        A leg returns its product IDs and the query it searched for.
+        """
+        started = time.perf_counter()
+        error = None
+        ids, searched = [], query
+        try:
+            with app.app_context():
+                with tracing.span(f"search.{name}"):
+                    ids, searched = func(query, filters, candidates)
         except Exception as e:
-            logger.error(f"Error searching products: {str(e)}")
-            return []
+            logger.error(f"Hybrid search {name} leg failed: {str(e)}")
+            error = str(e)
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        return name, ids, searched, elapsed_ms, error
+
+    def _lexical_ids(
+        self, query, filters, candidates, correct=False
+    ) -> Tuple[List[str], str]:
+        def search(text):
+            rows = (
+                Product.filter_query(search_query=text, **(filters or {}))
+                .order_by(Product.rating.desc())
+                .with_entities(Product.id)
+                .limit(candidates)
+                .all()
+            )
+            return [product_id for (product_id,) in rows]
+
+        if correct:
+            return self._did_you_mean(query, search)
+        return search(query), query
+
+    def _vector_ids(self, query, filters, candidates) -> Tuple[List[str], str]:
+        results = self.vector_service.search_similar_products(query, top_k=candidates)
+        scores = {result["id"]: result["score"] for result in results}
+        product_ids = list(self._popularity_rerank(scores))
+
+        columns = catalog_snapshot.get() if filters else None
+        if columns is not None:
+            # Drop filtered-out IDs here so they do not take fusion ranks
+            product_ids = columns.match_ids(product_ids, **filters)
+        return product_ids, query
+
+    def _popularity_rerank(
+        self, scores: Dict[str, float], popularity: Dict[str, float] = None
+    ) -> Dict[str, float]:
+        """Add the weighted popularity prior to vector scores, best first
+
+        popularity is read from the snapshot, or the database, when not given.
+        SEARCH_POPULARITY_WEIGHT = 0 keeps the similarity order.
+        """
+        weight = current_app.config["SEARCH_POPULARITY_WEIGHT"]
+        if not weight or not scores:
+            return scores
+
+        if popularity is None:
+            columns = catalog_snapshot.get()
+            if columns is not None:
+                popularity = columns.values_by_id("popularity_score", scores)
+            else:
+                with tracing.span("db.popularity_lookup"):
+                    popularity = dict(
+                        Product.query.filter(Product.id.in_(list(scores)))
+                        .with_entities(Product.id, Product.popularity_score)
+                        .all()
+                    )
+        return dict(apply_prior(scores, popularity, weight))
 
     def get_recommendations(
         self,
@@ -0,0 +1,127 @@
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from models import db
+from models.index_version import IndexVersion
+from utils.cache import LRUCache
+
+from .catalog_snapshot import catalog_snapshot
+from .facet_service import FacetService
+
+logger = logging.getLogger(__name__)
+
+# Entry kinds whose results come from Pinecone, keyed on the vector index too
+VECTOR_KINDS = ("search:vector", "search:hybrid")
+
+
+class SearchResultCache:
+    """Per-process cache of ranked search and filter results
+
+    An entry holds the ordered product IDs, their scores and how the results
+    were produced, keyed by the normalized query, filters, limit and mode and
+    by the catalog version. Any product write moves the version, so old
+    entries stop matching and age out of the LRU; nothing is invalidated key
+    by key. Concurrent misses for one key run the search once.
+
+    Vector and hybrid entries are also keyed by the vector index version,
+    which the embedding indexer bumps after each batch it writes to
+    Pinecone. Otherwise a search between a product write and its indexing
+    would cache results without the product under the new catalog version.
+    The version is re-read at most every SEARCH_CACHE_INDEX_CHECK_INTERVAL
+    seconds, and right away in the process that bumped it.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.index_check_interval = 1.0
+        self._cache = LRUCache()
+        self._vector_version = 0
+        self._vector_checked_at = 0.0
+
+    def init_app(self, app):
+        """Bind the cache to an application and read its settings"""
+        self.enabled = app.config["SEARCH_CACHE_ENABLED"]
+        self.index_check_interval = app.config["SEARCH_CACHE_INDEX_CHECK_INTERVAL"]
+        self._cache = LRUCache(
+            max_size=app.config["SEARCH_CACHE_SIZE"],
+            ttl=app.config["SEARCH_CACHE_TTL"],
+        )
+
+    def vector_version(self) -> int:
+        """Get the vector index version, re-reading it once the interval passed"""
+        if time.monotonic() - self._vector_checked_at >= self.index_check_interval:
+            try:
+                self._vector_version = IndexVersion.current(IndexVersion.VECTOR)
+                self._vector_checked_at = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error reading the vector index version: {str(e)}")
+                db.session.rollback()
+                return None
+        return self._vector_version
+
+    def expire_vector_version(self):
+        """Re-read the vector index version on the next search"""
+        self._vector_checked_at = 0.0
+
+    def get_or_compute(
+        self,
+        kind: str,
+        query: Optional[str],
+        filters: Dict[str, Any],
+        limit: int,
+        compute: Callable[[], Dict[str, Any]],
+        correct: bool = False,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Get {"ids", "scores", "info"} for a query and whether it was cached
+
+        compute() runs on a miss. Its result is only cached when every search
+        leg reported ok, so a timed-out or failed leg is retried next time.
+        correct tells whether compute() may fall back to a spelling correction,
+        which can change the results, so it is part of the key.
+        """
+        if not self.enabled:
+            return compute(), False
+
+        computed = []
+
+        def run():
+            computed.append(True)
+            return compute()
+
+        vector_version = None
+        if kind in VECTOR_KINDS:
+            vector_version = self.vector_version()
+            if vector_version is None:
+                return compute(), False
+
+        key = (
+            kind,
+            catalog_snapshot.state()[0],
+            vector_version,
+            normalize_query(query),
+            FacetService.normalize_filters(filters),
+            int(limit),
+            bool(correct),
+        )
+        result = self._cache.get_or_compute(key, run, cache_if=_complete)
+        return result, not computed
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._cache.stats(), enabled=self.enabled)
+
+
+def normalize_query(query: Optional[str]) -> str:
+    """Lowercase a query and collapse its whitespace"""
+    return " ".join((query or "").lower().split())
+
+
+def _complete(result: Dict[str, Any]) -> bool:
+    legs = result["info"].get("legs", {})
+    return all(leg["status"] == "ok" for leg in legs.values())
+
+
+search_cache = SearchResultCache()
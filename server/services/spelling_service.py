@@ -0,0 +1,363 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from models import db, product_search, product_terms
+from models.catalog_change import CatalogChange
+from models.product import Product
+from sqlalchemy import text
+from utils import tracing
+from utils.cache import LRUCache
+
+from .catalog_snapshot import catalog_snapshot
+from .search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Shorter words are left alone: too many of them are one edit from another word
+MIN_WORD_LENGTH = 4
+
+# Closest words by trigram similarity that are compared by edit distance
+MAX_CANDIDATES = 10
+
+# Product rows a pg_trgm lookup reads per word
+MAX_SQL_ROWS = 200
+
+_LETTERS = re.compile(r"[^\W\d_]+")
+
+# Text of the products whose name, brand or category has a word similar to
+# :word, most similar first
+SQL_CANDIDATES = text(
+    "SELECT {columns} FROM products WHERE is_active = true AND ({matches}) "
+    "ORDER BY greatest({similarities}) DESC LIMIT :limit".format(
+        columns=", ".join(product_search.TRIGRAM_INDEXES.values()),
+        matches=" OR ".join(
+            f"{expression} %> :word"
+            for expression in product_search.TRIGRAM_INDEXES.values()
+        ),
+        similarities=", ".join(
+            f"word_similarity(:word, coalesce({expression}, ''))"
+            for expression in product_search.TRIGRAM_INDEXES.values()
+        ),
+    )
+)
+
+
+def trigrams(word: str) -> set:
+    """Trigrams of a word padded like pg_trgm: two spaces before, one after"""
+    padded = f"  {word} "
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+def similarity(first: str, second: str) -> float:
+    """Shared trigrams over all trigrams of the two words, as pg_trgm similarity()"""
+    first, second = trigrams(first), trigrams(second)
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """Edits, counting a swap of neighbours as one, between words; limit + 1 if more"""
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+
+    before, previous = None, list(range(len(second) + 1))
+    for i, first_char in enumerate(first, start=1):
+        current = [i] + [0] * len(second)
+        for j, second_char in enumerate(second, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (first_char != second_char),
+            )
+            if (
+                before is not None
+                and j > 1
+                and first_char == second[j - 2]
+                and first[i - 2] == second_char
+            ):
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def vocabulary(texts: Iterable[Tuple[str, ...]]) -> Dict[str, int]:
+    """Number of texts using each word, given tuples of text fields"""
+    counts = {}
+    for fields in texts:
+        words = set()
+        for field in fields:
+            words.update(_LETTERS.findall((field or "").lower()))
+        for word in words:
+            counts[word] = counts.get(word, 0) + 1
+    return counts
+
+
+class TrigramIndex:
+    """Immutable trigram posting lists over the words of the catalog
+
+    Each trigram maps to a sorted array of word IDs. Candidates for a word are
+    the words sharing a trigram with it, scored by trigram similarity from
+    the posting lists alone. The cost of a lookup is bounded by the
+    vocabulary, a few tens of thousands of words for a large catalog, not by
+    the number of products.
+    """
+
+    def __init__(self, version, frequencies: Dict[str, int]):
+        self.version = version
+        self.words = sorted(frequencies)
+        self.frequencies = np.array(
+            [frequencies[word] for word in self.words], dtype=np.int64
+        )
+        self.sizes = np.empty(len(self.words), dtype=np.int64)
+        postings = {}
+        for word_id, word in enumerate(self.words):
+            grams = trigrams(word)
+            self.sizes[word_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(word_id)
+        self.postings = {
+            gram: np.array(word_ids, dtype=np.int64)
+            for gram, word_ids in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.words)
+
+    def known(self, word: str) -> bool:
+        """Whether word is in the vocabulary or starts a word in it"""
+        position = bisect.bisect_left(self.words, word)
+        return position < len(self.words) and self.words[position].startswith(word)
+
+    def candidates(
+        self, word: str, min_similarity: float, limit: int
+    ) -> List[Tuple[str, float, int]]:
+        """Up to limit (word, similarity, frequency) at least min_similarity away"""
+        grams = trigrams(word)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return []
+
+        word_ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+        scores = shared / (len(grams) + self.sizes[word_ids] - shared)
+        keep = scores >= min_similarity
+        word_ids, scores = word_ids[keep], scores[keep]
+        if len(word_ids) > limit:
+            best = np.argpartition(-scores, limit - 1)[:limit]
+            word_ids, scores = word_ids[best], scores[best]
+        return [
+            (self.words[word_id], float(score), int(self.frequencies[word_id]))
+            for word_id, score in zip(word_ids, scores)
+        ]
+
+
+class SpellingService:
+    """"Did you mean" correction of search queries against the catalog's words
+
+    A query word is kept when it is a word of a product name, brand, category
+    or subcategory, or the start of one, or when the full-text index has it
+    in a description or feature. Otherwise it is replaced by the closest word
+    of a name, brand, category or subcategory within one edit (two for words
+    over five letters), preferring higher trigram similarity and then more
+    products. Candidates come from pg_trgm indexes on PostgreSQL, and from an
+    in-memory TrigramIndex elsewhere. That index is rebuilt in the background
+    when the catalog changed, at most once per SEARCH_TYPO_REFRESH_INTERVAL.
+    Corrections are cached per query and catalog version.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.min_similarity = 0.3
+        self.refresh_interval = 30.0
+        self._cache = LRUCache()
+        self._index = None
+        self._checked_at = 0.0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Bind the service to an application and read its settings"""
+        self.app = app
+        self.enabled = app.config["SEARCH_TYPO_ENABLED"]
+        self.min_similarity = app.config["SEARCH_TYPO_MIN_SIMILARITY"]
+        self.refresh_interval = app.config["SEARCH_TYPO_REFRESH_INTERVAL"]
+        self._cache = LRUCache(max_size=app.config["SEARCH_TYPO_CACHE_SIZE"])
+
+    def stats(self):
+        return self._cache.stats()
+
+    def correct(self, query: str) -> Optional[str]:
+        """Get the query with misspelled words replaced, or None if none were"""
+        if not self.enabled or not query:
+            return None
+
+        with tracing.span("search.correct"):
+            if product_search.has_trigram_index(db.engine):
+                version = catalog_snapshot.state()[0]
+                lookup = _SqlLookup(self.min_similarity)
+            else:
+                index = self.index()
+                if index is None:
+                    return None
+                version, lookup = index.version, index
+
+            key = normalize_query(query)
+            replacements = self._cache.get_or_compute(
+                (version, key), lambda: self._replacements(key, lookup)
+            )
+
+        if not replacements:
+            return None
+        return re.sub(r"\w+", lambda match: _replace(match, replacements), query)
+
+    def _replacements(self, query: str, lookup) -> Dict[str, str]:
+        replacements = {}
+        for word in dict.fromkeys(product_search.search_terms(query)):
+            if (
+                len(word) < MIN_WORD_LENGTH
+                or not word.isalpha()
+                or word in product_terms.FEATURE_STOPWORDS
+                or lookup.known(word)
+                or product_search.has_term(word)
+            ):
+                continue
+            best = _closest(
+                word, lookup.candidates(word, self.min_similarity, MAX_CANDIDATES)
+            )
+            if best is not None:
+                replacements[word] = best
+        return replacements
+
+    def index(self) -> Optional[TrigramIndex]:
+        """Get the in-memory index, starting a background rebuild if it may be stale"""
+        if self._pid != os.getpid():
+            # Locks do not survive a fork; the inherited index is still valid
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    try:
+                        self._index = self._build()
+                    except Exception as e:
+                        logger.error(f"Error building spelling index: {str(e)}")
+                        db.session.rollback()
+                    self._checked_at = time.monotonic()
+            return self._index
+
+        if (
+            time.monotonic() - self._checked_at >= self.refresh_interval
+            and self._lock.acquire(blocking=False)
+        ):
+            self._checked_at = time.monotonic()
+            threading.Thread(
+                target=self._refresh, name="spelling-index", daemon=True
+            ).start()
+        return self._index
+
+    def _refresh(self):
+        try:
+            with self.app.app_context():
+                if CatalogChange.current_version() != self._index.version:
+                    self._index = self._build()
+        except Exception as e:
+            logger.error(f"Error refreshing spelling index: {str(e)}")
+        finally:
+            self._lock.release()
+
+    def _build(self) -> TrigramIndex:
+        version = CatalogChange.current_version()
+        with tracing.span("search.spelling_index"):
+            rows = (
+                db.session.query(
+                    Product.name, Product.brand, Product.category, Product.subcategory
+                )
+                .filter(Product.is_active == True)
+                .all()
+            )
+            index = TrigramIndex(version, vocabulary(rows))
+        logger.info(
+            f"Built spelling index of {len(index)} words at version {version}"
+        )
+        return index
+
+
+class _SqlLookup:
+    """Word lookups against the pg_trgm indexes, reading each word's rows once
+
+    The rows most similar to a word hold the word itself when it is known, so
+    the same rows answer known() and candidates().
+    """
+
+    def __init__(self, min_similarity: float):
+        self.min_similarity = min_similarity
+        self._words = {}
+
+    def _vocabulary(self, word: str) -> Dict[str, int]:
+        if word not in self._words:
+            db.session.execute(
+                text(
+                    "SELECT set_config('pg_trgm.word_similarity_threshold', "
+                    ":value, true)"
+                ),
+                {"value": str(self.min_similarity)},
+            )
+            rows = db.session.execute(
+                SQL_CANDIDATES, {"word": word, "limit": MAX_SQL_ROWS}
+            ).all()
+            self._words[word] = vocabulary(rows)
+        return self._words[word]
+
+    def known(self, word: str) -> bool:
+        return any(candidate.startswith(word) for candidate in self._vocabulary(word))
+
+    def candidates(self, word, min_similarity, limit):
+        scored = [
+            (candidate, similarity(word, candidate), frequency)
+            for candidate, frequency in self._vocabulary(word).items()
+        ]
+        scored = [match for match in scored if match[1] >= min_similarity]
+        scored.sort(key=lambda match: match[1], reverse=True)
+        return scored[:limit]
+
+
+def _replace(match, replacements) -> str:
+    """Replacement for a matched query word, keeping its capitalization"""
+    word = match.group(0)
+    replacement = replacements.get(word.lower())
+    if replacement is None:
+        return word
+    if len(word) > 1 and word.isupper():
+        return replacement.upper()
+    if word[0].isupper():
+        return replacement.capitalize()
+    return replacement
+
+
+def _closest(word: str, candidates) -> Optional[str]:
+    """Best candidate within the edit budget: fewest edits, most similar, most used
+
+    A longer word containing the query word (phone, iphone) is another word
+    rather than a misspelling, so it is never a candidate.
+    """
+    max_distance = 1 if len(word) <= 5 else 2
+    ranked = []
+    for candidate, score, frequency in candidates:
+        if word in candidate:
+            continue
+        distance = edit_distance(word, candidate, max_distance)
+        if distance <= max_distance:
+            ranked.append((distance, -score, -frequency, candidate))
+    return min(ranked)[3] if ranked else None
+
+
+spelling_service = SpellingService()
@@ -0,0 +1,344 @@
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from models import db, product_terms
+from models.catalog_change import CatalogChange
+from models.product import Product
+from utils import tracing
+
+from .catalog_snapshot import CHANGE_OVERLAP
+from .search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+LOADED_COLUMNS = ("id", "name", "brand", "category", "subcategory", "popularity_score")
+TERM_TYPES = ("brand", "category", "subcategory")
+
+# A phrase is also indexed from its 2nd, 3rd and 4th word, so "galaxy" finds
+# "Samsung Galaxy S24"; one suggestion matches a prefix at most this many times
+MAX_WORD_STARTS = 4
+
+# Brands and categories rank as their mean product plus this per log(products)
+TERM_COUNT_WEIGHT = 0.1
+
+# Sorts after every character, so [prefix, prefix + _END) is the prefix range
+_END = "\U0010ffff"
+
+
+class SuggestIndex:
+    """Immutable prefix index of typeahead suggestions at one catalog version
+
+    entries is a sorted list of (key, code) pairs. Keys are normalized
+    product names, brands, categories and subcategories, each also indexed
+    from its next few words. Codes number the suggestion targets. A prefix
+    selects one contiguous range with bisect, and the heaviest targets in it
+    are picked with np.argpartition. A keystroke therefore costs
+    O(log n + range) and never scans the catalog. Products weigh their
+    popularity_score. Brands and categories weigh the mean score of their
+    products plus a bonus for how many they have.
+    """
+
+    def __init__(self, version, products, terms, targets, codes, entries):
+        self.version = version
+        self.products = products
+        self.terms = terms
+        self.targets = targets
+        self.codes = codes
+        self.entries = entries
+        # Codes of products and terms that are gone; reclaimed by a full rebuild
+        self.dead = len(targets) - len(products) - len(terms)
+        self.keys = [key for key, _ in entries]
+
+        target_weights = np.zeros(len(targets), dtype=np.float64)
+        for product_id, product in products.items():
+            target_weights[codes[("product", product_id)]] = product[1]
+        for target, (_, total, count) in terms.items():
+            target_weights[codes[target]] = (
+                total / count + TERM_COUNT_WEIGHT * math.log1p(count)
+            )
+        entry_codes = np.fromiter(
+            (code for _, code in entries), dtype=np.int64, count=len(entries)
+        )
+        self.weights = target_weights[entry_codes]
+
+    @classmethod
+    def from_rows(cls, version, rows):
+        """Build the index from (id, name, brand, category, subcategory, popularity)"""
+        index = cls(None, {}, {}, [], {}, [])
+        return index.with_changes(version, rows, ())
+
+    def with_changes(self, version, rows, removed) -> "SuggestIndex":
+        """Get a copy with changed products re-read and removed ones dropped
+
+        Only the entries of touched products and of brands or categories that
+        appeared or disappeared are rewritten. The kept entries are still
+        sorted, so the sort only merges in the new ones.
+        """
+        products = dict(self.products)
+        terms = dict(self.terms)
+        targets = list(self.targets)
+        codes = dict(self.codes)
+        stale = set()
+        added = []
+
+        def code(target):
+            found = codes.get(target)
+            if found is None:
+                found = codes[target] = len(targets)
+                targets.append(target)
+            return found
+
+        def drop(product_id):
+            product = products.pop(product_id, None)
+            if product is None:
+                return
+            stale.add(codes[("product", product_id)])
+            for target in product[2]:
+                text, total, count = terms[target]
+                if count == 1:
+                    del terms[target]
+                    stale.add(codes[target])
+                else:
+                    terms[target] = (text, total - product[1], count - 1)
+
+        for product_id in removed:
+            drop(product_id)
+
+        for product_id, name, brand, category, subcategory, popularity in rows:
+            drop(product_id)
+            popularity = popularity or 0.0
+            term_targets = []
+            for kind, value in zip(TERM_TYPES, (brand, category, subcategory)):
+                key = product_terms.normalize(value)
+                if not key:
+                    continue
+                target = (kind, key)
+                term_targets.append(target)
+                term = terms.get(target)
+                if term is None:
+                    terms[target] = (value, popularity, 1)
+                    added.extend(_entries(code(target), value))
+                else:
+                    terms[target] = (term[0], term[1] + popularity, term[2] + 1)
+            products[product_id] = (name, popularity, tuple(term_targets))
+            added.extend(_entries(code(("product", product_id)), name))
+
+        entries = [entry for entry in self.entries if entry[1] not in stale]
+        entries.extend(added)
+        entries.sort()
+        return SuggestIndex(version, products, terms, targets, codes, entries)
+
+    def __len__(self):
+        return len(self.products)
+
+    def complete(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        """Get up to limit suggestions whose text has a word starting with prefix"""
+        low = bisect.bisect_left(self.keys, prefix)
+        high = bisect.bisect_left(self.keys, prefix + _END, low)
+        if low == high:
+            return []
+
+        weights = self.weights[low:high]
+        take = min(high - low, limit * MAX_WORD_STARTS)
+        if take < high - low:
+            best = np.argpartition(-weights, take - 1)[:take]
+        else:
+            best = np.arange(high - low)
+        best = best[np.argsort(-weights[best], kind="stable")]
+
+        suggestions = []
+        seen = set()
+        for offset in best:
+            code = self.entries[low + offset][1]
+            if code in seen:
+                continue
+            seen.add(code)
+            suggestions.append(self.suggestion(self.targets[code]))
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+    def suggestion(self, target) -> Dict[str, Any]:
+        kind, value = target
+        if kind == "product":
+            return {"text": self.products[value][0], "type": kind, "id": value}
+        return {"text": self.terms[target][0], "type": kind}
+
+
+class PopularQueries:
+    """Per-process counts of search queries, bounded to the most frequent"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, query: str):
+        key = normalize_query(query)
+        if not key or len(key) > 100:
+            return
+
+        with self._lock:
+            self._counts[key] += 1
+            if len(self._counts) > 2 * self.max_size:
+                self._counts = Counter(dict(self._counts.most_common(self.max_size)))
+
+    def complete(self, prefix: str, limit: int, min_count: int) -> List[str]:
+        """Most searched queries that start with prefix, seen at least min_count times"""
+        with self._lock:
+            counts = list(self._counts.items())
+        matches = [
+            (count, query)
+            for query, count in counts
+            if count >= min_count and query.startswith(prefix)
+        ]
+        matches.sort(key=lambda match: (-match[0], match[1]))
+        return [query for _, query in matches[:limit]]
+
+
+class SuggestService:
+    """Typeahead suggestions from a per-process prefix index and query counts
+
+    The index is built on first use and then follows the catalog change log
+    like the catalog snapshot: at most once per SUGGEST_REFRESH_INTERVAL a
+    reader checks the catalog version, and if it moved only the changed
+    products are re-read. Readers keep the current index meanwhile, so a
+    keystroke never waits on a refresh once the index exists.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.refresh_interval = 5.0
+        self.query_limit = 3
+        self.min_query_count = 2
+        self.queries = PopularQueries()
+        self._index = None
+        self._checked_at = 0.0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Bind the service to an application and read its settings"""
+        self.app = app
+        self.refresh_interval = app.config["SUGGEST_REFRESH_INTERVAL"]
+        self.query_limit = app.config["SUGGEST_QUERY_LIMIT"]
+        self.min_query_count = app.config["SUGGEST_MIN_QUERY_COUNT"]
+        self.queries = PopularQueries(app.config["SUGGEST_MAX_QUERIES"])
+        CatalogChange.on_commit(self.expire)
+
+    def expire(self):
+        """Check the catalog version on the next suggest(), ignoring the interval"""
+        self._checked_at = 0.0
+
+    def record_query(self, query: str):
+        """Count a search that returned results towards the popular queries"""
+        self.queries.record(query)
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """Get popular queries, then products, brands and categories, for a prefix"""
+        prefix = product_terms.normalize(query) or ""
+        if not prefix:
+            return []
+
+        with tracing.span("suggest.complete"):
+            queries = self.queries.complete(
+                prefix, min(self.query_limit, limit), self.min_query_count
+            )
+            suggestions = [{"text": text, "type": "query"} for text in queries]
+            index = self.get()
+            if index is not None and len(suggestions) < limit:
+                # A brand or category already offered as a query is left out
+                for suggestion in index.complete(prefix, limit):
+                    if len(suggestions) == limit:
+                        break
+                    if suggestion["type"] == "product" or (
+                        product_terms.normalize(suggestion["text"]) not in queries
+                    ):
+                        suggestions.append(suggestion)
+        return suggestions
+
+    def get(self) -> Optional[SuggestIndex]:
+        """Get the current index, refreshing it if the catalog changed"""
+        if self._pid != os.getpid():
+            # Locks do not survive a fork; the inherited index is still valid
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing suggest index: {str(e)}")
+                db.session.rollback()
+
+        return self._index
+
+    def refresh(self, full: bool = False):
+        """Bring the index up to the current catalog version"""
+        if not self._lock.acquire(blocking=self._index is None):
+            return  # another thread is refreshing; keep serving the current index
+
+        try:
+            self._checked_at = time.monotonic()
+            index = self._index
+            version = CatalogChange.current_version()
+
+            if not full and index is not None and index.version == version:
+                return
+
+            with tracing.span("suggest.refresh"):
+                if full or index is None:
+                    self._index = SuggestIndex.from_rows(version, self._load())
+                    logger.info(
+                        f"Built suggest index of {len(self._index)} products "
+                        f"at version {version}"
+                    )
+                    return
+
+                changes, latest = CatalogChange.changed_since(
+                    max(index.version - CHANGE_OVERLAP, 0)
+                )
+                if (
+                    len(changes) > max(len(index) // 4, CHANGE_OVERLAP)
+                    or index.dead > len(index) // 4
+                ):
+                    self._index = SuggestIndex.from_rows(version, self._load())
+                    return
+
+                changed = [
+                    product_id
+                    for product_id, operation in changes.items()
+                    if operation != CatalogChange.OPERATION_DELETE
+                ]
+                rows = self._load(changed) if changed else []
+                removed = set(changes) - {row[0] for row in rows}
+                self._index = index.with_changes(max(latest, version), rows, removed)
+        finally:
+            self._lock.release()
+
+    def _load(self, product_ids=None):
+        query = db.session.query(
+            *[getattr(Product, name) for name in LOADED_COLUMNS]
+        ).filter(Product.is_active == True)
+        if product_ids is not None:
+            query = query.filter(Product.id.in_(product_ids))
+        return query.all()
+
+
+def _entries(code, text):
+    """(key, code) pairs for a phrase and the phrase from its next words"""
+    words = (product_terms.normalize(text) or "").split()
+    return [
+        (" ".join(words[start:]), code)
+        for start in range(min(len(words), MAX_WORD_STARTS))
+    ]
+
+
+suggest_service = SuggestService()
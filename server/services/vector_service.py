@@ -4,6 +4,7 @@ from typing import Any, Dict, List
 from flask import current_app
 from pinecone.grpc import PineconeGRPC as Pinecone
 from sentence_transformers import SentenceTransformer
+from utils import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +40,8 @@ class VectorService:
             self.initialize()
 
         try:
-            embedding = self.model.encode(text)
+            with tracing.span("vector.embed"):
+                embedding = self.model.encode(text)
             return embedding.tolist()
         except Exception as e:
             logger.error(f"Failed to generate embedding: {str(e)}")
@@ -61,7 +63,8 @@ class VectorService:
                 "metadata": metadata or {},
             }
 
-            self.index.upsert([vector_data])
+            with tracing.span("vector.upsert"):
+                self.index.upsert([vector_data])
             logger.info(f"Upserted embedding for product: {product_id}")
 
         except Exception as e:
@@ -88,7 +91,8 @@ class VectorService:
             if filter_dict:
                 search_kwargs["filter"] = filter_dict
 
-            results = self.index.query(**search_kwargs)
+            with tracing.span("vector.query"):
+                results = self.index.query(**search_kwargs)
 
             similar_products = []
             for match in results["matches"]:
@@ -122,6 +126,34 @@ class VectorService:
             logger.error(f"Failed to delete product embedding: {str(e)}")
             raise
 
+    def delete_product_embeddings(self, product_ids: List[str]):
+        """Delete several product embeddings from Pinecone in one call"""
+        if not self.initialized:
+            self.initialize()
+
+        try:
+            self.index.delete(ids=list(product_ids))
+            logger.info(f"Deleted {len(product_ids)} product embeddings")
+
+        except Exception as e:
+            logger.error(f"Failed to delete product embeddings: {str(e)}")
+            raise
+
+    def update_product_metadata(self, metadata: Dict[str, Dict[str, Any]]):
+        """Set the metadata of existing product vectors, keeping their values"""
+        if not self.initialized:
+            self.initialize()
+
+        try:
+            with tracing.span("vector.update"):
+                for product_id, values in metadata.items():
+                    self.index.update(id=product_id, set_metadata=values)
+            logger.info(f"Updated metadata of {len(metadata)} product embeddings")
+
+        except Exception as e:
+            logger.error(f"Failed to update product metadata: {str(e)}")
+            raise
+
     def get_index_stats(self) -> Dict[str, Any]:
         """Get Pinecone index statistics"""
         if not self.initialized:
@@ -155,11 +187,13 @@ class VectorService:
                 )
 
                 if len(vectors) >= batch_size:
-                    self.index.upsert(vectors)
+                    with tracing.span("vector.upsert"):
+                        self.index.upsert(vectors)
                     vectors = []
 
             if vectors:
-                self.index.upsert(vectors)
+                with tracing.span("vector.upsert"):
+                    self.index.upsert(vectors)
 
             logger.info(f"Batch upserted {len(products)} product embeddings")
 
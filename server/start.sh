@@ -12,6 +12,13 @@ export PORT=${PORT:-5001}
 echo "Running database migrations..."
 flask db upgrade
 
+# Start the async chat workers (same default as config.py; 0 disables them)
+export CHAT_WORKER_PROCESSES=${CHAT_WORKER_PROCESSES:-2}
+if [ "$CHAT_WORKER_PROCESSES" -gt 0 ]; then
+    echo "Starting $CHAT_WORKER_PROCESSES chat workers..."
+    python -m scripts.chat_worker &
+fi
+
 # Start the application with Gunicorn
 echo "Starting application on port $PORT..."
 exec gunicorn --config gunicorn.conf.py app:app
@@ -1,4 +1,14 @@
-from .database_seeder import DatabaseSeeder
 from .logger_config import setup_logging
 
-__all__ = ['DatabaseSeeder', 'setup_logging']
\ No newline at end of file
+
+def __getattr__(name):
+    # DatabaseSeeder pulls in the services package, which itself imports
+    # utils.tracing, so it is resolved lazily to keep the import graph acyclic
+    if name == "DatabaseSeeder":
+        from .database_seeder import DatabaseSeeder
+
+        return DatabaseSeeder
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['DatabaseSeeder', 'setup_logging']
@@ -0,0 +1,148 @@
+"""Response compression negotiated on Accept-Encoding.
+
+Text and JSON responses of at least COMPRESSION_MIN_SIZE bytes are sent with
+brotli or gzip, whichever the client ranks higher (brotli on a tie). Streamed
+responses are compressed chunk by chunk, whatever their size. Compressible
+responses always carry Vary: Accept-Encoding so shared caches keep one copy
+per encoding. When an encoding is negotiated their strong ETag is made weak,
+since compressed bytes no longer match the identity representation it was
+computed for. That holds for bodies too small to compress as well, so a 304,
+which has no body to measure, can send the same validator as the 200.
+"""
+
+import logging
+import zlib
+
+from flask import request
+
+from utils import tracing
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:  # pragma: no cover - brotli is in requirements
+        brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+# zlib window bits that write a gzip header and trailer
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+_settings = {
+    "enabled": False,
+    "min_size": 1024,
+    "gzip_level": 6,
+    "brotli_quality": 4,
+}
+
+
+def init_app(app):
+    """Register the compression hook if COMPRESSION_ENABLED"""
+    _settings["enabled"] = app.config["COMPRESSION_ENABLED"]
+    if not _settings["enabled"]:
+        return
+
+    _settings.update(
+        min_size=app.config["COMPRESSION_MIN_SIZE"],
+        gzip_level=app.config["COMPRESSION_GZIP_LEVEL"],
+        brotli_quality=app.config["COMPRESSION_BROTLI_QUALITY"],
+    )
+    if brotli is None:
+        logger.warning("brotli is not installed, compressing with gzip only")
+
+    app.after_request(compress_response)
+
+
+def encodings():
+    """Content codings this server can produce, preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiated_encoding():
+    """Encoding the current request gets compressible responses in, or None"""
+    if not _settings["enabled"]:
+        return None
+    return request.accept_encodings.best_match(encodings())
+
+
+def compress_response(response):
+    """Compress a response in place if the request accepts an encoding"""
+    if not _compressible(response):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiated_encoding()
+    if encoding is None or "Content-Encoding" in response.headers:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    if (
+        request.method == "HEAD"
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+    ):
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_chunks(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < _settings["min_size"]:
+            return response
+        with tracing.span("http.compress"):
+            response.set_data(compress(body, encoding))
+
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a whole body with "br" or "gzip" at the configured level"""
+    if encoding == "br":
+        return brotli.compress(body, quality=_settings["brotli_quality"])
+    compressor = zlib.compressobj(_settings["gzip_level"], zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+def _compress_chunks(chunks, encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=_settings["brotli_quality"])
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(
+            _settings["gzip_level"], zlib.DEFLATED, GZIP_WBITS
+        )
+        process, finish = compressor.compress, compressor.flush
+
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            compressed = process(chunk)
+            if compressed:
+                yield compressed
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _compressible(response) -> bool:
+    mimetype = response.mimetype or ""
+    return any(mimetype.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
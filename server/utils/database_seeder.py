@@ -4,7 +4,6 @@ import uuid
 from datetime import datetime
 
 from models.product import Product
-from services.product_service import ProductService
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +13,6 @@ class DatabaseSeeder:
 
     def __init__(self, db):
         self.db = db
-        self.product_service = ProductService()
 
     def seed_products(self):
         """Seed the database with sample products"""
@@ -27,35 +25,16 @@ class DatabaseSeeder:
 
             logger.info(f"Seeding {len(products_data)} products...")
 
+            # Embeddings are queued in the embedding outbox by the same commit
             for product_data in products_data:
-                try:
-                    product = Product(**product_data)
-                    self.db.session.add(product)
-                    self.db.session.flush()
+                self.db.session.add(Product(**product_data))
 
-                    search_text = product.get_search_text()
-                    metadata = {
-                        "category": product.category,
-                        "subcategory": product.subcategory,
-                        "brand": product.brand,
-                        "price": product.price,
-                        "rating": product.rating,
-                        "in_stock": product.is_in_stock(),
-                    }
-
-                    self.product_service.vector_service.upsert_product_embedding(
-                        product.id, search_text, metadata
-                    )
-
-                    product.embedding_id = product.id
+            self.db.session.commit()
 
-                except Exception as e:
-                    logger.error(
-                        f"Error seeding product {product_data.get('name', 'Unknown')}: {str(e)}"
-                    )
-                    continue
+            # Scores at insert had no catalog mean rating to smooth towards
+            from models import product_popularity
 
-            self.db.session.commit()
+            product_popularity.recompute_all()
             logger.info("Products seeded successfully")
 
         except Exception as e:
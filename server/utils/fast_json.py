@@ -0,0 +1,164 @@
+import json
+import logging
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.utils import import_string
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# A top-level list at least this long is streamed; 0 never streams
+_settings = {"stream_min_items": 500, "stream_chunk_items": 100}
+
+
+def init_app(app):
+    """Install the configured JSON provider and read the streaming settings
+
+    JSON_PROVIDER is "orjson", "flask" for Flask's own provider, or the
+    import path of a flask.json.provider.JSONProvider subclass.
+    """
+    _settings.update(
+        stream_min_items=app.config["JSON_STREAM_MIN_ITEMS"],
+        stream_chunk_items=max(app.config["JSON_STREAM_CHUNK_ITEMS"], 1),
+    )
+
+    name = app.config["JSON_PROVIDER"]
+    if name == "flask":
+        return
+    if name == "orjson":
+        if orjson is None:
+            logger.warning("orjson is not installed, using Flask's JSON provider")
+            return
+        app.json = JSONProvider(app)
+    else:
+        app.json = import_string(name)(app)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, used by jsonify() and get_json()
+
+    datetime, date, UUID and dataclasses are encoded natively, datetimes as
+    ISO 8601 like to_dict() does rather than Flask's RFC 822 dates. Other
+    types go through Flask's default hook. Keys are not sorted. Responses
+    holding a long list are streamed like response().
+    """
+
+    sort_keys = False
+
+    def encode(self, obj, indent: bool = False, sort_keys=None, default=None) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default or self.default, option=option)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.encode(
+            obj,
+            indent=kwargs.get("indent") is not None,
+            sort_keys=kwargs.get("sort_keys"),
+            default=kwargs.get("default"),
+        ).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            body = self.encode(obj, indent=True) + b"\n"
+        else:
+            body = _body(obj, self.encode)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class RawJSON:
+    """Already-encoded JSON that is spliced into the output verbatim"""
+
+    __slots__ = ("encoded",)
+
+    def __init__(self, encoded: bytes):
+        self.encoded = encoded
+
+
+def raw(encoded: bytes):
+    """Wrap encoded JSON so dumps() emits it without re-encoding"""
+    if orjson is not None:
+        return orjson.Fragment(encoded)
+    return RawJSON(encoded)
+
+
+def dumps(value) -> bytes:
+    """Encode a value as compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _encode(value)
+
+
+def response(payload, status: int = 200) -> Response:
+    """Build a JSON response, splicing any raw() fragments into the body
+
+    A dict payload holding a list of at least JSON_STREAM_MIN_ITEMS items is
+    streamed, encoding JSON_STREAM_CHUNK_ITEMS items at a time.
+    """
+    return Response(_body(payload, dumps), status=status, mimetype="application/json")
+
+
+def iter_encode(payload: dict, key: str, encode=dumps):
+    """Encode a dict in chunks, with its list under key last
+
+    The first chunk holds every other member, so it goes out before the
+    list is encoded, and no more than one chunk of the list is held at once.
+    """
+    items = payload[key]
+    rest = encode({name: value for name, value in payload.items() if name != key})
+    yield rest[:-1] + (b"," if len(rest) > 2 else b"") + encode(key) + b":["
+
+    size = _settings["stream_chunk_items"]
+    for start in range(0, len(items), size):
+        chunk = encode(list(items[start : start + size]))[1:-1]
+        yield b"," + chunk if start else chunk
+    yield b"]}"
+
+
+def _body(payload, encode):
+    """Encoded payload, or an iterator of chunks if it holds a long list"""
+    min_items = _settings["stream_min_items"]
+    if min_items and isinstance(payload, dict):
+        longest, key = max(
+            (
+                (len(value), name)
+                for name, value in payload.items()
+                if isinstance(value, (list, tuple))
+            ),
+            default=(0, None),
+        )
+        if longest >= min_items:
+            return iter_encode(payload, key, encode)
+    return encode(payload)
+
+
+def _encode(value) -> bytes:
+    if isinstance(value, RawJSON):
+        return value.encoded
+    if isinstance(value, dict):
+        members = (
+            _stdlib_dumps(str(key)) + b":" + _encode(item)
+            for key, item in value.items()
+        )
+        return b"{" + b",".join(members) + b"}"
+    if isinstance(value, (list, tuple)):
+        return b"[" + b",".join(_encode(item) for item in value) + b"]"
+    return _stdlib_dumps(value)
+
+
+def _stdlib_dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,85 @@
+import functools
+import hashlib
+from datetime import timezone
+
+from flask import current_app, make_response, request
+
+from utils import compression
+
+
+def conditional(state, when=None):
+    """Serve a GET view with validators derived from a version callable
+
+    `state` returns (version, changed_at). The ETag is strong: it hashes the
+    version with the path and normalized query string, so it only matches
+    when the body would be byte-identical. It is sent weak when the request
+    negotiates a compressed encoding, on 304s as on the 200s that
+    utils.compression weakens. A matching If-None-Match (or, when that header is
+    absent, If-Modified-Since) is answered with 304 Not Modified before the
+    view runs. `when` can exclude requests whose body does not depend on the
+    version alone.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config["HTTP_CACHE_ENABLED"] or (
+                when is not None and not when()
+            ):
+                return view(*args, **kwargs)
+
+            version, changed_at = state()
+            etag = entity_tag(version)
+            last_modified = _utc(changed_at)
+
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+                response.set_etag(
+                    etag, weak=compression.negotiated_encoding() is not None
+                )
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = cache_control()
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def entity_tag(version) -> str:
+    """ETag for the current request at a catalog version"""
+    query = "&".join(
+        f"{name}={value}" for name, value in sorted(request.args.items(multi=True))
+    )
+    digest = hashlib.sha1(f"{request.path}?{query}".encode("utf-8")).hexdigest()
+    return f"v{version}-{digest[:16]}"
+
+
+def cache_control() -> str:
+    config = current_app.config
+    return (
+        f"public, max-age={config['HTTP_CACHE_MAX_AGE']}, "
+        f"stale-while-revalidate={config['HTTP_CACHE_STALE_WHILE_REVALIDATE']}"
+    )
+
+
+def _not_modified(etag, last_modified) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+
+    if request.if_modified_since is not None and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+
+    return False
+
+
+def _utc(value):
+    # Timestamps are stored as naive local time
+    return value.astimezone(timezone.utc) if value is not None else None
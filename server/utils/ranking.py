@@ -0,0 +1,44 @@
+from typing import Dict, List, Optional, Tuple
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, List[str]],
+    weights: Optional[Dict[str, float]] = None,
+    k: int = 60,
+) -> List[Tuple[str, float]]:
+    """Merge ranked ID lists into one ranking by weighted reciprocal rank fusion
+
+    Each list contributes weight / (k + rank) for every ID it contains, so an ID
+    ranked well by several lists beats one ranked first by a single list.
+    Returns (id, score) pairs, best first.
+    """
+    weights = weights or {}
+    scores = {}
+    for name, ids in rankings.items():
+        weight = weights.get(name, 1.0)
+        for rank, item_id in enumerate(ids, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def apply_prior(
+    scores: Dict[str, float], prior: Dict[str, float], weight: float
+) -> List[Tuple[str, float]]:
+    """Rerank scored IDs by score + weight * prior, best first
+
+    The prior is min-max scaled over the given IDs, so weight is on the same
+    scale as the scores whatever the prior's range; IDs without a prior value
+    get none. Returns (id, score) pairs.
+    """
+    known = [prior[item_id] for item_id in scores if item_id in prior]
+    low = min(known, default=0.0)
+    spread = max(known, default=0.0) - low
+    reranked = {}
+    for item_id, score in scores.items():
+        boost = 0.0
+        if spread > 0 and item_id in prior:
+            boost = weight * (prior[item_id] - low) / spread
+        reranked[item_id] = score + boost
+
+    return sorted(reranked.items(), key=lambda item: item[1], reverse=True)
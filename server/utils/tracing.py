@@ -0,0 +1,216 @@
+import bisect
+import functools
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+_enabled = False
+_server_timing = False
+_slow_turn_ms = 5000.0
+_local = threading.local()
+
+
+class LatencyHistograms:
+    """Per-stage latency histograms aggregated in-process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, name, duration_ms):
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = {
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "buckets": [0] * (len(BUCKETS_MS) + 1),
+                }
+            stage["count"] += 1
+            stage["total_ms"] += duration_ms
+            stage["max_ms"] = max(stage["max_ms"], duration_ms)
+            stage["buckets"][bisect.bisect_left(BUCKETS_MS, duration_ms)] += 1
+
+    def snapshot(self):
+        """Get the histograms as a JSON-serializable dict"""
+        with self._lock:
+            result = {}
+            for name, stage in sorted(self._stages.items()):
+                labels = [f"le_{bound}" for bound in BUCKETS_MS] + ["le_inf"]
+                result[name] = {
+                    "count": stage["count"],
+                    "avg_ms": round(stage["total_ms"] / stage["count"], 2),
+                    "max_ms": round(stage["max_ms"], 2),
+                    "buckets": dict(zip(labels, stage["buckets"])),
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+
+histograms = LatencyHistograms()
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        histograms.record(self.name, duration_ms)
+        spans = getattr(_local, "spans", None)
+        if spans is not None:
+            spans.append((self.name, duration_ms))
+        return False
+
+
+def init_app(app):
+    """Configure tracing and register the request hooks"""
+    global _enabled, _server_timing, _slow_turn_ms
+
+    _enabled = app.config["TRACING_ENABLED"]
+    _server_timing = app.config["TRACING_SERVER_TIMING"]
+    _slow_turn_ms = app.config["TRACING_SLOW_TURN_MS"]
+
+    if not _enabled:
+        return
+
+    @app.before_request
+    def start_request_trace():
+        start_trace()
+
+    @app.after_request
+    def add_server_timing(response):
+        spans = finish_trace()
+        if _server_timing and spans:
+            response.headers["Server-Timing"] = format_server_timing(spans)
+        return response
+
+    @app.teardown_request
+    def clear_request_trace(error=None):
+        finish_trace()
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name):
+    """Time a pipeline stage; a shared no-op when tracing is disabled"""
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+def traced(name):
+    """Decorator variant of span() for whole functions"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def start_trace():
+    """Start collecting spans on this thread; returns False if one is active"""
+    if getattr(_local, "spans", None) is not None:
+        return False
+    _local.spans = []
+    return True
+
+
+def finish_trace():
+    """Stop collecting spans on this thread and return them"""
+    spans = getattr(_local, "spans", None)
+    _local.spans = None
+    return spans or []
+
+
+def current_spans():
+    return list(getattr(_local, "spans", None) or [])
+
+
+def summarize(spans):
+    """Aggregate spans by stage name into total milliseconds and call counts"""
+    summary = {}
+    for name, duration_ms in spans:
+        stage = summary.setdefault(name, {"ms": 0.0, "calls": 0})
+        stage["ms"] += duration_ms
+        stage["calls"] += 1
+    for stage in summary.values():
+        stage["ms"] = round(stage["ms"], 2)
+    return summary
+
+
+def format_server_timing(spans):
+    """Format spans as a Server-Timing header value"""
+    entries = []
+    for name, stage in summarize(spans).items():
+        entry = f"{name};dur={stage['ms']}"
+        if stage["calls"] > 1:
+            entry += f';desc="{stage["calls"]} calls"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+def traced_turn(name):
+    """Trace a whole chat turn and log a stage breakdown when it is slow"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            owns_trace = start_trace()
+            started = time.perf_counter()
+            try:
+                with _Span(name):
+                    return func(*args, **kwargs)
+            finally:
+                total_ms = (time.perf_counter() - started) * 1000
+                spans = finish_trace() if owns_trace else current_spans()
+                if total_ms >= _slow_turn_ms:
+                    breakdown = {
+                        "stage": name,
+                        "total_ms": round(total_ms, 2),
+                        "stages": summarize(spans),
+                    }
+                    logger.warning(f"Slow chat turn: {json.dumps(breakdown)}")
+
+        return wrapper
+
+    return decorator